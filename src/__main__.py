@@ -0,0 +1,198 @@
+"""统一的命令行入口：python -m src <子命令>
+
+在仓库根目录运行（数据路径均相对于仓库根目录）：
+
+    python -m src crawl douban --total 10000
+    python -m src crawl final --async
+    python -m src crawl shard run --workers 4
+    python -m src check --file data/raw/douban_movies_final.csv
+    python -m src clean --parquet data/processed/douban_movies.parquet
+    python -m src progress --target 10000
+    python -m src stats --replicates 10000
+    python -m src bench crawl --movies 200
+
+本模块只导入标准库；pandas、matplotlib、bs4 等只在需要它们的子命令中导入，
+查看进度或帮助时不必等待这些库加载。每个子命令分为 load（导入依赖）和 run 两步，
+--imports-only 在 load 之后退出，bench startup 用它测量各子命令的冷启动时间。
+"""
+import argparse
+import os
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(SRC_DIR, 'bench')
+
+# 各目录中的模块以同级方式互相导入
+for _name in ('bench', 'utils', 'processing', 'crawler'):
+    sys.path.insert(0, os.path.join(SRC_DIR, _name))
+
+
+def bench_names():
+    return sorted(name[len('bench_'):-len('.py')] for name in os.listdir(BENCH_DIR)
+                  if name.startswith('bench_') and name.endswith('.py'))
+
+
+def load_crawl(args):
+    import metrics
+
+    if args.crawler == 'shard':
+        import shard_coordinator
+        return lambda: shard_coordinator.main(args.args)
+
+    if args.crawler == 'douban':
+        from movie_crawler import DoubanMovieCrawler
+
+        def crawl():
+            crawler = DoubanMovieCrawler(offline=args.offline)
+            if args.use_async:
+                crawler.crawl_movies_async(total=args.total, parse_workers=args.parse_workers)
+            else:
+                crawler.crawl_movies(total=args.total, parse_workers=args.parse_workers)
+    else:
+        from movie_crawler_final import FinalMovieCrawler
+
+        def crawl():
+            crawler = FinalMovieCrawler(offline=args.offline)
+            if args.use_async:
+                crawler.crawl_final_batch_async(target=args.total, parse_workers=args.parse_workers)
+            else:
+                crawler.crawl_final_batch(target=args.total, parse_workers=args.parse_workers)
+
+    def run():
+        metrics.enable_from_env()
+        try:
+            crawl()
+        finally:
+            metrics.disable()
+    return run
+
+
+def load_check(args):
+    from data_checker import DataChecker
+
+    def run():
+        os.makedirs(args.output_dir, exist_ok=True)
+        checker = DataChecker(args.file, streaming=args.streaming, chunksize=args.chunksize,
+                              output_dir=args.output_dir, dpi=args.dpi)
+        checker.run_all_checks(plots=not args.no_plots)
+    return run
+
+
+def load_clean(args):
+    from data_processor import build_pipeline
+
+    def run():
+        if args.drop_url_column:
+            from delete_wrong import drop_url_column
+            drop_url_column(args.source)
+        movies = build_pipeline(args.source, args.cache_dir).run()
+        print(f"处理后的数据: {len(movies)} 条")
+        if args.parquet:
+            from storage import write_parquet
+            write_parquet(movies, args.parquet)
+            print(f"已写入 {args.parquet}")
+    return run
+
+
+def load_progress(args):
+    from progress_checker import check_progress
+    return lambda: check_progress(args.target, args.metrics, args.window, args.checkpoint)
+
+
+def load_stats(args):
+    import bootstrap_stats
+
+    def run():
+        argv = ['--csv', args.source, '--replicates', str(args.replicates), '--seed', str(args.seed),
+                '--report', args.report]
+        if args.workers is not None:
+            argv += ['--workers', str(args.workers)]
+        bootstrap_stats.main(argv)
+    return run
+
+
+def load_bench(args):
+    import importlib
+
+    module = importlib.import_module('bench_' + args.name)
+
+    def run():
+        # 基准脚本自己解析命令行参数
+        sys.argv = [module.__file__] + args.args
+        module.main()
+    return run
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src', description='豆瓣电影数据采集与分析')
+    parser.add_argument('--imports-only', action='store_true', help=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    crawl = commands.add_parser('crawl', help='爬取电影数据')
+    crawlers = crawl.add_subparsers(dest='crawler', required=True, metavar='crawler')
+    for name, help_text in (('douban', 'DoubanMovieCrawler：按列表顺序爬取'),
+                            ('final', 'FinalMovieCrawler：补齐剩余的电影')):
+        sub = crawlers.add_parser(name, help=help_text)
+        sub.add_argument('--total', type=int, default=10000, help='目标电影数')
+        sub.add_argument('--async', dest='use_async', action='store_true', help='使用 asyncio 引擎')
+        sub.add_argument('--parse-workers', type=int, default=None, help='解析进程数，0 表示不使用进程池')
+        sub.add_argument('--offline', action='store_true', help='只从响应缓存回放')
+        sub.set_defaults(load=load_crawl)
+    shard = crawlers.add_parser('shard', help='分片多进程爬取（参数同 shard_coordinator.py）', add_help=False)
+    shard.add_argument('args', nargs=argparse.REMAINDER)
+    shard.set_defaults(load=load_crawl)
+
+    check = commands.add_parser('check', help='检查数据质量并绘制分布图')
+    check.add_argument('--file', default='data/raw/douban_movies_large.csv')
+    check.add_argument('--streaming', action='store_true', help='分块读取，只保留可合并的统计量')
+    check.add_argument('--chunksize', type=int, default=100_000)
+    check.add_argument('--output-dir', default='results')
+    check.add_argument('--dpi', type=int, default=300)
+    check.add_argument('--no-plots', action='store_true', help='不绘制图表')
+    check.set_defaults(load=load_check)
+
+    clean = commands.add_parser('clean', help='运行清洗、特征、去重流水线')
+    clean.add_argument('--source', default='data/raw/douban_movies_final.csv')
+    clean.add_argument('--cache-dir', default='data/processed/pipeline')
+    clean.add_argument('--parquet', default=None, help='将结果写入 Parquet 文件')
+    clean.add_argument('--drop-url-column', action='store_true',
+                       help='先删除 source 中的 url 列（url 会先登记到已爬取索引）')
+    clean.set_defaults(load=load_clean)
+
+    progress = commands.add_parser('progress', help='查看爬虫进度和实时速率')
+    progress.add_argument('--target', type=int, default=10000)
+    progress.add_argument('--metrics', default='data/raw/metrics.jsonl')
+    progress.add_argument('--window', type=int, default=60)
+    progress.add_argument('--checkpoint', default='data/raw/crawler_checkpoint.json')
+    progress.set_defaults(load=load_progress)
+
+    stats = commands.add_parser('stats', help='bootstrap 统计并写入实验报告')
+    stats.add_argument('--source', default='data/raw/douban_movies_final.csv')
+    stats.add_argument('--replicates', type=int, default=10_000)
+    stats.add_argument('--seed', type=int, default=0)
+    stats.add_argument('--workers', type=int, default=None)
+    stats.add_argument('--report', default='docs/experiment_report.md', help='为空时只打印')
+    stats.set_defaults(load=load_stats)
+
+    bench = commands.add_parser('bench', help='运行 src/bench 中的基准测试')
+    bench.add_argument('name', choices=bench_names())
+    bench.add_argument('args', nargs=argparse.REMAINDER, help='传给基准脚本的参数')
+    bench.set_defaults(load=load_bench)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    # 透传参数的子命令（crawl shard、bench）收下其余参数，包括以 - 开头的
+    args, extra = parser.parse_known_args(argv)
+    if extra:
+        if not hasattr(args, 'args'):
+            parser.error(f"unrecognized arguments: {' '.join(extra)}")
+        args.args = extra + args.args
+    run = args.load(args)
+    if not args.imports_only:
+        run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import deque
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(BENCH_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'crawler'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'utils'))
+
+from fake_douban import FIXTURE_DIR, start_in_process  # noqa: E402
+from movie_crawler import DoubanMovieCrawler  # noqa: E402
+from movie_crawler_final import FinalMovieCrawler  # noqa: E402
+
+DEFAULT_OUTPUT = 'results/bench/crawl.jsonl'
+
+# 各模式：(爬虫类, 运行函数)；列表页之间的休息时间设为 0，只测抓取本身
+MODES = {
+    'douban-threads': (DoubanMovieCrawler, lambda c, n, a: c.crawl_movies(
+        total=n, list_interval=(0, 0), parse_workers=a.parse_workers)),
+    'douban-async': (DoubanMovieCrawler, lambda c, n, a: c.crawl_movies_async(
+        total=n, rate=a.rate, parse_workers=a.parse_workers)),
+    'final-threads': (FinalMovieCrawler, lambda c, n, a: c.crawl_final_batch(
+        target=n, batch_interval=(0, 0), parse_workers=a.parse_workers)),
+    'final-async': (FinalMovieCrawler, lambda c, n, a: c.crawl_final_batch_async(
+        target=n, rate=a.rate, parse_workers=a.parse_workers)),
+}
+
+
+def server_call(port, path):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}') as response:
+        return json.load(response)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_mode(mode, port, args):
+    """在临时目录中运行一次爬取（日志、索引、缓存都不影响仓库数据），返回指标"""
+    crawler_class, crawl = MODES[mode]
+    server_call(port, '/__reset')
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            output = None if args.verbose else open(os.devnull, 'w')
+            with contextlib.redirect_stdout(output or sys.stdout):
+                crawler = crawler_class()
+                crawler.search_url = f'http://127.0.0.1:{port}/j/new_search_subjects'
+                crawler.controller.base_delay = args.backoff_base
+                crawler.controller.latencies = deque()  # 保留全部延迟样本
+                wall, cpu = time.perf_counter(), time.process_time()
+                crawl(crawler, args.movies, args)
+                wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if output:
+                output.close()
+        finally:
+            os.chdir(cwd)
+
+    served = server_call(port, '/__stats')
+    pages = served['list'] + served['detail']
+    latencies = list(crawler.controller.latencies)
+    return {
+        'mode': mode,
+        'movies': len(crawler.total_movies),
+        'wall_s': round(wall, 3),
+        'pages': pages,
+        'pages_per_sec': round(pages / wall, 2),
+        'movies_per_sec': round(len(crawler.total_movies) / wall, 2),
+        'p50_latency_ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        'p99_latency_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        # 每个 403/500 响应都会触发一次退避重试（或放弃）
+        'retries': served['status_403'] + served['status_500'],
+        'status_403': served['status_403'],
+        'status_500': served['status_500'],
+        'cpu_ms_per_page': round(cpu * 1000 / pages, 3) if pages else None,
+        'controller_window': crawler.controller.stats()['window'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='使用本地模拟豆瓣服务测试爬虫吞吐量')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--movies', type=int, default=200, help='每次运行爬取的电影数')
+    parser.add_argument('--latency', type=float, default=0.02, help='平均响应延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--forbidden-rate', type=float, default=0.01)
+    parser.add_argument('--rate', type=float, default=1000.0, help='异步引擎的令牌桶速率')
+    parser.add_argument('--backoff-base', type=float, default=0.05, help='退避的基础时间（秒）')
+    parser.add_argument('--parse-workers', type=int, default=None, help='解析进程数，0 表示不使用进程池')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='结果追加写入的 JSONL 文件')
+    parser.add_argument('--verbose', action='store_true', help='显示爬虫输出')
+    args = parser.parse_args()
+
+    config = {
+        'movies': args.movies, 'latency': args.latency, 'error_rate': args.error_rate,
+        'forbidden_rate': args.forbidden_rate, 'rate': args.rate,
+        'backoff_base': args.backoff_base,
+        'parse_workers': args.parse_workers,
+    }
+    server, port = start_in_process(
+        movies=args.movies * 3, latency=args.latency, error_rate=args.error_rate,
+        forbidden_rate=args.forbidden_rate, fixture_dir=os.path.abspath(FIXTURE_DIR))
+    try:
+        results = [run_mode(mode, port, args) for mode in args.modes]
+    finally:
+        server.terminate()
+
+    print(f"{'mode':<15} {'pages/s':>8} {'movies/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'retries':>8} {'cpu ms/page':>12}")
+    for r in results:
+        print(f"{r['mode']:<15} {r['pages_per_sec']:>8} {r['movies_per_sec']:>9} {r['p50_latency_ms']!s:>8} "
+              f"{r['p99_latency_ms']!s:>8} {r['retries']:>8} {r['cpu_ms_per_page']!s:>12}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    record = {'timestamp': time.time(), 'commit': git_commit(), 'config': config, 'results': results}
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    print(f"\nResults appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
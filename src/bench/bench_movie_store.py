@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processing'))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from loader import load_movies  # noqa: E402
+from movie_store import MovieStore  # noqa: E402
+from multivalue import SEPARATOR  # noqa: E402
+
+
+def best_of(func, repeat):
+    """返回多次运行中的最短耗时（毫秒）和最后一次的结果"""
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - begin) * 1000)
+    return min(timings), result
+
+
+def has_token(series, token):
+    """临时分析时常见的写法：拆分字符串后逐行判断"""
+    return series.astype(str).fillna('').str.split(SEPARATOR).apply(lambda values: token in values)
+
+
+def naive_queries(df, country, director, genre_votes, decade):
+    """每个查询都在整张表上扫描的 pandas 写法"""
+    return {
+        'top10 country+decade': lambda: df[df['year'].between(decade, decade + 9) & has_token(df['country'], country)]
+            .sort_values('rating', ascending=False, kind='stable').head(10),
+        'votes by director': lambda: np.histogram(
+            df.loc[has_token(df['director'], director), 'votes'].to_numpy(dtype='float64'), bins=10)[0],
+        'mean rating by genre': lambda: df[df['votes'] >= genre_votes]
+            .assign(genre=lambda d: d['genres'].astype(str).fillna('').str.split(SEPARATOR)).explode('genre')
+            .query("genre != ''").groupby('genre')['rating'].agg(['count', 'mean']),
+        'top3 per country': lambda: df[df['year'].between(decade, decade + 9)]
+            .sort_values('rating', ascending=False, kind='stable')
+            .assign(group=lambda d: d['country'].astype(str).fillna('').str.split(SEPARATOR)).explode('group')
+            .query("group != ''").groupby('group', sort=True).head(3),
+        'top10 overall': lambda: df.sort_values('rating', ascending=False, kind='stable').head(10),
+    }
+
+
+def store_queries(store, country, director, genre_votes, decade):
+    return {
+        'top10 country+decade': lambda: store.top_k(10, 'rating', country=country, year=(decade, decade + 9)),
+        'votes by director': lambda: store.distribution('votes', bins=10, director=director)['count'].to_numpy(),
+        'mean rating by genre': lambda: store.group('genres', 'rating', votes=(genre_votes, None)),
+        'top3 per country': lambda: store.group_top('country', 3, 'rating', year=(decade, decade + 9)),
+        'top10 overall': lambda: store.top_k(10, 'rating'),
+    }
+
+
+def same(naive, indexed):
+    if isinstance(naive, np.ndarray):
+        return np.array_equal(naive, indexed)
+    if 'group' in indexed.columns:
+        naive = naive.sort_values('group', kind='stable')
+        return list(zip(naive['group'], naive['title'])) == list(zip(indexed['group'], indexed['title']))
+    if 'mean' in naive.columns:
+        return naive.index.tolist() == indexed.index.tolist() and np.allclose(naive['mean'], indexed['mean'])
+    return naive['title'].tolist() == indexed['title'].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MovieStore 索引查询与 pandas 全表扫描对比')
+    parser.add_argument('--csv', default='data/raw/douban_movies_final.csv')
+    parser.add_argument('--scale', type=int, default=20, help='将数据重复多少倍')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    base = load_movies(args.csv)
+    df = pd.concat([base] * args.scale, ignore_index=True)
+    # 重复的数据中评分略作扰动，避免大量并列
+    df['rating'] = (df['rating'] + np.random.default_rng(0).uniform(-0.05, 0.05, len(df))).astype('float32')
+
+    begin = time.perf_counter()
+    store = MovieStore(df)
+    build_ms = (time.perf_counter() - begin) * 1000
+
+    director = store.tokens['director'].members.counts().index[0]
+    params = dict(country='美国', director=director, genre_votes=10000, decade=1990)
+    naive, indexed = naive_queries(store.df, **params), store_queries(store, **params)
+
+    print(f"{len(df)} rows, index build {build_ms:.0f} ms")
+    print(f"{'query':<22} {'pandas ms':>10} {'store ms':>9} {'speedup':>8}")
+    for name in naive:
+        naive_ms, expected = best_of(naive[name], args.repeat)
+        store_ms, result = best_of(indexed[name], args.repeat)
+        flag = '' if same(expected, result) else '  (results differ!)'
+        print(f"{name:<22} {naive_ms:>10.2f} {store_ms:>9.2f} {naive_ms / store_ms:>7.1f}x{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'crawler'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from detail_parser import parse_rated_movie  # noqa: E402
+from parse_stage import ParseStage  # noqa: E402
+
+FIXTURE_DIR = 'data/fixtures/detail_pages'
+DEFAULT_OUTPUT = 'results/bench/parse_stage.jsonl'
+
+
+def load_pages(fixture_dir, count):
+    templates = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            templates.append(f.read())
+    if not templates:
+        raise FileNotFoundError(f"No detail page fixtures in {fixture_dir}")
+    return [(templates[i % len(templates)], f'https://movie.douban.com/subject/{i}/') for i in range(count)]
+
+
+def run_threads(pages, workers):
+    """原来的做法：下载线程中直接解析（受 GIL 限制）"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        begin = time.perf_counter()
+        list(executor.map(lambda page: parse_rated_movie(*page), pages))
+        return time.perf_counter() - begin
+
+
+def run_processes(pages, workers):
+    """ParseStage 进程池；先预热，使进程启动时间不计入"""
+    with ParseStage(parse_rated_movie, workers) as stage:
+        for future in [stage.submit(*page) for page in pages[:workers * 2]]:
+            future.result()
+        begin = time.perf_counter()
+        for future in [stage.submit(*page) for page in pages]:
+            future.result()
+        return time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description='解析阶段扩展性测试：线程内解析与进程池解析对比')
+    parser.add_argument('--fixtures', default=FIXTURE_DIR)
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='要测试的并发数，默认为 1、2、4… 直到 CPU 核数')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='结果追加写入的 JSONL 文件')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+    pages = load_pages(args.fixtures, args.pages)
+
+    results = []
+    for mode, run in (('threads', run_threads), ('processes', run_processes)):
+        for n in workers:
+            elapsed = run(pages, n)
+            results.append({'mode': mode, 'workers': n, 'pages_per_sec': round(len(pages) / elapsed, 1)})
+
+    print(f"{len(pages)} pages, {cores} CPU cores")
+    print(f"{'mode':<10} {'workers':>8} {'pages/s':>9} {'speedup':>8}")
+    baseline = {}
+    for r in results:
+        base = baseline.setdefault(r['mode'], r['pages_per_sec'])
+        r['speedup'] = round(r['pages_per_sec'] / base, 2)
+        print(f"{r['mode']:<10} {r['workers']:>8} {r['pages_per_sec']:>9} {r['speedup']:>7}x")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'timestamp': time.time(), 'cores': cores, 'pages': len(pages),
+                            'results': results}) + '\n')
+    print(f"\nResults appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
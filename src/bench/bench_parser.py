@@ -0,0 +1,77 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'crawler'))
+
+from detail_parser import extract_fields, lxml_html  # noqa: E402
+
+FIXTURE_DIR = 'data/fixtures/detail_pages'
+
+
+def legacy_extract(html):
+    """原 get_movie_detail 中的解析方式：html.parser + 每个字段重复 find/split"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    info = soup.find('div', id='info').text.strip()
+    return {
+        'title': soup.find('span', property='v:itemreviewed').text if soup.find('span', property='v:itemreviewed') else None,
+        'year': soup.find('span', class_='year').text.strip('()') if soup.find('span', class_='year') else '',
+        'director': info.split('导演: ')[1].split('\n')[0].strip() if '导演: ' in info else '',
+        'genres': info.split('类型:')[1].split('\n')[0].strip() if '类型:' in info else '',
+        'country': info.split('制片国家/地区:')[1].split('\n')[0].strip() if '制片国家/地区:' in info else '',
+        'language': info.split('语言:')[1].split('\n')[0].strip() if '语言:' in info else '',
+        'rating': soup.find('strong', class_='ll rating_num').text if soup.find('strong', class_='ll rating_num') else None,
+        'votes': soup.find('span', property='v:votes').text if soup.find('span', property='v:votes') else None,
+    }
+
+
+def run(parse, pages, rounds):
+    """返回每秒解析页数"""
+    begin = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            parse(html)
+    return rounds * len(pages) / (time.perf_counter() - begin)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='详情页解析器基准测试')
+    parser.add_argument('--fixtures', default=FIXTURE_DIR)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    if not pages:
+        print(f"No fixtures found in {args.fixtures}")
+        return
+
+    backends = {
+        'legacy': legacy_extract,
+        'bs4': lambda html: extract_fields(html, backend='bs4'),
+    }
+    if lxml_html is not None:
+        backends['lxml'] = lambda html: extract_fields(html, backend='lxml')
+
+    # 先确认各解析方式结果一致
+    expected = [legacy_extract(html) for html in pages]
+    for name, parse in backends.items():
+        if [parse(html) for html in pages] != expected:
+            print(f"WARNING: {name} output differs from legacy parser")
+
+    print(f"{len(pages)} fixtures x {args.rounds} rounds")
+    baseline = None
+    for name, parse in backends.items():
+        rate = run(parse, pages, args.rounds)
+        baseline = baseline or rate
+        print(f"{name:>8}: {rate:8.1f} pages/sec ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
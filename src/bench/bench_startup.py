@@ -0,0 +1,59 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+# 各子命令的冷启动：解释器启动 + 命令行解析 + 子命令所需的导入（--imports-only 在此退出）
+COMMANDS = {
+    'help': ['--help'],
+    'progress': ['--imports-only', 'progress'],
+    'crawl douban': ['--imports-only', 'crawl', 'douban'],
+    'crawl final': ['--imports-only', 'crawl', 'final'],
+    'crawl shard': ['--imports-only', 'crawl', 'shard', 'status'],
+    'check': ['--imports-only', 'check'],
+    'clean': ['--imports-only', 'clean'],
+    'stats': ['--imports-only', 'stats'],
+    'bench parser': ['--imports-only', 'bench', 'parser'],
+}
+
+HEAVY_MODULES = ('numpy', 'pandas', 'pyarrow', 'matplotlib', 'seaborn', 'bs4', 'lxml', 'requests', 'aiohttp')
+
+
+def measure(argv, repeat):
+    """返回 (最短耗时 ms, 导入的重量级库)；-X importtime 的输出用于检查导入了哪些库"""
+    timings, heavy = [], set()
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        done = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'src'] + argv, cwd=REPO_ROOT,
+                              capture_output=True, text=True)
+        timings.append((time.perf_counter() - begin) * 1000)
+        if done.returncode != 0:
+            raise RuntimeError(f"python -m src {' '.join(argv)} failed:\n{done.stderr[-2000:]}")
+        heavy = {match.group(1) for match in re.finditer(r'\|\s+(\w+)$', done.stderr, re.MULTILINE)
+                 if match.group(1) in HEAVY_MODULES}
+    return min(timings), sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='python -m src 各子命令的冷启动时间')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = []
+    for _ in range(args.repeat):
+        begin = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        baseline.append((time.perf_counter() - begin) * 1000)
+    print(f"bare interpreter: {min(baseline):.0f} ms")
+    print(f"{'command':<14} {'cold start ms':>14}  heavy imports")
+    for name, argv in COMMANDS.items():
+        elapsed, heavy = measure(argv, args.repeat)
+        print(f"{name:<14} {elapsed:>14.0f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
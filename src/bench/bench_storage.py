@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processing'))
+
+import pandas as pd  # noqa: E402
+
+from storage import read_parquet, write_parquet  # noqa: E402
+
+
+def best_of(func, repeat):
+    """返回多次运行中的最短耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - begin) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV 与 Parquet 存储对比')
+    parser.add_argument('--csv', default='data/raw/douban_movies_final.csv')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, encoding='utf-8')
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet_path = os.path.join(tmp, 'movies.parquet')
+        write_parquet(df, parquet_path)
+
+        csv_size = os.path.getsize(args.csv)
+        parquet_size = os.path.getsize(parquet_path)
+        print(f"rows: {len(df)}")
+        print(f"size      csv {csv_size / 1024:8.1f} KiB   parquet {parquet_size / 1024:8.1f} KiB "
+              f"({csv_size / parquet_size:.1f}x smaller)")
+
+        cases = [
+            ('full load',
+             lambda: pd.read_csv(args.csv, encoding='utf-8'),
+             lambda: read_parquet(parquet_path)),
+            ('2 columns',
+             lambda: pd.read_csv(args.csv, encoding='utf-8', usecols=['year', 'rating']),
+             lambda: read_parquet(parquet_path, columns=['year', 'rating'])),
+            ('1990-1999',
+             lambda: (lambda d: d[d['year'].between(1990, 1999)])(pd.read_csv(args.csv, encoding='utf-8')),
+             lambda: read_parquet(parquet_path, year_range=(1990, 1999))),
+        ]
+        for name, csv_load, parquet_load in cases:
+            csv_ms = best_of(csv_load, args.repeat)
+            parquet_ms = best_of(parquet_load, args.repeat)
+            print(f"{name:<9} csv {csv_ms:8.1f} ms      parquet {parquet_ms:8.1f} ms     "
+                  f"({csv_ms / parquet_ms:.1f}x faster)")
+
+        loaded = read_parquet(parquet_path)
+        print(f"memory    csv {df.memory_usage(deep=True).sum() / 1024:8.1f} KiB   "
+              f"parquet {loaded.memory_usage(deep=True).sum() / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import glob
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE_DIR = 'data/fixtures/detail_pages'
+
+
+class FakeDouban:
+    """本地模拟的豆瓣服务：/j/new_search_subjects 列表接口与 /subject/<id>/ 详情页
+
+    详情页以 data/fixtures 中的真实页面为模板，标题替换为编号，解析开销与线上一致。
+    latency 为平均响应延迟（秒，指数分布），error_rate/forbidden_rate 为返回 500/403 的概率。
+    详情页带 ETag，If-None-Match 匹配时返回 304。
+    /__stats 返回请求计数，/__reset 清零。
+    """
+
+    def __init__(self, movies=1000, latency=0.02, error_rate=0.0, forbidden_rate=0.0,
+                 fixture_dir=FIXTURE_DIR, seed=0):
+        self.movies = movies
+        self.latency = latency
+        self.error_rate = error_rate
+        self.forbidden_rate = forbidden_rate
+        self.random = random.Random(seed)
+        self.templates = []
+        for path in sorted(glob.glob(os.path.join(fixture_dir, '*.html'))):
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            title = re.search(r'property="v:itemreviewed">([^<]*)<', html).group(1)
+            self.templates.append(html.replace(title, '{title}'))
+        if not self.templates:
+            raise FileNotFoundError(f"No detail page fixtures in {fixture_dir}")
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {'list': 0, 'detail': 0, 'status_304': 0, 'status_403': 0, 'status_500': 0}
+            self.detail_urls = set()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, unique_details=len(self.detail_urls))
+
+    def _count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def handle(self, path, port, headers=None):
+        """返回 (状态码, 内容类型, 正文, 额外的响应头)"""
+        url = urlsplit(path)
+        if url.path == '/__stats':
+            return 200, 'application/json', json.dumps(self.stats()).encode(), {}
+        if url.path == '/__reset':
+            self.reset()
+            return 200, 'application/json', b'{}', {}
+
+        with self.lock:
+            delay = self.random.expovariate(1 / self.latency) if self.latency else 0
+            roll = self.random.random()
+        time.sleep(delay)
+        if roll < self.forbidden_rate:
+            self._count('status_403')
+            return 403, 'text/html', b'Forbidden', {}
+        if roll < self.forbidden_rate + self.error_rate:
+            self._count('status_500')
+            return 500, 'text/html', b'Internal Server Error', {}
+
+        if url.path.startswith('/j/new_search_subjects'):
+            self._count('list')
+            query = parse_qs(url.query)
+            start = int(query.get('start', ['0'])[0])
+            limit = int(query.get('limit', ['20'])[0])
+            data = [{'url': f'http://127.0.0.1:{port}/subject/{i}/', 'title': f'Movie {i}', 'rate': '8.0'}
+                    for i in range(start, min(start + limit, self.movies))]
+            return 200, 'application/json', json.dumps({'data': data}).encode(), {}
+
+        match = re.match(r'/subject/(\d+)/?$', url.path)
+        if match:
+            subject = int(match.group(1))
+            # 页面内容只由编号决定，ETag 也只取决于编号
+            etag = f'"{subject}"'
+            if (headers or {}).get('If-None-Match') == etag:
+                self._count('status_304')
+                return 304, 'text/html', b'', {'ETag': etag}
+            with self.lock:
+                self.counts['detail'] += 1
+                self.detail_urls.add(subject)
+            html = self.templates[subject % len(self.templates)].replace('{title}', f'Movie {subject}')
+            return 200, 'text/html; charset=utf-8', html.encode('utf-8'), {'ETag': etag}
+        return 404, 'text/html', b'Not Found', {}
+
+
+def make_server(fake, host='127.0.0.1', port=0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            status, content_type, body, headers = fake.handle(self.path, self.server.server_port, self.headers)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = _Server((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # 客户端取消请求时连接被提前关闭，属于正常情况
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _serve(options, ready):
+    server = make_server(FakeDouban(**options))
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def start_in_process(**options):
+    """在独立进程中启动服务（不占用被测进程的 CPU），返回 (进程, 端口)"""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(options, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=30)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地模拟豆瓣服务')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--movies', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--forbidden-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeDouban(args.movies, args.latency, args.error_rate, args.forbidden_rate)
+    print(f"Serving fake Douban on http://127.0.0.1:{args.port}")
+    make_server(fake, port=args.port).serve_forever()
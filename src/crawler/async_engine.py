@@ -0,0 +1,306 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from concurrency_controller import classify
+from parse_stage import ParseStage
+
+import metrics
+
+SEARCH_URL = "https://movie.douban.com/j/new_search_subjects"
+
+
+class TokenBucket:
+    """令牌桶限速器，替代固定的 time.sleep(random.uniform(3, 5))"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens=1):
+        """取出令牌，不足时等待补充"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+
+class AsyncCrawlEngine:
+    """基于 asyncio 的爬取引擎
+
+    - 复用有上限的 keep-alive 连接池，避免每个请求重新建立 TCP/TLS 连接
+    - 每个域名独立的并发上限与令牌桶限速
+    - 详情页抓取与下一页 new_search_subjects 请求并行进行
+
+    search_url 与 verify_ssl 可配置，便于对本地桩服务器进行测试。
+    传入 cache（ResponseCache）时详情页先查本地缓存，过期条目做条件请求。
+    传入 controller（AdaptiveController）时由其自适应控制在途请求数和退避时间，
+    每个域名的并发上限放宽到 controller.max_window，以免请求在信号量中排队却占着窗口名额。
+    """
+
+    def __init__(self, user_agents, headers=None, search_url=SEARCH_URL,
+                 pool_size=20, per_host_limit=4, rate=2.0, burst=None,
+                 timeout=10, max_retries=3, retry_delay=2, verify_ssl=True, cache=None,
+                 controller=None):
+        self.user_agents = user_agents
+        self.headers = dict(headers or {})
+        self.search_url = search_url
+        self.pool_size = pool_size
+        self.per_host_limit = per_host_limit
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.verify_ssl = verify_ssl
+        self.cache = cache
+        self.controller = controller
+
+        self.session = None
+        self._host_semaphores = {}
+        self._host_buckets = {}
+
+    def _per_host(self):
+        """每个域名的并发上限"""
+        return self.controller.max_window if self.controller else self.per_host_limit
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=max(self.pool_size, self._per_host()),
+            limit_per_host=self._per_host(),
+            keepalive_timeout=30,
+            ssl=None if self.verify_ssl else False
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+
+    def _host_limits(self, url):
+        """返回该域名的并发信号量和令牌桶"""
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self._per_host())
+            self._host_buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._host_semaphores[host], self._host_buckets[host]
+
+    async def fetch(self, url, params=None):
+        """获取页面内容，返回 (状态码, 文本)；重试耗尽后返回 (None, None)
+
+        只有不带参数的详情页请求会走缓存，列表页总是访问网络。
+        """
+        kind = 'list' if params is not None else 'detail'
+        entry = None
+        if self.cache is not None and params is None:
+            entry, fresh = self.cache.lookup(url)
+            if entry and fresh:
+                metrics.inc('http_responses_total', kind=kind, status='cached')
+                return 200, self.cache.read(entry)
+            if self.cache.offline:
+                return None, None
+
+        semaphore, bucket = self._host_limits(url)
+        for retry in range(self.max_retries):
+            await bucket.acquire()
+            headers = dict(self.headers, **{'User-Agent': random.choice(self.user_agents)})
+            if entry:
+                headers.update(self.cache.conditional_headers(entry))
+            outcome = 'error'
+            # 先进入域名信号量再占用窗口名额，计时从名额到手开始，排队时间不计入延迟
+            async with semaphore:
+                if self.controller:
+                    await self.controller.async_acquire()
+                begin = time.monotonic()
+                try:
+                    with metrics.span('fetch', kind=kind):
+                        async with self.session.get(url, params=params, headers=headers) as response:
+                            text = await response.text()
+                            status = response.status
+                            response_headers = response.headers
+                    outcome = classify(status)
+                    if status == 304 and entry:
+                        self.cache.revalidated(url)
+                        return 200, self.cache.read(entry)
+                    if status == 200:
+                        if self.cache is not None and params is None:
+                            self.cache.store(url, text, response_headers)
+                        return status, text
+                    print(f"Status {status} for {url}, retry {retry + 1}/{self.max_retries}")
+                except asyncio.TimeoutError as e:
+                    outcome = 'timeout'
+                    print(f"Timeout for {url}: {e!r}, retry {retry + 1}/{self.max_retries}")
+                except aiohttp.ClientError as e:
+                    print(f"Network error for {url}: {e!r}, retry {retry + 1}/{self.max_retries}")
+                except asyncio.CancelledError:
+                    outcome = 'cancelled'
+                    raise
+                finally:
+                    metrics.inc('http_responses_total', kind=kind, status=outcome)
+                    if self.controller:
+                        self.controller.release(outcome, time.monotonic() - begin)
+            metrics.inc('retries_total', kind=kind)
+            if self.controller:
+                await asyncio.sleep(self.controller.backoff(retry))
+            else:
+                await asyncio.sleep(self.retry_delay * (retry + 1))
+        return None, None
+
+    async def get_movies(self, start, count=20):
+        """获取电影列表"""
+        params = {
+            'sort': 'rating',
+            'range': '0,10',
+            'tags': '电影',
+            'start': start,
+            'limit': count
+        }
+        status, text = await self.fetch(self.search_url, params=params)
+        if status != 200:
+            return []
+        try:
+            return json.loads(text).get('data', [])
+        except ValueError as e:
+            print(f"Invalid list response at start={start}: {e}")
+            return []
+
+    async def get_movie_detail(self, url, parse):
+        """获取并解析电影详情页
+
+        parse 为 ParseStage 时在进程池中解析，否则直接调用 parse(html, url)，返回电影字典或 None。
+        """
+        status, text = await self.fetch(url)
+        if status != 200:
+            return None
+        try:
+            if isinstance(parse, ParseStage):
+                return await parse.submit_async(text, url)
+            with metrics.span('parse'):
+                return parse(text, url)
+        except Exception as e:
+            print(f"Error parsing {url}: {e}")
+            return None
+
+    async def crawl(self, parse, total, start=0, batch_size=20, max_pending=None,
+                    skip_url=None, on_movie=None, state=None, validator=None):
+        """爬取 total 条电影
+
+        在途详情请求数低于 max_pending 时即预取下一页列表，
+        因此列表请求与详情请求始终重叠进行。
+
+        Args:
+            parse: 详情页解析函数 parse(html, url)，或 ParseStage
+            total (int): 目标条数
+            start (int): 列表起始偏移
+            batch_size (int): 每页条数
+            max_pending (int): 在途详情请求上限，默认为连接池大小的两倍
+            skip_url: 可选，返回 True 的 URL 不再抓取
+            on_movie: 可选，每得到一条电影时回调 on_movie(movie, url)
+            state: 可选，CrawlState，记录爬取前沿并在续爬时先处理未完成的URL
+            validator: 可选，BatchValidator，完成的详情页先攒批（见 BatchValidator.due），
+                没有在途详情页或可能已达到 total 时立即校验；未通过的记录进入隔离文件且不计入 total
+
+        Returns:
+            list: 电影字典列表
+        """
+        max_pending = max_pending or self.pool_size * 2
+        movies = []
+        details = {}
+        exhausted = False
+
+        def schedule(url):
+            if state:
+                state.mark_in_flight(url)
+            details[asyncio.create_task(self.get_movie_detail(url, parse))] = url
+
+        if state:
+            for url in state.pending_urls()[:total]:
+                schedule(url)
+        page_start = start
+        page = asyncio.create_task(self.get_movies(page_start, batch_size))
+
+        try:
+            while len(movies) < total:
+                waiting = set(details)
+                if page is not None:
+                    waiting.add(page)
+                if not waiting:
+                    break
+
+                # 有待校验的记录时限时等待，保证按时校验
+                timeout = validator.max_delay if validator and validator.pending else None
+                done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finished = []
+                for task in done:
+                    if task is page:
+                        page = None
+                        items = task.result()
+                        if not items:
+                            print("No more movies returned")
+                            exhausted = True
+                            continue
+                        urls = [item['url'] for item in items
+                                if not (skip_url and skip_url(item['url']))]
+                        if state:
+                            urls = state.add_page(page_start, urls, batch_size)
+                        page_start += batch_size
+                        for url in urls:
+                            schedule(url)
+                    else:
+                        url = details.pop(task)
+                        movie = task.result()
+                        if not movie:
+                            if state:
+                                state.mark_failed(url)
+                        elif validator:
+                            validator.add(movie, url)
+                        else:
+                            finished.append((movie, url))
+
+                # 没有在途详情页、或攒下的记录可能已够 total 时不再等待
+                if validator and (validator.due() or (validator.pending and (
+                        not details or len(movies) + validator.pending >= total))):
+                    finished, rejected = validator.flush()
+                    for movie, url, reasons in rejected:
+                        if state:
+                            state.mark_failed(url, 'invalid: ' + '; '.join(reasons), retry=False)
+                for movie, url in finished:
+                    if len(movies) >= total:
+                        break
+                    movies.append(movie)
+                    if state:
+                        state.mark_done(url, movie)
+                    if on_movie:
+                        on_movie(movie, url)
+
+                # 在途详情请求不足时预取下一页
+                pending = validator.pending if validator else 0
+                if (page is None and not exhausted and len(details) < max_pending
+                        and len(movies) + pending + len(details) < total):
+                    page = asyncio.create_task(self.get_movies(page_start, batch_size))
+        finally:
+            leftover = set(details) | ({page} if page else set())
+            for task in leftover:
+                task.cancel()
+            if leftover:
+                await asyncio.gather(*leftover, return_exceptions=True)
+
+        return movies
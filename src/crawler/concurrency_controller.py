@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_STATS_PATH = 'data/raw/controller_stats.json'
+
+# 这些结果说明被限流或网络拥塞，需要降低并发
+THROTTLE_OUTCOMES = ('forbidden', 'throttled', 'timeout')
+
+
+def classify(status):
+    """将 HTTP 状态码归类为控制器使用的结果类型"""
+    if status == 200 or status == 304:
+        return 'ok'
+    if status == 403:
+        return 'forbidden'
+    if status == 429:
+        return 'throttled'
+    return 'error'
+
+
+class _Slot:
+    def __init__(self):
+        self.outcome = 'error'
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveController:
+    """AIMD 自适应并发控制器
+
+    - 成功且延迟没有明显上升时，窗口每轮加 increase（加性增）
+    - 遇到 403/429/超时把窗口乘以 decrease（乘性减），每个延迟周期最多减一次
+    - 连续 breaker_threshold 次限流后熔断 breaker_cooldown 秒，之后以窗口 1 试探
+    - backoff() 给出带抖动的指数退避时间
+
+    stats() / publish() 输出当前窗口和各类错误率，便于调参。
+    """
+
+    def __init__(self, initial=4, min_window=1, max_window=32, increase=1.0, decrease=0.5,
+                 latency_tolerance=2.0, base_delay=1.0, max_delay=60.0,
+                 breaker_threshold=5, breaker_cooldown=60.0, sample_size=100):
+        self.window = float(initial)
+        self.min_window = min_window
+        self.max_window = max_window
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.in_flight = 0
+        self.base_latency = None  # 观察到的最小成功延迟
+        self.latencies = deque(maxlen=sample_size)
+        self.outcomes = deque(maxlen=sample_size)
+        self.totals = {}
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self._last_decrease = 0.0
+
+        self._cond = threading.Condition()
+        self._async_waiters = []  # (事件循环, future)，release 时唤醒
+
+    def _limit(self):
+        if time.monotonic() < self.open_until:
+            return 0
+        if self.open_until:
+            return 1  # 半开状态，只放行一个试探请求
+        return max(self.min_window, int(self.window))
+
+    def try_acquire(self):
+        """不阻塞地尝试占用一个并发名额"""
+        with self._cond:
+            if self.in_flight < self._limit():
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """阻塞直到窗口允许发出新请求（线程版）"""
+        with self._cond:
+            while self.in_flight >= self._limit():
+                wait = self.open_until - time.monotonic()
+                self._cond.wait(timeout=wait if wait > 0 else 0.5)
+            self.in_flight += 1
+
+    async def async_acquire(self):
+        """等待窗口允许发出新请求（asyncio 版）
+
+        名额不足时挂起，由 release() 唤醒后重新检查；熔断期间在熔断结束时醒来。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < self._limit():
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+                wait = self.open_until - time.monotonic()
+            try:
+                await asyncio.wait_for(waiter, wait if wait > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, outcome, latency):
+        """请求结束后更新窗口
+
+        outcome 为 classify() 的结果或 'timeout'；'cached'/'cancelled' 不计入统计。
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if outcome not in ('cached', 'cancelled'):
+                self._record(outcome, latency)
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        # release 可能在其他线程中调用，future 只能在所属的事件循环中设置
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def _record(self, outcome, latency):
+        now = time.monotonic()
+        self.outcomes.append(outcome)
+        self.totals[outcome] = self.totals.get(outcome, 0) + 1
+
+        if outcome == 'ok':
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            if self.base_latency is None or latency < self.base_latency:
+                self.base_latency = latency
+            # 延迟稳定时加性增加，约每个窗口的请求数加 increase
+            if latency <= self.base_latency * self.latency_tolerance:
+                self.window = min(self.max_window, self.window + self.increase / self.window)
+        elif outcome in THROTTLE_OUTCOMES:
+            self.consecutive_failures += 1
+            half_open = self.open_until and now >= self.open_until
+            cycle = self.base_latency or 1.0
+            if now - self._last_decrease >= cycle:
+                self.window = max(self.min_window, self.window * self.decrease)
+                self._last_decrease = now
+            # 半开状态下试探失败立即重新熔断
+            if half_open or self.consecutive_failures >= self.breaker_threshold:
+                self.open_until = now + self.breaker_cooldown
+                self.window = self.min_window
+                print(f"Circuit breaker open for {self.breaker_cooldown:.0f}s "
+                      f"after {self.consecutive_failures} throttled requests")
+                self.consecutive_failures = 0
+
+    @contextmanager
+    def slot(self):
+        """占用名额并在结束时自动 release
+
+        调用方设置 slot.outcome；抛出异常时类名含 Timeout 的记为超时，其余记为错误。
+        """
+        self.acquire()
+        slot = _Slot()
+        begin = time.monotonic()
+        try:
+            yield slot
+        except Exception as e:
+            slot.outcome = 'timeout' if 'timeout' in type(e).__name__.lower() else 'error'
+            raise
+        finally:
+            self.release(slot.outcome, time.monotonic() - begin)
+
+    def backoff(self, attempt):
+        """带抖动的指数退避（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def stats(self):
+        """当前窗口、在途请求数、最近样本中的各类错误率与延迟"""
+        with self._cond:
+            samples = len(self.outcomes)
+            rates = {
+                kind: (sum(1 for o in self.outcomes if o == kind) / samples if samples else 0.0)
+                for kind in ('forbidden', 'throttled', 'timeout', 'error')
+            }
+            latencies = sorted(self.latencies)
+            return {
+                'window': round(self.window, 2),
+                'in_flight': self.in_flight,
+                'breaker_open': time.monotonic() < self.open_until,
+                'error_rates': rates,
+                'p50_latency': latencies[len(latencies) // 2] if latencies else None,
+                'base_latency': self.base_latency,
+                'totals': dict(self.totals)
+            }
+
+    def publish(self, path=DEFAULT_STATS_PATH):
+        """将 stats() 原子写入 JSON 文件"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.stats(), updated_at=time.time()), f)
+        os.replace(tmp_path, path)
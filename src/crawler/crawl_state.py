@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_STATE_PATH = 'data/raw/crawler_checkpoint.json'
+
+
+def frontier_path(path):
+    """爬取前沿文件的路径：crawler_checkpoint.json -> crawler_checkpoint.frontier.json"""
+    return os.path.splitext(path)[0] + '.frontier.json'
+
+
+def _write_json(path, data):
+    """原子写入：先写临时文件并 fsync，再替换"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CrawlState:
+    """可断点续爬的爬取状态
+
+    记录列表页偏移和详情页URL的 pending/in_flight/done/failed 状态，以原子方式写入两个文件：
+    - crawler_checkpoint.json：列表页进度、各状态的计数和最近几条电影，供 progress_checker 读取
+    - crawler_checkpoint.frontier.json：未完成（pending/in_flight）和失败的URL
+
+    已完成的URL只保存在内存中：续爬时爬虫用已爬取索引（SeenIndex）过滤列表页，
+    因此每次保存的开销只与未完成的URL数成正比，不随已爬取数增长。
+    失败的URL记录尝试次数，续爬时尝试次数少于 max_attempts 的重新排队；
+    mark_failed(retry=False) 的URL（例如未通过校验的记录）不再重试。
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH, save_every=20, save_interval=5.0, max_attempts=3):
+        self.path = path
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.max_attempts = max_attempts
+
+        self.next_start = 0
+        self.pages_done = 0
+        self.pending = {}  # 用 dict 作有序集合，保持列表页顺序
+        self.in_flight = set()
+        self.done = set()
+        self.done_count = 0
+        self.failed = {}  # url -> {'reason': 失败原因, 'attempts': 尝试次数, 'retry': 是否可重试}
+        self.attempts = {}  # 重新排队的URL -> 已失败次数
+        self.movies_count = 0
+        self.recent_movies = deque(maxlen=5)
+
+        self._lock = threading.Lock()
+        self._changes = 0
+        self._last_save = time.monotonic()
+
+    def load(self):
+        """读取已有的状态文件，返回是否成功恢复"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if 'frontier' in data:
+                # 第 1 版把前沿（包括全部已完成的URL）写在同一个文件中
+                frontier = data['frontier']
+            elif 'pages_done' in data:
+                frontier = {}
+                if os.path.exists(frontier_path(self.path)):
+                    with open(frontier_path(self.path), encoding='utf-8') as f:
+                        frontier = json.load(f)
+            else:
+                return False
+        except ValueError as e:
+            print(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return False
+
+        failed = {}
+        for url, entry in frontier.get('failed', {}).items():
+            if not isinstance(entry, dict):
+                # 第 1 版只记录失败原因
+                entry = {'reason': entry, 'attempts': 1, 'retry': not entry.startswith('invalid')}
+            failed[url] = entry
+        with self._lock:
+            self.next_start = data.get('next_start', 0)
+            self.pages_done = data.get('pages_done', len(data.get('list_offsets_done', [])))
+            # 上次中断时仍在进行中的请求重新排队
+            self.pending = dict.fromkeys(frontier.get('in_flight', []))
+            self.pending.update(dict.fromkeys(frontier.get('pending', [])))
+            self.in_flight = set()
+            self.done = set()
+            self.done_count = data.get('counts', {}).get('done', len(frontier.get('done', [])))
+            self.attempts = dict(frontier.get('attempts', {}))
+            # 可重试且次数未用完的失败URL重新排队，其余保留在 failed 中
+            self.failed = {}
+            for url, entry in failed.items():
+                if entry.get('retry', True) and entry['attempts'] < self.max_attempts:
+                    self.pending[url] = None
+                    self.attempts[url] = entry['attempts']
+                else:
+                    self.failed[url] = entry
+            self.movies_count = data.get('movies_count', 0)
+            self.recent_movies = deque(data.get('recent_movies', []), maxlen=5)
+        return True
+
+    def add_page(self, start, urls, page_size):
+        """登记一页列表结果，返回需要抓取的新URL"""
+        with self._lock:
+            new_urls = [
+                url for url in urls
+                if url not in self.done and url not in self.pending
+                and url not in self.in_flight
+            ]
+            self.pending.update(dict.fromkeys(new_urls))
+            self.pages_done += 1
+            self.next_start = max(self.next_start, start + page_size)
+            self._changes += 1
+        return new_urls
+
+    def pending_urls(self):
+        """返回尚未开始的URL（续爬时优先处理）"""
+        with self._lock:
+            return list(self.pending)
+
+    def mark_in_flight(self, url):
+        with self._lock:
+            self.pending.pop(url, None)
+            self.in_flight.add(url)
+
+    def mark_done(self, url, movie=None):
+        with self._lock:
+            self.in_flight.discard(url)
+            self.pending.pop(url, None)
+            self.failed.pop(url, None)
+            self.attempts.pop(url, None)
+            if url not in self.done:
+                self.done.add(url)
+                self.done_count += 1
+            if movie:
+                self.movies_count += 1
+                self.recent_movies.append({
+                    'title': movie.get('title'),
+                    'year': movie.get('year'),
+                    'rating': movie.get('rating')
+                })
+            self._changes += 1
+
+    def mark_failed(self, url, reason='no result', retry=True):
+        """记录失败；retry=False 表示重试也不会成功，续爬时不再排队"""
+        with self._lock:
+            self.in_flight.discard(url)
+            self.pending.pop(url, None)
+            attempts = self.attempts.pop(url, 0) + 1
+            self.failed[url] = {'reason': reason, 'attempts': attempts, 'retry': retry}
+            self._changes += 1
+
+    def due(self):
+        """是否到了需要保存的时候"""
+        return (self._changes >= self.save_every
+                or time.monotonic() - self._last_save >= self.save_interval)
+
+    def snapshot(self):
+        """返回 (断点, 前沿)，两者的大小都与已完成的URL数无关"""
+        with self._lock:
+            checkpoint = {
+                'version': 2,
+                'updated_at': time.time(),
+                'next_start': self.next_start,
+                'pages_done': self.pages_done,
+                'movies_count': self.movies_count,
+                'recent_movies': list(self.recent_movies),
+                'counts': {
+                    'pending': len(self.pending),
+                    'in_flight': len(self.in_flight),
+                    'done': self.done_count,
+                    'failed': len(self.failed)
+                }
+            }
+            frontier = {
+                'pending': list(self.pending),
+                'in_flight': list(self.in_flight),
+                'failed': dict(self.failed),
+                'attempts': dict(self.attempts)
+            }
+        return checkpoint, frontier
+
+    def save(self):
+        """先写前沿文件，再写断点文件，两者都原子替换"""
+        checkpoint, frontier = self.snapshot()
+        _write_json(frontier_path(self.path), frontier)
+        _write_json(self.path, checkpoint)
+        self._changes = 0
+        self._last_save = time.monotonic()
@@ -1,12 +1,26 @@
 import pandas as pd
+from url_index import SeenIndex
 
-# 读取文件
-df = pd.read_csv('data/raw/douban_movies_final.csv')
 
-# 删除 url 列
-df = df.drop('url', axis=1)
+def drop_url_column(path='data/raw/douban_movies_final.csv'):
+    """删除结果文件中的 url 列，删除前先把 url 登记到已爬取索引"""
+    # 读取文件
+    df = pd.read_csv(path)
 
-# 保存回文件
-df.to_csv('data/raw/douban_movies_final.csv', index=False, encoding='utf-8')
+    # 删除前先把 url 登记到已爬取索引，续爬时去重依然有效
+    index = SeenIndex()
+    added = index.add_many(df['url'].dropna())
+    index.close()
+    print(f"Recorded {added} new urls in the seen index")
 
-print("Successfully removed url column!")
\ No newline at end of file
+    # 删除 url 列
+    df = df.drop('url', axis=1)
+
+    # 保存回文件
+    df.to_csv(path, index=False, encoding='utf-8')
+
+    print("Successfully removed url column!")
+
+
+if __name__ == "__main__":
+    drop_url_column()
@@ -0,0 +1,157 @@
+import re
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # 没有安装 lxml 时退回 BeautifulSoup
+    lxml_html = None
+
+# #info 中需要的字段，一次正则扫描全部取出
+INFO_LABELS = {
+    '导演': 'director',
+    '类型': 'genres',
+    '制片国家/地区': 'country',
+    '语言': 'language',
+}
+INFO_PATTERN = re.compile(r'(导演|类型|制片国家/地区|语言):[ \t]*([^\n]*)')
+
+if lxml_html is not None:
+    XPATH_TITLE = etree.XPath("//span[@property='v:itemreviewed']")
+    XPATH_YEAR = etree.XPath("//span[contains(concat(' ', normalize-space(@class), ' '), ' year ')]")
+    XPATH_INFO = etree.XPath("//div[@id='info']")
+    XPATH_RATING = etree.XPath("//strong[@class='ll rating_num']")
+    XPATH_VOTES = etree.XPath("//span[@property='v:votes']")
+
+
+def parse_info(info):
+    """一次扫描 #info 文本，返回 director/genres/country/language"""
+    fields = dict.fromkeys(INFO_LABELS.values(), '')
+    seen = set()
+    for label, value in INFO_PATTERN.findall(info):
+        # 与原来的 split(label)[1] 一致，只取第一次出现的值
+        if label not in seen:
+            seen.add(label)
+            fields[INFO_LABELS[label]] = value.strip()
+    return fields
+
+
+def _first_text(elements):
+    return elements[0].text_content() if elements else None
+
+
+def _extract_lxml(html):
+    doc = lxml_html.fromstring(html)
+    info = XPATH_INFO(doc)
+    if not info:
+        raise ValueError("detail page has no #info block")
+
+    year = _first_text(XPATH_YEAR(doc))
+    fields = {
+        'title': _first_text(XPATH_TITLE(doc)),
+        'year': year.strip('()') if year is not None else '',
+        'rating': _first_text(XPATH_RATING(doc)),
+        'votes': _first_text(XPATH_VOTES(doc)),
+    }
+    fields.update(parse_info(info[0].text_content().strip()))
+    return fields
+
+
+def _extract_bs4(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    info = soup.find('div', id='info')
+    if info is None:
+        raise ValueError("detail page has no #info block")
+
+    title = soup.find('span', property='v:itemreviewed')
+    year = soup.find('span', class_='year')
+    rating = soup.find('strong', class_='ll rating_num')
+    votes = soup.find('span', property='v:votes')
+    fields = {
+        'title': title.text if title else None,
+        'year': year.text.strip('()') if year else '',
+        'rating': rating.text if rating else None,
+        'votes': votes.text if votes else None,
+    }
+    fields.update(parse_info(info.text.strip()))
+    return fields
+
+
+def extract_fields(html, backend=None):
+    """单次遍历提取详情页字段
+
+    优先使用 lxml 与预编译的 XPath，没有安装 lxml 时退回 BeautifulSoup。
+    title/rating/votes 缺失时为 None，其余字段缺失时为空字符串；
+    页面没有 #info 块时抛出 ValueError。
+
+    Args:
+        html (str): 详情页 HTML
+        backend (str): 可选，强制使用 'lxml' 或 'bs4'
+
+    Returns:
+        dict: 未做类型转换的字段字符串
+    """
+    if backend is None:
+        backend = 'lxml' if lxml_html is not None else 'bs4'
+    if backend == 'lxml':
+        return _extract_lxml(html)
+    return _extract_bs4(html)
+
+
+def parse_movie(html, url=None):
+    """DoubanMovieCrawler 使用的解析：缺失的评分和投票数记为 0
+
+    记录带上 url，续爬时 RecordLog.compact 据此去重。定义在模块顶层，可以提交到解析进程池。
+    """
+    fields = extract_fields(html)
+    year = fields['year']
+    rating = fields['rating'].strip() if fields['rating'] is not None else '0'
+    votes = fields['votes'] if fields['votes'] is not None else '0'
+
+    return {
+        'title': fields['title'] or '',
+        'year': int(year) if year.isdigit() else 0,
+        'director': fields['director'],
+        'genres': fields['genres'],
+        'country': fields['country'],
+        'language': fields['language'],
+        'rating': float(rating),
+        'votes': int(votes),
+        'url': url
+    }
+
+
+def parse_rated_movie(html, url):
+    """FinalMovieCrawler 使用的解析：页面不完整或没有评分时返回 None"""
+    fields = extract_fields(html)
+
+    # 检查页面是否存在且有评分
+    rating = (fields['rating'] or '').strip()
+    if not rating:
+        return None  # 跳过没有评分的电影
+
+    try:
+        rating = float(rating)
+    except ValueError:
+        return None  # 如果评分无法转换为数字，跳过
+
+    try:
+        votes = int(fields['votes']) if fields['votes'] is not None else 0
+    except ValueError:
+        votes = 0
+
+    if fields['title'] is None:
+        return None
+
+    year = fields['year']
+    return {
+        'title': fields['title'],
+        'year': int(year) if year.isdigit() else 0,
+        'director': fields['director'],
+        'genres': fields['genres'],
+        'country': fields['country'],
+        'language': fields['language'],
+        'rating': rating,
+        'votes': votes,
+        'url': url
+    }
@@ -1,13 +1,34 @@
+import asyncio
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import time
 import random
 import json
-from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+if __name__ == "__main__":
+    # 直接运行本脚本时把 src/utils 加入搜索路径（python -m src 已经设置好）
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from detail_parser import parse_movie
+from record_log import DEFAULT_LOG_PATH, RecordLog
+from crawl_state import DEFAULT_STATE_PATH, CrawlState
+from url_index import DEFAULT_INDEX_PATH, SeenIndex
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache
+from concurrency_controller import AdaptiveController, classify
+from parse_stage import ParseStage
+from record_validator import DEFAULT_QUARANTINE_PATH, BatchValidator
+
+import metrics
 
 class DoubanMovieCrawler:
-    def __init__(self):
+    def __init__(self, log_path=DEFAULT_LOG_PATH, state_path=DEFAULT_STATE_PATH,
+                 index_path=DEFAULT_INDEX_PATH, cache_dir=DEFAULT_CACHE_DIR, offline=False,
+                 quarantine_path=DEFAULT_QUARANTINE_PATH):
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
@@ -22,58 +43,85 @@ class DoubanMovieCrawler:
         }
         self.search_url = "https://movie.douban.com/j/new_search_subjects"
         
-        # 加载已爬取的数据
-        try:
-            self.total_movies = pd.read_csv('data/raw/douban_movies_9000.csv').to_dict('records')
+        # 重放记录日志，恢复已爬取的数据
+        self.record_log = RecordLog(log_path)
+        self.total_movies = list(self.record_log.replay())
+        if self.total_movies:
             print(f"Loaded {len(self.total_movies)} existing records")
-        except:
-            self.total_movies = []
+        else:
             print("Starting fresh crawl")
+        
+        # 根据 403/429/超时自适应调整并发，线程池只是上限
+        self.controller = AdaptiveController(initial=3)
+        
+        # 入库前按批校验，缺失标题、年份或评分为 0 等记录进入隔离文件
+        self.validator = BatchValidator(quarantine_path=quarantine_path)
+        
+        # 详情页响应缓存，offline=True 时只从缓存回放
+        self.cache = ResponseCache(cache_dir, offline=offline)
+        
+        # 持久化的已爬取URL索引，与 FinalMovieCrawler 共用
+        self.crawled_urls = SeenIndex(index_path)
+        self.crawled_urls.add_many(movie['url'] for movie in self.total_movies if 'url' in movie)
+        
+        # 读取爬取前沿，续爬时不重复请求已完成的列表页和详情页
+        self.state = CrawlState(state_path)
+        if self.state.load():
+            print(f"Resuming from checkpoint: next start {self.state.next_start}, "
+                  f"{len(self.state.pending)} detail pages pending")
+            
+    def _checkpoint(self):
+        """先落盘记录日志，再原子写入爬取状态"""
+        self.record_log.sync()
+        self.crawled_urls.flush()
+        self.state.save()
+        self.controller.publish()
+            
+    def _validate(self):
+        """校验攒下的 (电影, url)，未通过的记为失败并写入隔离文件，返回通过的部分"""
+        accepted, rejected = self.validator.flush()
+        for movie, url, reasons in rejected:
+            self.state.mark_failed(url, 'invalid: ' + '; '.join(reasons), retry=False)
+            print(f"Quarantined {url}: {'; '.join(reasons)}")
+        return accepted
+
+    def parse_movie_detail(self, html, url=None):
+        """解析电影详情页"""
+        return parse_movie(html, url)
             
     def get_movie_detail(self, url, max_retries=3):
-        """获取电影详细信息，添加重试机制"""
+        """获取并解析电影详细信息"""
+        html = self.fetch_movie_detail(url, max_retries)
+        if html is None:
+            return None
+        try:
+            with metrics.span('parse'):
+                return self.parse_movie_detail(html, url)
+        except Exception as e:
+            print(f"Error parsing {url}: {e}")
+            return None
+    
+    def fetch_movie_detail(self, url, max_retries=3):
+        """下载详情页原始内容，添加重试机制；失败时返回 None"""
         for retry in range(max_retries):
             try:
                 self.headers['User-Agent'] = random.choice(self.user_agents)
-                response = requests.get(url, headers=self.headers)
+                with self.controller.slot() as slot, metrics.span('fetch', kind='detail'):
+                    response = self.cache.get(url, headers=self.headers)
+                    slot.outcome = 'cached' if response.from_cache or response.status_code is None \
+                        else classify(response.status_code)
+                metrics.inc('http_responses_total', kind='detail', status=slot.outcome)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 获取基本信息
-                    info = soup.find('div', id='info').text.strip()
-                    
-                    # 解析年份
-                    year = soup.find('span', class_='year').text.strip('()') if soup.find('span', class_='year') else ''
-                    
-                    # 解析导演
-                    director = info.split('导演: ')[1].split('\n')[0].strip() if '导演: ' in info else ''
-                    
-                    # 解析类型
-                    genres = info.split('类型:')[1].split('\n')[0].strip() if '类型:' in info else ''
-                    
-                    # 解析制片国家/地区
-                    country = info.split('制片国家/地区:')[1].split('\n')[0].strip() if '制片国家/地区:' in info else ''
-                    
-                    # 解析语言
-                    language = info.split('语言:')[1].split('\n')[0].strip() if '语言:' in info else ''
-                    
-                    # 获取评分和评价人数
-                    rating = soup.find('strong', class_='ll rating_num').text.strip() if soup.find('strong', class_='ll rating_num') else '0'
-                    votes = soup.find('span', property='v:votes').text if soup.find('span', property='v:votes') else '0'
-                    
-                    return {
-                        'title': soup.find('span', property='v:itemreviewed').text if soup.find('span', property='v:itemreviewed') else '',
-                        'year': int(year) if year.isdigit() else 0,
-                        'director': director,
-                        'genres': genres,
-                        'country': country,
-                        'language': language,
-                        'rating': float(rating),
-                        'votes': int(votes)
-                    }
+                    return response.text
+                if response.status_code is None:
+                    return None  # 只回放模式下缓存未命中
+                print(f"Status {response.status_code} for {url}, retry {retry + 1}/{max_retries}")
+                metrics.inc('retries_total', kind='detail')
+                time.sleep(self.controller.backoff(retry))
             except Exception as e:
                 print(f"Error getting movie detail: {e}, retry {retry + 1}/{max_retries}")
-                time.sleep(5 * (retry + 1))
+                metrics.inc('retries_total', kind='detail')
+                time.sleep(self.controller.backoff(retry))
         return None
     
     def get_movies(self, start, count=20, max_retries=3):
@@ -89,84 +137,220 @@ class DoubanMovieCrawler:
                     'limit': count
                 }
                 print(f"Requesting movies with params: {params}")  # 打印请求参数
-                response = requests.get(self.search_url, headers=self.headers, params=params)
+                with self.controller.slot() as slot, metrics.span('fetch', kind='list'):
+                    response = requests.get(self.search_url, headers=self.headers, params=params)
+                    slot.outcome = classify(response.status_code)
+                metrics.inc('http_responses_total', kind='list', status=slot.outcome)
                 print(f"Response status: {response.status_code}")  # 打印响应状态码
                 
                 if response.status_code == 200:
-                    data = response.json()
-                    print(f"Response data: {data}")  # 打印响应数据
-                    return data.get('data', [])
+                    return response.json().get('data', [])
                     
                 print(f"Retry {retry + 1}/{max_retries}, status code: {response.status_code}")
-                time.sleep(5 * (retry + 1))
+                metrics.inc('retries_total', kind='list')
+                time.sleep(self.controller.backoff(retry))
             except Exception as e:
                 print(f"Error fetching movies: {e}, retry {retry + 1}/{max_retries}")
-                time.sleep(5 * (retry + 1))
+                metrics.inc('retries_total', kind='list')
+                time.sleep(self.controller.backoff(retry))
         return []
 
-    def crawl_movies(self, total=10000):
-        """爬取指定数量的电影"""
+    def _produce_urls(self, start, batch_size, url_queue, stop, list_interval=(3, 5)):
+        """列表页生产者：持续获取列表页，将详情页URL放入有界队列"""
+        def put(urls):
+            for url in urls:
+                # 队列满时阻塞，起到背压作用
+                while not stop.is_set():
+                    try:
+                        url_queue.put(url, timeout=1)
+                        break
+                    except queue.Full:
+                        continue
+        
+        # 先处理上次中断时未完成的详情页
+        put(self.state.pending_urls())
+        while not stop.is_set():
+            try:
+                movies = self.get_movies(start, batch_size)
+                if not movies:
+                    print("No movies returned, sleeping for 30 seconds...")
+                    stop.wait(30)
+                    continue
+                
+                urls = [movie['url'] for movie in movies if movie['url'] not in self.crawled_urls]
+                put(self.state.add_page(start, urls, batch_size))
+                
+                start += batch_size
+                # 列表页请求之间休息（默认3-5秒），详情页抓取不受影响
+                stop.wait(random.uniform(*list_interval))
+                
+            except Exception as e:
+                print(f"Error occurred: {str(e)}")
+                print("Sleeping for 30 seconds before retry...")
+                stop.wait(30)
+
+    def crawl_movies(self, total=10000, max_workers=None, prefetch_pages=3, list_interval=(3, 5),
+                     parse_workers=None):
+        """爬取指定数量的电影
+        
+        列表页由独立的生产者线程提前预取（最多 prefetch_pages 页），
+        详情页线程池持续从队列中取URL并只负责下载，解析交给 ParseStage 进程池，
+        结果按完成顺序收集。
+        实际并发由 AdaptiveController 控制，max_workers 默认取其窗口上限；
+        parse_workers 为解析进程数（0 表示在主线程中解析）。
+        list_interval 为列表页请求之间的随机休息区间（秒）。
+        """
         remaining = total - len(self.total_movies)
         if remaining <= 0:
             print("Already have enough records")
             return pd.DataFrame(self.total_movies)
         
-        start = len(self.total_movies)
+        max_workers = max_workers or self.controller.max_window
+        start = self.state.next_start if self.state.pages_done else len(self.total_movies)
         batch_size = 10  # 每批10条
-        last_save_count = len(self.total_movies)
         
         print(f"Continuing crawl from position {start}, aiming for {remaining} more records")
-        print("Using optimized crawling strategy...")
+        print("Using pipelined crawling strategy...")
+        
+        url_queue = queue.Queue(maxsize=batch_size * prefetch_pages)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_urls,
+            args=(start, batch_size, url_queue, stop, list_interval),
+            daemon=True
+        )
+        producer.start()
         
-        with ThreadPoolExecutor(max_workers=3) as executor:  # 使用3个线程
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                ParseStage(parse_movie, parse_workers) as parser:
+            fetching = {}  # 下载中的 future -> url
+            parsing = {}   # 解析中的 future -> url
             while len(self.total_movies) < total:
-                try:
-                    # 获取单批次数据
-                    movies = self.get_movies(start, batch_size)
-                    if not movies:
-                        print("No movies returned, sleeping for 30 seconds...")
-                        time.sleep(30)
+                # 保持线程池满载
+                while (len(fetching) < max_workers * 2
+                       and len(self.total_movies) + self.validator.pending + len(fetching) + len(parsing) < total):
+                    try:
+                        url = url_queue.get(timeout=0.1 if fetching or parsing else 1)
+                    except queue.Empty:
+                        break
+                    self.state.mark_in_flight(url)
+                    fetching[executor.submit(self.fetch_movie_detail, url)] = url
+                
+                # 按完成顺序收集结果，单个慢页面不会阻塞其他结果
+                done = set()
+                if fetching or parsing:
+                    done, _ = wait(list(fetching) + list(parsing), timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetching:
+                        url = fetching.pop(future)
+                        html = future.result()
+                        if html is None:
+                            self.state.mark_failed(url)
+                            metrics.inc('failed_total')
+                        else:
+                            # 解析阶段在途页面已满时在此阻塞，下载随之暂停
+                            parsing[parser.submit(html, url)] = url
                         continue
                     
-                    # 并行处理电影
-                    futures = []
-                    for movie in movies:
-                        if len(self.total_movies) >= total:
-                            break
-                        futures.append(
-                            executor.submit(self.get_movie_detail, movie['url'])
-                        )
-                    
-                    # 收集结果
-                    for future in futures:
+                    url = parsing.pop(future)
+                    try:
                         movie_detail = future.result()
-                        if movie_detail and len(self.total_movies) < total:
-                            self.total_movies.append(movie_detail)
-                            current_count = len(self.total_movies)
-                            print(f"Crawled: {movie_detail['title']} ({current_count}/{total})")
-                            
-                            # 每50条保存一次
-                            if current_count % 50 == 0:
-                                df = pd.DataFrame(self.total_movies)
-                                save_path = f'data/raw/douban_movies_{current_count}.csv'
-                                df.to_csv(save_path, index=False, encoding='utf-8')
-                                print(f"Saved progress to {save_path}")
+                    except Exception as e:
+                        print(f"Error parsing {url}: {e}")
+                        movie_detail = None
+                    if movie_detail:
+                        self.validator.add(movie_detail, url)
+                    else:
+                        self.state.mark_failed(url)
+                        metrics.inc('failed_total')
                 
-                    start += batch_size
-                    # 每批次后休息3-5秒
-                    time.sleep(random.uniform(3, 5))
-                    
-                except Exception as e:
-                    print(f"Error occurred: {str(e)}")
-                    print("Sleeping for 30 seconds before retry...")
-                    time.sleep(30)
+                # 攒够一批或等待超时后整批校验入库；没有在途页面、或攒下的记录可能已够 total 时立即校验
+                pending = self.validator.pending
+                accepted = []
+                if self.validator.due() or (pending and (not fetching and not parsing
+                                                         or len(self.total_movies) + pending >= total)):
+                    accepted = self._validate()
+                for movie_detail, url in accepted:
+                    if len(self.total_movies) >= total:
+                        break
+                    with metrics.span('persist'):
+                        self.total_movies.append(movie_detail)
+                        self.record_log.append(movie_detail)
+                        self.crawled_urls.add(url)
+                        self.state.mark_done(url, movie_detail)
+                    metrics.inc('movies_total')
+                    current_count = len(self.total_movies)
+                    print(f"Crawled: {movie_detail['title']} ({current_count}/{total})")
+                
+                if self.state.due():
+                    with metrics.span('checkpoint'):
+                        self._checkpoint()
+            
+            stop.set()
+            for future in list(fetching) + list(parsing):
+                future.cancel()
+        
+        self._checkpoint()
         
-        # 保存最终数据
-        df = pd.DataFrame(self.total_movies)
-        df.to_csv('data/raw/douban_movies_final.csv', index=False, encoding='utf-8')
+        # 由记录日志生成最终数据
+        df = self.record_log.compact('data/raw/douban_movies_final.csv')
+        print(f"Successfully crawled {len(self.total_movies)} movies!")
+        return df
+
+    def crawl_movies_async(self, total=10000, parse_workers=None, **engine_options):
+        """使用 asyncio 引擎爬取指定数量的电影
+
+        详情页在 ParseStage 进程池中解析，不阻塞事件循环（parse_workers=0 时在事件循环中解析）。
+        engine_options 透传给 AsyncCrawlEngine（pool_size、per_host_limit、rate 等）。
+        """
+        # aiohttp 只在异步爬取时导入，线程版爬虫启动时不必加载
+        from async_engine import AsyncCrawlEngine
+
+        remaining = total - len(self.total_movies)
+        if remaining <= 0:
+            print("Already have enough records")
+            return pd.DataFrame(self.total_movies)
+        engine_options.setdefault('search_url', self.search_url)
+        engine_options.setdefault('cache', self.cache)
+        engine_options.setdefault('controller', self.controller)
+
+        def on_movie(movie, url):
+            with metrics.span('persist'):
+                self.total_movies.append(movie)
+                self.record_log.append(movie)
+                self.crawled_urls.add(url)
+            metrics.inc('movies_total')
+            print(f"Crawled: {movie['title']} ({len(self.total_movies)}/{total})")
+            if self.state.due():
+                with metrics.span('checkpoint'):
+                    self._checkpoint()
+
+        async def run():
+            async with AsyncCrawlEngine(self.user_agents, self.headers, **engine_options) as engine:
+                await engine.crawl(
+                    parser,
+                    total=remaining,
+                    start=start,
+                    skip_url=lambda url: url in self.crawled_urls,
+                    on_movie=on_movie,
+                    state=self.state,
+                    validator=self.validator
+                )
+
+        start = self.state.next_start if self.state.pages_done else len(self.total_movies)
+        print(f"Continuing async crawl from position {start}, aiming for {remaining} more records")
+        with ParseStage(parse_movie, parse_workers) as parser:
+            asyncio.run(run())
+        self._checkpoint()
+
+        df = self.record_log.compact('data/raw/douban_movies_final.csv')
         print(f"Successfully crawled {len(self.total_movies)} movies!")
         return df
 
 if __name__ == "__main__":
-    crawler = DoubanMovieCrawler()
-    movies_df = crawler.crawl_movies(total=10000)
\ No newline at end of file
+    metrics.enable_from_env()
+    try:
+        crawler = DoubanMovieCrawler()
+        movies_df = crawler.crawl_movies(total=10000)
+    finally:
+        metrics.disable()
\ No newline at end of file
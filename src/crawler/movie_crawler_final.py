@@ -1,17 +1,35 @@
+import asyncio
+import os
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+import sys
 import time
 import random
 from concurrent.futures import ThreadPoolExecutor
 import concurrent.futures
 import urllib3
 
+if __name__ == "__main__":
+    # 直接运行本脚本时把 src/utils 加入搜索路径（python -m src 已经设置好）
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from detail_parser import parse_rated_movie
+from record_log import DEFAULT_LOG_PATH, RecordLog
+from crawl_state import DEFAULT_STATE_PATH, CrawlState
+from url_index import DEFAULT_INDEX_PATH, SeenIndex
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache
+from concurrency_controller import AdaptiveController, classify
+from parse_stage import ParseStage
+from record_validator import DEFAULT_QUARANTINE_PATH, BatchValidator
+
+import metrics
+
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class FinalMovieCrawler:
-    def __init__(self):
+    def __init__(self, log_path=DEFAULT_LOG_PATH, state_path=DEFAULT_STATE_PATH,
+                 index_path=DEFAULT_INDEX_PATH, cache_dir=DEFAULT_CACHE_DIR, offline=False,
+                 quarantine_path=DEFAULT_QUARANTINE_PATH):
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
@@ -23,19 +41,71 @@ class FinalMovieCrawler:
             'User-Agent': random.choice(self.user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
         }
+        self.search_url = "https://movie.douban.com/j/new_search_subjects"
         
-        # 加载9000条数据
-        self.total_movies = pd.read_csv('data/raw/douban_movies_9000.csv').to_dict('records')
+        # 重放记录日志，恢复已爬取的数据
+        self.record_log = RecordLog(log_path)
+        self.total_movies = list(self.record_log.replay())
         print(f"Loaded {len(self.total_movies)} existing records")
         
-        # 记录已爬取的URL，避免重复
-        self.crawled_urls = set()
-        for movie in self.total_movies:
-            if 'url' in movie:
-                self.crawled_urls.add(movie['url'])
+        # 根据 403/429/超时自适应调整并发
+        self.controller = AdaptiveController(initial=15)
+        
+        # 入库前按批校验，年份缺失、评分越界等记录进入隔离文件
+        self.validator = BatchValidator(quarantine_path=quarantine_path)
+        
+        # 详情页响应缓存，offline=True 时只从缓存回放
+        self.cache = ResponseCache(cache_dir, offline=offline)
+        
+        # 持久化的已爬取URL索引，避免重复（重启和删除url列后依然有效）
+        self.crawled_urls = SeenIndex(index_path)
+        self.crawled_urls.add_many(movie['url'] for movie in self.total_movies if 'url' in movie)
+        
+        # 读取爬取前沿，续爬时不重复请求已完成的列表页和详情页
+        self.state = CrawlState(state_path)
+        if self.state.load():
+            print(f"Resuming from checkpoint: next start {self.state.next_start}, "
+                  f"{len(self.state.pending)} detail pages pending")
+    
+    def _checkpoint(self):
+        """先落盘记录日志，再原子写入爬取状态"""
+        self.record_log.sync()
+        self.crawled_urls.flush()
+        self.state.save()
+        self.controller.publish()
+    
+    def _validate(self, parsed):
+        """校验一批 (电影, url)，未通过的记为失败并写入隔离文件，返回通过的部分"""
+        if not parsed:
+            return []
+        movies, urls = map(list, zip(*parsed))
+        accepted, rejected = self.validator.validate(movies, urls)
+        for movie, url, reasons in rejected:
+            self.state.mark_failed(url, 'invalid: ' + '; '.join(reasons), retry=False)
+            print(f"Quarantined {url}: {'; '.join(reasons)}")
+        return accepted
+    
+    def parse_movie_detail(self, html, url):
+        """解析电影详情页，页面不完整或没有评分时返回 None"""
+        return parse_rated_movie(html, url)
     
     def get_movie_detail(self, url):
-        """获取电影详细信息"""
+        """获取并解析电影详细信息"""
+        html = self.fetch_movie_detail(url)
+        if html is None:
+            return None
+        try:
+            with metrics.span('parse'):
+                movie = self.parse_movie_detail(html, url)
+        except Exception as e:
+            print(f"Error parsing {url}: {e}")
+            return None
+        if movie:
+            self.crawled_urls.add(url)
+        return movie
+    
+    def fetch_movie_detail(self, url):
+        """下载详情页原始内容；已爬取或失败时返回 None"""
         if url in self.crawled_urls:
             return None
         
@@ -44,143 +114,205 @@ class FinalMovieCrawler:
             try:
                 self.headers['User-Agent'] = random.choice(self.user_agents)
                 # 禁用SSL验证，添加超时设置
-                response = requests.get(
-                    url, 
-                    headers=self.headers, 
-                    verify=False,  # 禁用SSL验证
-                    timeout=10     # 设置超时
-                )
+                with self.controller.slot() as slot, metrics.span('fetch', kind='detail'):
+                    response = self.cache.get(
+                        url, 
+                        headers=self.headers, 
+                        verify=False,  # 禁用SSL验证
+                        timeout=10     # 设置超时
+                    )
+                    slot.outcome = 'cached' if response.from_cache or response.status_code is None \
+                        else classify(response.status_code)
+                metrics.inc('http_responses_total', kind='detail', status=slot.outcome)
                 
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 检查页面是否存在且有评分
-                    rating_element = soup.find('strong', class_='ll rating_num')
-                    if not rating_element or not rating_element.text.strip():
-                        return None  # 跳过没有评分的电影
-                        
-                    info = soup.find('div', id='info').text.strip()
-                    year = soup.find('span', class_='year')
-                    year = year.text.strip('()') if year else ''
-                    
-                    try:
-                        director = info.split('导演: ')[1].split('\n')[0].strip()
-                    except:
-                        director = ''
-                        
-                    try:
-                        genres = info.split('类型:')[1].split('\n')[0].strip()
-                    except:
-                        genres = ''
-                        
-                    try:
-                        country = info.split('制片国家/地区:')[1].split('\n')[0].strip()
-                    except:
-                        country = ''
-                        
-                    try:
-                        language = info.split('语言:')[1].split('\n')[0].strip()
-                    except:
-                        language = ''
-                        
-                    try:
-                        rating = float(rating_element.text.strip())
-                    except:
-                        return None  # 如果评分无法转换为数字，跳过
-                        
-                    try:
-                        votes = soup.find('span', property='v:votes')
-                        votes = int(votes.text) if votes else 0
-                    except:
-                        votes = 0
-                        
-                    title_element = soup.find('span', property='v:itemreviewed')
-                    if not title_element:
-                        return None
-                        
-                    self.crawled_urls.add(url)
-                    return {
-                        'title': title_element.text,
-                        'year': int(year) if year.isdigit() else 0,
-                        'director': director,
-                        'genres': genres,
-                        'country': country,
-                        'language': language,
-                        'rating': rating,
-                        'votes': votes,
-                        'url': url
-                    }
+                if response.status_code is None:
+                    return None  # 只回放模式下缓存未命中
+                elif response.status_code == 200:
+                    return response.text
                 elif response.status_code == 403:
                     print(f"Access denied for {url}, sleeping...")
-                    time.sleep(5)
+                    metrics.inc('retries_total', kind='detail')
+                    time.sleep(self.controller.backoff(retry))
                 else:
                     print(f"Status {response.status_code} for {url}, retry {retry + 1}")
-                    time.sleep(2)
+                    metrics.inc('retries_total', kind='detail')
+                    time.sleep(self.controller.backoff(retry))
                 
             except (requests.exceptions.SSLError, 
                     requests.exceptions.ConnectionError,
                     requests.exceptions.Timeout) as e:
                 print(f"Network error for {url}: {str(e)}, retry {retry + 1}/{max_retries}")
-                time.sleep(2 * (retry + 1))
+                metrics.inc('retries_total', kind='detail')
+                time.sleep(self.controller.backoff(retry))
             except Exception as e:
                 print(f"Error for {url}: {str(e)}")
-                time.sleep(2)
+                metrics.inc('retries_total', kind='detail')
+                time.sleep(self.controller.backoff(retry))
         return None
 
-    def crawl_final_batch(self):
-        """爬取最后800条数据"""
-        target = 10000
-        search_url = "https://movie.douban.com/j/new_search_subjects"
+    def crawl_final_batch(self, target=10000, batch_interval=(1, 2), parse_workers=None):
+        """爬取最后800条数据，batch_interval 为每批之间的随机休息区间（秒）
         
-        with ThreadPoolExecutor(max_workers=15) as executor:
+        下载线程只获取页面内容，解析交给 ParseStage 进程池（parse_workers=0 时在主线程中解析），
+        页面一下载完成就提交解析，下载与解析重叠进行。
+        """
+        
+        start = self.state.next_start if self.state.pages_done else len(self.total_movies)
+        # 先处理上次中断时未完成的详情页
+        urls = self.state.pending_urls()
+        
+        # 线程池只是上限，实际并发由 AdaptiveController 控制
+        with ThreadPoolExecutor(max_workers=self.controller.max_window) as executor, \
+                ParseStage(parse_rated_movie, parse_workers) as parser:
             while len(self.total_movies) < target:
                 try:
-                    # 使用搜索API获取电影列表
-                    params = {
-                        'sort': 'rating',
-                        'range': '0,10',
-                        'tags': '电影',
-                        'start': len(self.total_movies),
-                        'limit': 50
-                    }
-                    
-                    self.headers['User-Agent'] = random.choice(self.user_agents)
-                    response = requests.get(search_url, headers=self.headers, params=params)
-                    
-                    if response.status_code == 200:
+                    if not urls:
+                        # 使用搜索API获取电影列表
+                        params = {
+                            'sort': 'rating',
+                            'range': '0,10',
+                            'tags': '电影',
+                            'start': start,
+                            'limit': 50
+                        }
+                        
+                        self.headers['User-Agent'] = random.choice(self.user_agents)
+                        with metrics.span('fetch', kind='list'):
+                            response = requests.get(self.search_url, headers=self.headers, params=params)
+                        metrics.inc('http_responses_total', kind='list', status=classify(response.status_code))
+                        
+                        if response.status_code != 200:
+                            metrics.inc('retries_total', kind='list')
+                            time.sleep(random.uniform(1, 2))
+                            continue
+                        
                         movies = response.json().get('data', [])
                         if not movies:
                             print("No more movies returned")
                             break
                         
-                        futures = []
-                        for movie in movies:
-                            if len(self.total_movies) >= target:
-                                break
-                            futures.append(
-                                executor.submit(self.get_movie_detail, movie['url'])
-                            )
-                        
-                        for future in concurrent.futures.as_completed(futures):
+                        urls = self.state.add_page(
+                            start,
+                            [movie['url'] for movie in movies if movie['url'] not in self.crawled_urls],
+                            50
+                        )
+                        start += 50
+                    
+                    fetching = {}
+                    for url in urls:
+                        if len(self.total_movies) >= target:
+                            break
+                        self.state.mark_in_flight(url)
+                        fetching[executor.submit(self.fetch_movie_detail, url)] = url
+                    urls = []
+                    
+                    # 页面下载完成即提交解析；解析阶段已满时在此阻塞
+                    parsing = {}
+                    for future in concurrent.futures.as_completed(fetching):
+                        url = fetching[future]
+                        html = future.result()
+                        if html is None:
+                            self.state.mark_failed(url)
+                            metrics.inc('failed_total')
+                        else:
+                            parsing[parser.submit(html, url)] = url
+                    
+                    parsed = []
+                    for future in concurrent.futures.as_completed(parsing):
+                        url = parsing[future]
+                        try:
                             movie_detail = future.result()
-                            if movie_detail and len(self.total_movies) < target:
-                                self.total_movies.append(movie_detail)
-                                current_count = len(self.total_movies)
-                                print(f"Crawled: {movie_detail['title']} ({current_count}/{target})")
-                
-                    time.sleep(random.uniform(1, 2))
+                        except Exception as e:
+                            print(f"Error parsing {url}: {e}")
+                            movie_detail = None
+                        if movie_detail:
+                            parsed.append((movie_detail, url))
+                        else:
+                            self.state.mark_failed(url)
+                            metrics.inc('failed_total')
+                    
+                    # 整批校验后入库
+                    for movie_detail, url in self._validate(parsed):
+                        if len(self.total_movies) >= target:
+                            break
+                        with metrics.span('persist'):
+                            self.total_movies.append(movie_detail)
+                            self.record_log.append(movie_detail)
+                            self.crawled_urls.add(url)
+                            self.state.mark_done(url, movie_detail)
+                        metrics.inc('movies_total')
+                        current_count = len(self.total_movies)
+                        print(f"Crawled: {movie_detail['title']} ({current_count}/{target})")
+                    
+                    if self.state.due():
+                        with metrics.span('checkpoint'):
+                            self._checkpoint()
+                    time.sleep(random.uniform(*batch_interval))
                     
                 except Exception as e:
                     print(f"Error occurred: {str(e)}")
                     time.sleep(5)
                     continue
             
-            # 只在最后保存一次
-            df = pd.DataFrame(self.total_movies)
-            df.to_csv('data/raw/douban_movies_final.csv', index=False, encoding='utf-8')
+            self._checkpoint()
+            
+            # 由记录日志生成最终数据
+            df = self.record_log.compact('data/raw/douban_movies_final.csv')
             print(f"Successfully crawled all {len(self.total_movies)} movies!")
             return df
 
+    def crawl_final_batch_async(self, target=10000, parse_workers=None, **engine_options):
+        """使用 asyncio 引擎补齐剩余数据
+
+        详情页在 ParseStage 进程池中解析，不阻塞事件循环（parse_workers=0 时在事件循环中解析）。
+        engine_options 透传给 AsyncCrawlEngine（pool_size、per_host_limit、rate 等）。
+        """
+        # aiohttp 只在异步爬取时导入，线程版爬虫启动时不必加载
+        from async_engine import AsyncCrawlEngine
+
+        engine_options.setdefault('search_url', self.search_url)
+        engine_options.setdefault('pool_size', 15)
+        engine_options.setdefault('verify_ssl', False)
+        engine_options.setdefault('cache', self.cache)
+        engine_options.setdefault('controller', self.controller)
+
+        def on_movie(movie, url):
+            with metrics.span('persist'):
+                self.total_movies.append(movie)
+                self.record_log.append(movie)
+                self.crawled_urls.add(url)
+            metrics.inc('movies_total')
+            print(f"Crawled: {movie['title']} ({len(self.total_movies)}/{target})")
+            if self.state.due():
+                with metrics.span('checkpoint'):
+                    self._checkpoint()
+
+        async def run():
+            async with AsyncCrawlEngine(self.user_agents, self.headers, **engine_options) as engine:
+                await engine.crawl(
+                    parser,
+                    total=target - len(self.total_movies),
+                    start=self.state.next_start if self.state.pages_done else len(self.total_movies),
+                    batch_size=50,
+                    skip_url=lambda url: url in self.crawled_urls,
+                    on_movie=on_movie,
+                    state=self.state,
+                    validator=self.validator
+                )
+
+        if len(self.total_movies) < target:
+            with ParseStage(parse_rated_movie, parse_workers) as parser:
+                asyncio.run(run())
+            self._checkpoint()
+
+        df = self.record_log.compact('data/raw/douban_movies_final.csv')
+        print(f"Successfully crawled all {len(self.total_movies)} movies!")
+        return df
+
 if __name__ == "__main__":
-    crawler = FinalMovieCrawler()
-    movies_df = crawler.crawl_final_batch() 
\ No newline at end of file
+    metrics.enable_from_env()
+    try:
+        crawler = FinalMovieCrawler()
+        movies_df = crawler.crawl_final_batch()
+    finally:
+        metrics.disable() 
\ No newline at end of file
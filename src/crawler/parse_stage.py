@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import metrics
+
+
+def default_workers():
+    """默认解析进程数：留一个核给网络线程和主循环；单核机器上进程池只有开销，直接解析"""
+    return max(0, (os.cpu_count() or 1) - 1)
+
+
+def _timed(parse, html, url):
+    # 在工作进程中计时，解析耗时由主进程记录到指标
+    begin = time.perf_counter()
+    movie = parse(html, url)
+    return movie, time.perf_counter() - begin
+
+
+class ParseStage:
+    """详情页解析阶段，与网络抓取线程分离
+
+    网络线程只下载原始页面，BeautifulSoup/lxml 解析在独立的进程池中进行，
+    不再与下载线程争抢 GIL。两个阶段的规模互相独立：
+    抓取并发由 AdaptiveController 控制，解析并发由 workers 决定。
+
+    - parse(html, url) 必须定义在模块顶层（需要序列化到子进程）
+    - 在途页面达到 max_pending 时 submit() 阻塞，形成对抓取阶段的背压
+    - workers=0 时在调用线程中直接解析（原来的行为）
+    - 子进程使用 spawn 启动，避免在已有多个线程的进程中 fork
+    """
+
+    def __init__(self, parse, workers=None, max_pending=None):
+        self.parse = parse
+        self.workers = default_workers() if workers is None else workers
+        self.max_pending = max_pending or max(1, self.workers) * 4
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._async_slots = None
+        self.executor = None
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def submit(self, html, url):
+        """提交一个页面，返回结果为电影字典（或 None）的 Future"""
+        with metrics.span('parse_wait'):
+            self._slots.acquire()
+        result = Future()
+        if self.executor is None:
+            try:
+                result.set_result(self._deliver(*_timed(self.parse, html, url)))
+            except Exception as e:
+                result.set_exception(e)
+            finally:
+                self._slots.release()
+            return result
+
+        def done(future):
+            self._slots.release()
+            if future.cancelled():
+                result.cancel()
+            elif future.exception() is not None:
+                result.set_exception(future.exception())
+            else:
+                result.set_result(self._deliver(*future.result()))
+
+        self.executor.submit(_timed, self.parse, html, url).add_done_callback(done)
+        return result
+
+    async def submit_async(self, html, url):
+        """协程版本，在途页面过多时挂起而不是阻塞事件循环"""
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_pending)
+        async with self._async_slots:
+            if self.executor is None:
+                return self.submit(html, url).result()
+            return await asyncio.wrap_future(self.submit(html, url))
+
+    @staticmethod
+    def _deliver(movie, seconds):
+        metrics.observe('parse_seconds', seconds)
+        return movie
@@ -0,0 +1,121 @@
+import json
+import os
+
+DEFAULT_LOG_PATH = 'data/raw/movie_records.jsonl'
+
+
+class RecordLog:
+    """只追加的 JSONL 记录日志
+
+    每条电影记录写成一行 JSON，按批次 fsync，替代每 50 条重写一次完整 CSV。
+    断点续爬时重放日志，最终结果由 compact() 生成。
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH, sync_every=50):
+        self.path = path
+        self.sync_every = sync_every
+        self._file = None
+        self._unsynced = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _repair_tail(self):
+        """截掉崩溃时写了一半的最后一行"""
+        with open(self.path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                step = min(65536, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    pos += newline + 1
+                    break
+            if pos != end:
+                print(f"Truncating partial record at end of {self.path}")
+                f.truncate(pos)
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            if os.path.exists(self.path):
+                self._repair_tail()
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def append(self, record):
+        """追加一条记录，每 sync_every 条 fsync 一次"""
+        f = self._open()
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """将缓冲区写入磁盘"""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def replay(self):
+        """按写入顺序逐条返回日志中的记录，忽略不完整的最后一行"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    print(f"Skipping corrupt record in {self.path}")
+
+    def import_csv(self, csv_path):
+        """将旧的 CSV 快照导入日志（一次性迁移用）"""
+        import pandas as pd
+
+        df = pd.read_csv(csv_path, encoding='utf-8')
+        for record in df.to_dict('records'):
+            self.append({k: v for k, v in record.items() if not pd.isna(v)})
+        self.sync()
+        return len(df)
+
+    def compact(self, out_path='data/raw/douban_movies_final.csv', dedup_key='url'):
+        """重放日志生成最终数据表
+
+        Args:
+            out_path (str): 输出 CSV 路径
+            dedup_key (str): 存在该列时按其去重，保留最后一次写入
+
+        Returns:
+            DataFrame: 压缩后的数据
+        """
+        import pandas as pd
+
+        self.sync()
+        df = pd.DataFrame(list(self.replay()))
+        if dedup_key in df.columns:
+            has_key = df[dedup_key].notna()
+            df = pd.concat([
+                df[has_key].drop_duplicates(subset=dedup_key, keep='last'),
+                df[~has_key]
+            ]).sort_index()
+
+        # 先写临时文件再替换，避免中途失败留下半个文件
+        tmp_path = out_path + '.tmp'
+        df.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, out_path)
+        return df
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_CACHE_DIR = 'data/cache'
+
+CacheEntry = namedtuple('CacheEntry', ['url', 'digest', 'etag', 'last_modified', 'fetched_at'])
+CachedResponse = namedtuple('CachedResponse', ['status_code', 'text', 'from_cache'])
+
+
+class ResponseCache:
+    """本地 HTTP 响应缓存（按内容寻址）
+
+    - 响应体按 sha256 存放在 objects/ 下，相同内容只保存一份
+    - 索引保存在 SQLite 中，超过 max_bytes 时按最近访问时间淘汰（LRU）
+    - 超过 ttl 的条目用 ETag/Last-Modified 做条件请求，304 时直接复用
+    - offline=True 为只回放模式：只读缓存，不访问网络
+
+    命中/未命中等计数见 stats()。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=1 << 30,
+                 ttl=7 * 24 * 3600, offline=False):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+        self._db.commit()
+        self.total_bytes = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY digest)'
+        ).fetchone()[0]
+
+        self.counters = dict.fromkeys(
+            ['hits', 'misses', 'stale', 'revalidated', 'stores', 'evictions'], 0)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def lookup(self, url):
+        """返回 (条目, 是否新鲜)，没有缓存时返回 (None, False)"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, digest, etag, last_modified, fetched_at FROM entries WHERE url = ?',
+                (url,)).fetchone()
+            if row is None or not os.path.exists(self._object_path(row[1])):
+                self.counters['misses'] += 1
+                return None, False
+            entry = CacheEntry(*row)
+            fresh = self.offline or time.time() - entry.fetched_at < self.ttl
+            self.counters['hits' if fresh else 'stale'] += 1
+            self._db.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (time.time(), url))
+            self._db.commit()
+        return entry, fresh
+
+    def read(self, entry):
+        with open(self._object_path(entry.digest), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    @staticmethod
+    def conditional_headers(entry):
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def revalidated(self, url):
+        """服务器返回 304 时刷新条目的获取时间"""
+        with self._lock:
+            now = time.time()
+            self._db.execute(
+                'UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+            self._db.commit()
+            self.counters['revalidated'] += 1
+
+    def store(self, url, text, headers=None):
+        """保存 200 响应，必要时淘汰最久未访问的条目"""
+        body = text.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        headers = headers or {}
+
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f'{path}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+                self.total_bytes += len(body)
+
+            old = self._db.execute('SELECT digest FROM entries WHERE url = ?', (url,)).fetchone()
+            now = time.time()
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, digest, len(body), headers.get('ETag'), headers.get('Last-Modified'), now, now))
+            if old and old[0] != digest:
+                self._drop_object_if_unused(old[0])
+            self.counters['stores'] += 1
+            self._evict()
+            self._db.commit()
+
+    def _drop_object_if_unused(self, digest):
+        if self._db.execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone():
+            return
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            self.total_bytes -= os.path.getsize(path)
+            os.remove(path)
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            row = self._db.execute(
+                'SELECT url, digest FROM entries ORDER BY accessed_at LIMIT 1').fetchone()
+            if row is None:
+                break
+            self._db.execute('DELETE FROM entries WHERE url = ?', (row[0],))
+            self._drop_object_if_unused(row[1])
+            self.counters['evictions'] += 1
+
+    def get(self, url, headers=None, **kwargs):
+        """带缓存的 requests.get，返回 CachedResponse(status_code, text, from_cache)
+
+        只回放模式下未命中返回状态码 None，不访问网络。
+        kwargs 透传给 requests.get（timeout、verify 等）。
+        """
+        entry, fresh = self.lookup(url)
+        if entry and fresh:
+            return CachedResponse(200, self.read(entry), True)
+        if self.offline:
+            return CachedResponse(None, None, False)
+
+        import requests
+
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update(self.conditional_headers(entry))
+        response = requests.get(url, headers=request_headers, **kwargs)
+        if response.status_code == 304 and entry:
+            self.revalidated(url)
+            return CachedResponse(200, self.read(entry), True)
+        if response.status_code == 200:
+            self.store(url, response.text, response.headers)
+        return CachedResponse(response.status_code, response.text, False)
+
+    def items(self, pattern='/subject/'):
+        """遍历缓存中 URL 包含 pattern 的页面，返回 (url, html)，用于离线重新解析"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT url, digest, etag, last_modified, fetched_at FROM entries WHERE url LIKE ?',
+                (f'%{pattern}%',)).fetchall()
+        for row in rows:
+            entry = CacheEntry(*row)
+            try:
+                yield entry.url, self.read(entry)
+            except OSError:
+                continue
+
+    def stats(self):
+        """返回计数器、条目数和占用字节数"""
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        lookups = self.counters['hits'] + self.counters['misses'] + self.counters['stale']
+        return dict(self.counters, entries=entries, bytes=self.total_bytes,
+                    hit_rate=self.counters['hits'] / lookups if lookups else 0.0)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
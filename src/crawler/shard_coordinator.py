@@ -0,0 +1,484 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+if __name__ == "__main__":
+    # 直接运行本脚本时把 src/utils 加入搜索路径（python -m src 已经设置好）
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from concurrency_controller import AdaptiveController, classify
+from detail_parser import parse_rated_movie
+from record_log import DEFAULT_LOG_PATH, RecordLog
+from record_validator import DEFAULT_QUARANTINE_PATH, BatchValidator
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache
+from url_index import DEFAULT_INDEX_PATH, SeenIndex, subject_key
+
+import metrics
+
+DEFAULT_QUEUE_PATH = 'data/raw/shards.sqlite'
+SEARCH_URL = "https://movie.douban.com/j/new_search_subjects"
+
+# 评分区间；相邻区间在边界上可能重叠，重复的电影在入库时去掉
+RATING_RANGES = ('0,6', '6,7', '7,7.5', '7.5,8', '8,8.5', '8.5,9', '9,10')
+# rating 为原爬虫使用的排序参数；T 为标记最多，R 为最新上映
+SORTS = ('rating', 'T', 'R')
+GENRES = ('剧情', '喜剧', '动作', '爱情', '科幻', '动画', '悬疑', '惊悚', '恐怖', '犯罪', '纪录片', '战争')
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/89.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:89.0) Firefox/89.0'
+]
+
+
+def plan_shards(sorts=SORTS, ranges=RATING_RANGES, tags=None):
+    """把搜索空间切分为 (排序, 评分区间, 标签) 的组合，每个组合是一个独立的列表游标"""
+    if tags is None:
+        tags = ['电影'] + [f'电影,{genre}' for genre in GENRES]
+    return [{'sort': sort, 'range': rating_range, 'tags': tag}
+            for sort in sorts for rating_range in ranges for tag in tags]
+
+
+def default_owner():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class ShardQueue:
+    """基于 SQLite 的分片工作队列
+
+    - shards：每个分片的列表游标 next_start 与租约（owner、lease_expires）
+    - urls：详情页认领表，同一部电影只由一个 worker 抓取；认领超过租约时间未完成的可以被重新认领
+    - movies：以豆瓣 subject ID 为主键的结果表，不同分片得到的同一部电影只保留一条
+
+    worker 取得租约后逐页爬取，每页的结果与游标前进在同一个事务中提交；
+    worker 崩溃时租约过期，分片由其他 worker 从最后提交的位置继续。
+    列表页连续 max_attempts 次取不到的分片停放为 failed，不再被领取；
+    未通过校验的详情页记为 invalid 并保存原因，不再被认领。
+    同一台机器上的多个进程共用一个数据库文件（WAL 模式）。WAL 依赖共享内存，
+    数据库文件不能放在网络文件系统上供多台机器同时使用。
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=120, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS shards (
+                id INTEGER PRIMARY KEY,
+                sort TEXT NOT NULL,
+                range TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                next_start INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_expires REAL,
+                pages INTEGER NOT NULL DEFAULT 0,
+                movies INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (sort, range, tags)
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                subject INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                claimed_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                reason TEXT
+            );
+            CREATE TABLE IF NOT EXISTS movies (
+                subject INTEGER PRIMARY KEY,
+                shard INTEGER,
+                record TEXT NOT NULL,
+                merged INTEGER NOT NULL DEFAULT 0
+            );
+        ''')
+        # 旧版本创建的队列没有这些列
+        self._add_column('shards', 'failures INTEGER NOT NULL DEFAULT 0')
+        self._add_column('urls', 'reason TEXT')
+
+    def _add_column(self, table, definition):
+        columns = {row[1] for row in self._db.execute(f'PRAGMA table_info({table})')}
+        if definition.split()[0] in columns:
+            return
+        try:
+            self._db.execute(f'ALTER TABLE {table} ADD COLUMN {definition}')
+        except sqlite3.OperationalError as e:
+            # 另一个进程同时加上了这一列
+            if 'duplicate column' not in str(e):
+                raise
+
+    def close(self):
+        self._db.close()
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE 立即取得写锁，多个进程同时领取分片时不会拿到同一个
+        self._db.execute('BEGIN IMMEDIATE')
+        return self._db
+
+    def add_shards(self, shards):
+        """加入分片，已存在的组合保持原有进度；返回新加入的数量"""
+        before = self._db.execute('SELECT COUNT(*) FROM shards').fetchone()[0]
+        db = self._transaction()
+        try:
+            db.executemany('INSERT OR IGNORE INTO shards (sort, range, tags) VALUES (?, ?, ?)',
+                           [(s['sort'], s['range'], s['tags']) for s in shards])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return self._db.execute('SELECT COUNT(*) FROM shards').fetchone()[0] - before
+
+    def lease(self, owner):
+        """领取一个待处理或租约已过期的分片，没有可领取的分片时返回 None"""
+        now = time.time()
+        db = self._transaction()
+        try:
+            row = db.execute('''
+                SELECT id, sort, range, tags, next_start FROM shards
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY failures, pages, id LIMIT 1''', (now,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE shards SET status = 'leased', owner = ?, lease_expires = ? WHERE id = ?",
+                           (owner, now + self.lease_seconds, row[0]))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        if row is None:
+            return None
+        return dict(zip(('id', 'sort', 'range', 'tags', 'next_start'), row))
+
+    def heartbeat(self, shard_id, owner):
+        """延长租约；租约已被他人接管时返回 False"""
+        cursor = self._db.execute(
+            "UPDATE shards SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, shard_id, owner))
+        return cursor.rowcount == 1
+
+    def fail_page(self, shard_id, owner):
+        """记录一次取不到列表页；连续失败 max_attempts 次的分片停放为 failed
+
+        Returns:
+            bool: 租约是否仍由 owner 持有（分片被停放时为 False）
+        """
+        db = self._transaction()
+        try:
+            db.execute("UPDATE shards SET failures = failures + 1 WHERE id = ? AND owner = ? AND status = 'leased'",
+                       (shard_id, owner))
+            db.execute('''
+                UPDATE shards SET status = 'failed', owner = NULL, lease_expires = NULL
+                WHERE id = ? AND owner = ? AND status = 'leased' AND failures >= ?''',
+                (shard_id, owner, self.max_attempts))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return self.heartbeat(shard_id, owner)
+
+    def release(self, shard_id, owner):
+        """归还未完成的分片"""
+        self._db.execute(
+            "UPDATE shards SET status = 'pending', owner = NULL, lease_expires = NULL "
+            "WHERE id = ? AND owner = ? AND status = 'leased'", (shard_id, owner))
+
+    def claim(self, owner, urls):
+        """认领详情页，返回本 worker 应当抓取的 URL
+
+        已完成、已被他人认领且未超时、或失败次数达到上限的 URL 不会返回。
+        """
+        now = time.time()
+        rows = [(subject_key(url), url) for url in urls]
+        db = self._transaction()
+        try:
+            db.executemany("INSERT OR IGNORE INTO urls (subject, url, status) VALUES (?, ?, 'new')", rows)
+            db.executemany('''
+                UPDATE urls SET status = 'claimed', owner = ?, claimed_at = ?, attempts = attempts + 1
+                WHERE subject = ? AND attempts < ? AND (
+                    status = 'new' OR status = 'failed'
+                    OR (status = 'claimed' AND claimed_at < ?))''',
+                [(owner, now, subject, self.max_attempts, now - self.lease_seconds) for subject, _ in rows])
+            claimed = {subject for (subject,) in db.execute(
+                "SELECT subject FROM urls WHERE owner = ? AND claimed_at = ? AND status = 'claimed'", (owner, now))}
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return [url for subject, url in rows if subject in claimed]
+
+    def commit_page(self, shard_id, owner, next_start, movies, failed=(), exhausted=False, invalid=()):
+        """提交一页的结果并前移游标（同一事务）
+
+        Args:
+            movies (list): (url, 电影字典) 列表
+            failed (list): 抓取或解析失败的 URL，失败次数未达上限时可以重新认领
+            exhausted (bool): 列表已到末尾，分片完成
+            invalid (list): (url, 原因) 列表，未通过校验，不再认领
+
+        Returns:
+            bool: 租约是否仍由 owner 持有；租约丢失时结果照常入库，但游标不前移
+        """
+        db = self._transaction()
+        try:
+            db.executemany('INSERT OR IGNORE INTO movies (subject, shard, record) VALUES (?, ?, ?)',
+                           [(subject_key(url), shard_id, json.dumps(movie, ensure_ascii=False))
+                            for url, movie in movies])
+            db.executemany("UPDATE urls SET status = 'done' WHERE subject = ?",
+                           [(subject_key(url),) for url, _ in movies])
+            db.executemany("UPDATE urls SET status = 'failed' WHERE subject = ? AND owner = ?",
+                           [(subject_key(url), owner) for url in failed])
+            db.executemany("UPDATE urls SET status = 'invalid', reason = ? WHERE subject = ? AND owner = ?",
+                           [(reason, subject_key(url), owner) for url, reason in invalid])
+            cursor = db.execute('''
+                UPDATE shards SET next_start = ?, pages = pages + 1, movies = movies + ?,
+                    status = ?, lease_expires = ?, failures = 0
+                WHERE id = ? AND owner = ? AND status = 'leased' ''',
+                (next_start, len(movies), 'done' if exhausted else 'leased',
+                 time.time() + self.lease_seconds, shard_id, owner))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return cursor.rowcount == 1
+
+    def movie_count(self, unmerged=False):
+        """已入库的电影数；unmerged=True 时只计尚未合并进记录日志的"""
+        query = 'SELECT COUNT(*) FROM movies' + (' WHERE merged = 0' if unmerged else '')
+        return self._db.execute(query).fetchone()[0]
+
+    def status(self):
+        """各状态的分片数、已入库电影数与详情页认领情况"""
+        shards = dict(self._db.execute('SELECT status, COUNT(*) FROM shards GROUP BY status'))
+        urls = dict(self._db.execute('SELECT status, COUNT(*) FROM urls GROUP BY status'))
+        return {'shards': shards, 'urls': urls, 'movies': self.movie_count()}
+
+    def merge_into(self, record_log, seen):
+        """把尚未合并的结果追加到记录日志（已在 seen 中的 URL 跳过），返回追加的条数"""
+        added = 0
+        rows = self._db.execute('SELECT subject, record FROM movies WHERE merged = 0 ORDER BY rowid').fetchall()
+        for _, record in rows:
+            movie = json.loads(record)
+            if movie.get('url') in seen:
+                continue
+            record_log.append(movie)
+            seen.add(movie['url'])
+            added += 1
+        record_log.sync()
+        seen.flush()
+        db = self._transaction()
+        try:
+            db.executemany('UPDATE movies SET merged = 1 WHERE subject = ?', [(subject,) for subject, _ in rows])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return added
+
+
+class ShardWorker:
+    """从 ShardQueue 领取分片并爬取的 worker
+
+    每次领取后最多爬 pages_per_lease 页再归还，使各分片交替推进；
+    列表返回空页或不足一页时分片完成。详情页由线程池并发抓取，并发由 AdaptiveController 控制。
+    列表中已在已爬取索引（SeenIndex）里的电影不再认领；target 为包含这些电影在内的总数。
+    """
+
+    def __init__(self, queue_path=DEFAULT_QUEUE_PATH, owner=None, search_url=SEARCH_URL,
+                 cache_dir=DEFAULT_CACHE_DIR, page_size=50, pages_per_lease=10, target=None,
+                 list_interval=(1, 2), max_retries=3, verify_ssl=False,
+                 quarantine_path=DEFAULT_QUARANTINE_PATH, index_path=DEFAULT_INDEX_PATH):
+        self.queue = ShardQueue(queue_path)
+        self.owner = owner or default_owner()
+        self.search_url = search_url
+        self.page_size = page_size
+        self.pages_per_lease = pages_per_lease
+        self.target = target
+        self.list_interval = list_interval
+        self.max_retries = max_retries
+        self.verify_ssl = verify_ssl
+        self.cache = ResponseCache(cache_dir)
+        self.controller = AdaptiveController(initial=8)
+        # 每页结果整批校验后才提交；各 worker 以整行追加到同一个隔离文件
+        self.validator = BatchValidator(quarantine_path=quarantine_path)
+        # worker 只读索引，合并结果时才写入；已合并的电影同时在索引和 movies 表中，只计一次
+        self.seen = SeenIndex(index_path, readonly=True)
+        self.existing = len(self.seen)
+
+    def _headers(self):
+        return {
+            'User-Agent': random.choice(USER_AGENTS),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+        }
+
+    def get_movies(self, shard):
+        """获取分片当前位置的一页列表；重试耗尽返回 None"""
+        params = {'sort': shard['sort'], 'range': shard['range'], 'tags': shard['tags'],
+                  'start': shard['next_start'], 'limit': self.page_size}
+        for retry in range(self.max_retries):
+            try:
+                with self.controller.slot() as slot, metrics.span('fetch', kind='list'):
+                    response = requests.get(self.search_url, headers=self._headers(), params=params,
+                                            verify=self.verify_ssl, timeout=10)
+                    slot.outcome = classify(response.status_code)
+                metrics.inc('http_responses_total', kind='list', status=slot.outcome)
+                if response.status_code == 200:
+                    return response.json().get('data', [])
+                print(f"Status {response.status_code} for shard {shard['id']}, retry {retry + 1}/{self.max_retries}")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Error fetching shard {shard['id']}: {e}, retry {retry + 1}/{self.max_retries}")
+            metrics.inc('retries_total', kind='list')
+            time.sleep(self.controller.backoff(retry))
+        return None
+
+    def fetch_movie(self, url):
+        """抓取并解析详情页，失败返回 None"""
+        for retry in range(self.max_retries):
+            try:
+                with self.controller.slot() as slot, metrics.span('fetch', kind='detail'):
+                    response = self.cache.get(url, headers=self._headers(), verify=self.verify_ssl, timeout=10)
+                    slot.outcome = 'cached' if response.from_cache else classify(response.status_code)
+                metrics.inc('http_responses_total', kind='detail', status=slot.outcome)
+                if response.status_code == 200:
+                    with metrics.span('parse'):
+                        return parse_rated_movie(response.text, url)
+                print(f"Status {response.status_code} for {url}, retry {retry + 1}/{self.max_retries}")
+            except requests.exceptions.RequestException as e:
+                print(f"Network error for {url}: {e}, retry {retry + 1}/{self.max_retries}")
+            except ValueError as e:
+                print(f"Error parsing {url}: {e}")
+                return None
+            metrics.inc('retries_total', kind='detail')
+            time.sleep(self.controller.backoff(retry))
+        return None
+
+    def crawl_page(self, shard, executor):
+        """爬取分片的一页并提交，返回 (分片是否完成, 租约是否仍然有效, 入库条数)"""
+        items = self.get_movies(shard)
+        if items is None:
+            return False, self.queue.fail_page(shard['id'], self.owner), 0
+        urls = self.queue.claim(self.owner, [item['url'] for item in items if item['url'] not in self.seen])
+        parsed, failed = [], []
+        for url, movie in zip(urls, executor.map(self.fetch_movie, urls)):
+            if movie:
+                parsed.append((movie, url))
+            else:
+                failed.append(url)
+                metrics.inc('failed_total')
+        accepted, rejected = self.validator.validate([movie for movie, _ in parsed], [url for _, url in parsed])
+        movies = [(url, movie) for movie, url in accepted]
+        # 与 CrawlState.mark_failed(retry=False) 一致：未通过校验的页面重试也不会通过
+        invalid = [(url, 'invalid: ' + '; '.join(reasons)) for _, url, reasons in rejected]
+        metrics.inc('movies_total', len(movies))
+        exhausted = len(items) < self.page_size
+        shard['next_start'] += self.page_size
+        with metrics.span('persist'):
+            held = self.queue.commit_page(shard['id'], self.owner, shard['next_start'], movies, failed, exhausted,
+                                          invalid)
+        print(f"[{self.owner}] shard {shard['id']} ({shard['sort']} {shard['range']} {shard['tags']}) "
+              f"start={shard['next_start'] - self.page_size}: {len(items)} listed, {len(urls)} new, "
+              f"{len(movies)} crawled, {len(rejected)} quarantined")
+        return exhausted, held, len(movies)
+
+    def target_reached(self):
+        return self.target is not None and self.existing + self.queue.movie_count(unmerged=True) >= self.target
+
+    def run(self):
+        """领取分片直到队列中没有可领取的分片或达到目标数量，返回本 worker 入库的电影数"""
+        crawled = 0
+        with ThreadPoolExecutor(max_workers=self.controller.max_window) as executor:
+            while not self.target_reached():
+                shard = self.queue.lease(self.owner)
+                if shard is None:
+                    break
+                exhausted = False
+                for _ in range(self.pages_per_lease):
+                    exhausted, held, count = self.crawl_page(shard, executor)
+                    crawled += count
+                    if exhausted or not held or self.target_reached():
+                        break
+                    time.sleep(random.uniform(*self.list_interval))
+                if not exhausted:
+                    self.queue.release(shard['id'], self.owner)
+        self.queue.close()
+        self.cache.close()
+        self.validator.close()
+        self.seen.close()
+        return crawled
+
+
+def _run_worker(options):
+    return ShardWorker(**options).run()
+
+
+def run_workers(workers=4, **options):
+    """在本机启动 workers 个 worker 进程并等待结束
+
+    SQLite 的事务保证同一分片只会被一个 worker 领取。
+    """
+    # 先在主进程中打开一次已爬取索引：创建缺失的文件，布隆过滤器需要重建时由这里保存，
+    # 只读打开的 worker 不必各自重建
+    SeenIndex(options.get('index_path', DEFAULT_INDEX_PATH)).close()
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        return sum(pool.map(_run_worker, [dict(options) for _ in range(workers)]))
+
+
+def merge(queue_path=DEFAULT_QUEUE_PATH, log_path=DEFAULT_LOG_PATH, index_path=DEFAULT_INDEX_PATH,
+          out_path='data/raw/douban_movies_final.csv'):
+    """把分片爬取的结果合并进主记录日志并重新生成最终 CSV，返回新增条数"""
+    queue = ShardQueue(queue_path)
+    with RecordLog(log_path) as record_log:
+        seen = SeenIndex(index_path)
+        try:
+            added = queue.merge_into(record_log, seen)
+        finally:
+            seen.close()
+            queue.close()
+        record_log.compact(out_path)
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按 (排序, 评分区间, 标签) 分片的多进程爬取')
+    parser.add_argument('command', choices=['plan', 'run', 'status', 'merge'])
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_PATH, help='SQLite 工作队列')
+    parser.add_argument('--workers', type=int, default=4, help='本机启动的 worker 进程数')
+    parser.add_argument('--target', type=int, default=10000, help='电影总数（包括已爬取的）达到后停止')
+    parser.add_argument('--search-url', default=SEARCH_URL)
+    args = parser.parse_args(argv)
+
+    if args.command == 'plan':
+        queue = ShardQueue(args.queue)
+        print(f"Added {queue.add_shards(plan_shards())} shards")
+        print(queue.status())
+    elif args.command == 'run':
+        queue = ShardQueue(args.queue)
+        if not queue.status()['shards']:
+            queue.add_shards(plan_shards())
+        queue.close()
+        crawled = run_workers(args.workers, queue_path=args.queue, target=args.target,
+                              search_url=args.search_url)
+        print(f"Workers crawled {crawled} new movies")
+        print(f"Merged {merge(args.queue)} new records into {DEFAULT_LOG_PATH}")
+    elif args.command == 'status':
+        print(json.dumps(ShardQueue(args.queue).status(), ensure_ascii=False, indent=2))
+    else:
+        print(f"Merged {merge(args.queue)} new records into {DEFAULT_LOG_PATH}")
+
+
+if __name__ == "__main__":
+    main()
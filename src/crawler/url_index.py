@@ -0,0 +1,151 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import struct
+import threading
+from urllib.parse import quote
+
+DEFAULT_INDEX_PATH = 'data/raw/seen_subjects'
+SUBJECT_PATTERN = re.compile(r'/subject/(\d+)')
+
+
+def subject_key(url):
+    """以豆瓣 subject ID 作为键；URL 中没有 ID 时退回到 URL 的 63 位哈希"""
+    match = SUBJECT_PATTERN.search(url)
+    if match:
+        return int(match.group(1))
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+    return -(int.from_bytes(digest, 'little') >> 1) - 1  # 取负数，避免与真实ID冲突
+
+
+class BloomFilter:
+    """简单的位数组布隆过滤器，使用双重哈希生成 k 个位置"""
+
+    HEADER = struct.Struct('<QIQ')  # 位数、哈希函数个数、已加入元素数
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(struct.pack('<q', key), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.size, self.hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            size, hashes, count = cls.HEADER.unpack(f.read(cls.HEADER.size))
+            bloom = cls.__new__(cls)
+            bloom.size, bloom.hashes, bloom.count = size, hashes, count
+            bloom.bits = bytearray(f.read())
+        if len(bloom.bits) != (size + 7) // 8:
+            raise ValueError(f"truncated bloom filter file {path}")
+        return bloom
+
+
+class SeenIndex:
+    """持久化的已爬取URL索引，两个爬虫共用
+
+    前面是布隆过滤器（绝大多数新URL在内存中即可判定未见过），
+    后面是 SQLite 中的精确集合，以 subject ID 为整数主键。
+    布隆过滤器和 SQLite 分别保存在 {path}.bloom 与 {path}.sqlite。
+
+    readonly=True 时以只读方式打开 SQLite（文件不存在时视为空索引），
+    布隆过滤器需要重建时只在内存中重建，add() 抛出 ValueError，close() 不写任何文件。
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, capacity=1_000_000, error_rate=0.001, readonly=False):
+        self.bloom_path = path + '.bloom'
+        self.db_path = path + '.sqlite'
+        self.readonly = readonly
+
+        self._lock = threading.Lock()
+        if not readonly:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS seen (subject_id INTEGER PRIMARY KEY)')
+            self._db.commit()
+        elif os.path.exists(self.db_path):
+            uri = 'file:' + quote(os.path.abspath(self.db_path)) + '?mode=ro'
+            self._db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(':memory:', check_same_thread=False)
+            self._db.execute('CREATE TABLE seen (subject_id INTEGER PRIMARY KEY)')
+        self._dirty = False
+
+        stored = self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+        try:
+            self.bloom = BloomFilter.load(self.bloom_path)
+        except (OSError, ValueError, struct.error):
+            self.bloom = None
+        # 布隆过滤器缺失或与精确集合不一致时从 SQLite 重建
+        if self.bloom is None or self.bloom.count != stored:
+            self.bloom = BloomFilter(max(capacity, stored * 2), error_rate)
+            for (key,) in self._db.execute('SELECT subject_id FROM seen'):
+                self.bloom.add(key)
+            self._dirty = True
+
+    def __contains__(self, url):
+        key = subject_key(url)
+        with self._lock:
+            if key not in self.bloom:
+                return False
+            row = self._db.execute('SELECT 1 FROM seen WHERE subject_id = ?', (key,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def add(self, url):
+        """登记一个已爬取的URL，返回是否为新URL"""
+        if self.readonly:
+            raise ValueError(f"SeenIndex {self.db_path} is opened read-only")
+        key = subject_key(url)
+        with self._lock:
+            cursor = self._db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (key,))
+            if cursor.rowcount:
+                self.bloom.add(key)
+                self._dirty = True
+            return bool(cursor.rowcount)
+
+    def add_many(self, urls):
+        """批量登记，返回新增数量"""
+        added = 0
+        for url in urls:
+            added += self.add(url)
+        self.flush()
+        return added
+
+    def flush(self):
+        """提交 SQLite 事务并保存布隆过滤器"""
+        with self._lock:
+            if self._dirty and not self.readonly:
+                self._db.commit()
+                self.bloom.save(self.bloom_path)
+                self._dirty = False
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,303 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    # 直接运行本脚本时把 src/utils 加入搜索路径（python -m src 已经设置好）
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from multivalue import MultiValueIndex
+
+import metrics
+
+DEFAULT_REPLICATES = 10_000
+CHUNK_SIZE = 250  # 每个任务的重采样次数，决定随机流的划分，与进程数无关
+MIN_GROUP_SIZE = 30
+MIN_YEAR = 1888
+REPORT_PATH = 'docs/experiment_report.md'
+REPORT_BEGIN = '<!-- bootstrap-stats:begin -->'
+REPORT_END = '<!-- bootstrap-stats:end -->'
+
+# 相关系数的变量对：log10(votes) 比原始投票数更接近正态
+PAIRS = (('rating', 'year'), ('rating', 'log_votes'), ('year', 'log_votes'))
+
+
+class Design:
+    """Bootstrap 统计量的设计矩阵
+
+    所有统计量都是若干列加权和的比值：一次重采样等价于给每行一个多项分布权重 w，
+    各列的加权和为 w @ features。因此一批重采样只需要一次 (批大小, n) @ (n, K) 的矩阵乘法，
+    统计量由这些和在所有重采样上向量化地算出。
+
+    列的排列：
+    - 基础列：1，以及中心化后的 rating/year/log_votes 的一次项、平方项和两两乘积
+    - 每个分组（年代、类型）四列：成员、成员 * rating、成员 * votes、成员 * votes * rating
+    """
+
+    def __init__(self, df, min_group_size=MIN_GROUP_SIZE, prior_votes=None):
+        df = df[(df['year'] >= MIN_YEAR) & df['rating'].notna() & (df['votes'] > 0)].reset_index(drop=True)
+        rating = df['rating'].to_numpy(dtype='float64')
+        votes = df['votes'].to_numpy(dtype='float64')
+        variables = {
+            'rating': rating,
+            'year': df['year'].to_numpy(dtype='float64'),
+            'log_votes': np.log10(votes),
+        }
+        self.n = len(df)
+        self.means = {name: values.mean() for name, values in variables.items()}
+        # 分组收缩的先验强度（票数）：分组的总票数远大于单部电影的票数，
+        # 默认取同一类分组（年代或类型）总票数的中位数，票数少的分组明显向全体平均收缩
+        self.prior_votes = {}
+
+        names = list(variables)
+        centered = {name: values - self.means[name] for name, values in variables.items()}
+        columns = [np.ones(self.n)] + [centered[name] for name in names]
+        self.linear = {name: 1 + i for i, name in enumerate(names)}
+        self.product = {}
+        for i, a in enumerate(names):
+            for b in names[i:]:
+                self.product[(a, b)] = self.product[(b, a)] = len(columns)
+                columns.append(centered[a] * centered[b])
+
+        self.groups = {}
+        decades = pd.Series(df['year'].to_numpy() // 10 * 10)
+        decade_members = pd.get_dummies(decades).sort_index(axis=1)
+        genre_index = MultiValueIndex.from_series(df['genres'])
+        genre_members = pd.DataFrame(genre_index.to_dense(), columns=genre_index.labels)
+        genre_members = genre_members[genre_index.counts().index]
+        for section, members in (('decade', decade_members), ('genre', genre_members)):
+            members = members.loc[:, members.sum() >= min_group_size]
+            matrix = members.to_numpy(dtype='float64')
+            self.groups[section] = (list(members.columns), len(columns))
+            self.prior_votes[section] = float(np.median(votes @ matrix)) if prior_votes is None else prior_votes
+            for weight in (np.ones(self.n), rating, votes, votes * rating):
+                columns.extend((matrix * weight[:, None]).T)
+
+        self.features = np.column_stack(columns)
+        self.df = df
+
+    def statistics(self, sums):
+        """由加权和计算统计量
+
+        Args:
+            sums (ndarray): (重采样次数, K) 的加权和，全 1 权重即为原样本
+
+        Returns:
+            tuple: (统计量标签 [(section, group, statistic)], (重采样次数, 统计量数) 的矩阵)
+        """
+        sums = np.atleast_2d(sums)
+        n = sums[:, 0]
+        labels, values = [], []
+
+        def moment(index):
+            return sums[:, index] / n
+
+        for a, b in PAIRS:
+            mean_a, mean_b = moment(self.linear[a]), moment(self.linear[b])
+            cov = moment(self.product[(a, b)]) - mean_a * mean_b
+            var_a = moment(self.product[(a, a)]) - mean_a ** 2
+            var_b = moment(self.product[(b, b)]) - mean_b ** 2
+            labels.append(('correlation', f'{a} ~ {b}', 'pearson'))
+            values.append(cov / np.sqrt(var_a * var_b))
+
+        # 全体平均评分，作为收缩的目标
+        overall = self.means['rating'] + moment(self.linear['rating'])
+        for section, (names, start) in self.groups.items():
+            g = len(names)
+            count, rating_sum, vote_sum, weighted_sum = (sums[:, start + i * g:start + (i + 1) * g]
+                                                         for i in range(4))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = rating_sum / count
+            prior = self.prior_votes[section]
+            shrunk = (weighted_sum + prior * overall[:, None]) / (vote_sum + prior)
+            for statistic, matrix in (('mean', mean), ('shrunk', shrunk)):
+                labels.extend((section, name, statistic) for name in names)
+                values.extend(matrix.T)
+        return labels, np.column_stack(values)
+
+    def counts(self):
+        """每个分组在原样本中的电影数"""
+        result = {}
+        for section, (names, start) in self.groups.items():
+            result[section] = dict(zip(names, self.features[:, start:start + len(names)].sum(axis=0).astype(int)))
+        return result
+
+
+_features = None
+
+
+def _init_worker(features):
+    global _features
+    _features = features
+
+
+def _resample_sums(seed, size, features=None):
+    """size 次重采样的加权和：每次从 n 行中有放回地抽取 n 行，抽中次数即为权重"""
+    features = _features if features is None else features
+    n = len(features)
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, n, size=(size, n))
+    rows += np.arange(size)[:, None] * n
+    weights = np.bincount(rows.ravel(), minlength=size * n).reshape(size, n)
+    return weights.astype('float64') @ features
+
+
+def bootstrap_sums(features, replicates=DEFAULT_REPLICATES, seed=0, workers=None, chunk_size=CHUNK_SIZE):
+    """重采样 replicates 次，返回 (replicates, K) 的加权和
+
+    重采样按 chunk_size 分块，每块由 SeedSequence(seed).spawn 得到独立的随机流，
+    结果只取决于 seed 和 chunk_size，与进程数无关。workers<=1 时在当前进程中计算。
+    """
+    sizes = [min(chunk_size, replicates - begin) for begin in range(0, replicates, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1 or len(sizes) == 1:
+        return np.concatenate([_resample_sums(s, size, features) for s, size in zip(seeds, sizes)])
+    with ProcessPoolExecutor(min(workers, len(sizes)), initializer=_init_worker, initargs=(features,)) as pool:
+        return np.concatenate(list(pool.map(_resample_sums, seeds, sizes)))
+
+
+def bootstrap_statistics(df, replicates=DEFAULT_REPLICATES, seed=0, workers=None, confidence=0.95,
+                         min_group_size=MIN_GROUP_SIZE, prior_votes=None):
+    """相关系数、各年代/类型平均评分和收缩评分的 bootstrap 置信区间
+
+    Args:
+        df (DataFrame): 包含 year、rating、votes、genres 的数据框，年份无效的行不参与计算
+        replicates (int): 重采样次数
+        seed (int): 随机种子
+        workers (int): 进程数，默认为 CPU 核数
+        confidence (float): 置信水平（百分位数区间）
+        min_group_size (int): 分组的最少电影数
+        prior_votes (float): 分组收缩的先验票数，默认取同一类分组总票数的中位数
+
+    Returns:
+        DataFrame: 列为 section、group、statistic、movies、estimate、se、low、high
+    """
+    design = Design(df, min_group_size, prior_votes)
+    with metrics.span('bootstrap'):
+        sums = bootstrap_sums(design.features, replicates, seed, workers)
+    labels, samples = design.statistics(sums)
+    _, estimate = design.statistics(design.features.sum(axis=0))
+    alpha = (1 - confidence) / 2
+    low, high = np.percentile(samples, [100 * alpha, 100 * (1 - alpha)], axis=0)
+    counts = design.counts()
+    result = pd.DataFrame(labels, columns=['section', 'group', 'statistic'])
+    result['movies'] = [counts[section][group] if section in counts else design.n
+                        for section, group, _ in labels]
+    result['estimate'] = estimate[0]
+    result['se'] = samples.std(axis=0, ddof=1)
+    result['low'] = low
+    result['high'] = high
+    result.attrs.update(replicates=replicates, seed=seed, confidence=confidence, rows=design.n,
+                        prior_votes=design.prior_votes, mean_rating=design.means['rating'])
+    return result
+
+
+def bayesian_rating(df, prior_votes=None):
+    """按投票数收缩的单部电影评分 (v * R + m * C) / (v + m)
+
+    C 为全体平均评分，m 为先验票数（默认取投票数中位数），投票少的电影向 C 收缩。
+    """
+    votes = df['votes'].astype('float64')
+    prior_votes = float(votes.median()) if prior_votes is None else prior_votes
+    overall = df['rating'].mean()
+    return (votes * df['rating'] + prior_votes * overall) / (votes + prior_votes)
+
+
+def _markdown_table(header, rows):
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '|'.join(['---'] * len(header)) + '|']
+    lines.extend('| ' + ' | '.join(str(cell) for cell in row) + ' |' for row in rows)
+    return '\n'.join(lines)
+
+
+def _interval(row, digits):
+    return f"{row.estimate:.{digits}f} [{row.low:.{digits}f}, {row.high:.{digits}f}]"
+
+
+def format_report(result, top=None):
+    """将 bootstrap_statistics 的结果整理为报告中的 Markdown 小节"""
+    info = result.attrs
+    level = round(info['confidence'] * 100)
+    lines = [
+        '### 3. 评分与年份、评价人数关系的统计检验',
+        '',
+        f"基于 {info['rows']} 部有效年份的电影，{info['replicates']} 次 bootstrap 重采样（种子 {info['seed']}），"
+        f"方括号内为 {level}% 百分位数置信区间。",
+        f"收缩评分为 (Σ 票数 × 评分 + m × C) / (Σ 票数 + m)，C = {info['mean_rating']:.3f}（全体平均评分），"
+        f"m 为同一类分组总票数的中位数（年代 {info['prior_votes']['decade']:.0f} 票，"
+        f"类型 {info['prior_votes']['genre']:.0f} 票）。",
+        '',
+        '**相关系数（Pearson）**',
+        '',
+    ]
+    correlation = result[result['section'] == 'correlation']
+    lines.append(_markdown_table(['变量', '相关系数'], [(row.group, _interval(row, 3))
+                                                       for row in correlation.itertuples()]))
+
+    for section, title in (('decade', '各年代平均评分'), ('genre', '各类型平均评分')):
+        rows = result[result['section'] == section]
+        means = rows[rows['statistic'] == 'mean']
+        shrunk = rows[rows['statistic'] == 'shrunk']
+        # 年代按时间排列，类型按平均评分从高到低排列
+        order = np.argsort(-means['estimate'].to_numpy(), kind='stable') if section == 'genre' \
+            else np.arange(len(means))
+        body = [(f'{mean.group}年代' if section == 'decade' else mean.group, mean.movies,
+                 _interval(mean, 2), _interval(weighted, 2))
+                for mean, weighted in (zip(means.iloc[order].itertuples(), shrunk.iloc[order].itertuples()))]
+        lines += ['', f'**{title}**', '', _markdown_table(['分组', '电影数', '平均评分', '票数加权收缩评分'], body)]
+
+    if top is not None:
+        lines += ['', '**收缩评分最高的电影**', '',
+                  _markdown_table(['片名', '年份', '评分', '评价人数', '收缩评分'],
+                                  [(row.title, row.year, f'{row.rating:.1f}', row.votes, f'{row.bayesian_rating:.2f}')
+                                   for row in top.itertuples()])]
+    return '\n'.join(lines)
+
+
+def update_report(section, path=REPORT_PATH):
+    """用 section 替换报告中标记之间的内容，没有标记时追加在文末"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    block = f'{REPORT_BEGIN}\n{section}\n{REPORT_END}'
+    if REPORT_BEGIN in text and REPORT_END in text:
+        head, rest = text.split(REPORT_BEGIN, 1)
+        text = head + block + rest.split(REPORT_END, 1)[1]
+    else:
+        text = text.rstrip('\n') + '\n\n' + block + '\n'
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(path + '.tmp', path)
+
+
+def main(argv=None):
+    from data_processor import build_pipeline
+
+    parser = argparse.ArgumentParser(description='评分、年份、评价人数关系的 bootstrap 统计')
+    parser.add_argument('--csv', default='data/raw/douban_movies_final.csv')
+    parser.add_argument('--replicates', type=int, default=DEFAULT_REPLICATES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+    parser.add_argument('--report', default=REPORT_PATH, help='写入结果的报告，为空时只打印')
+    args = parser.parse_args(argv)
+
+    movies = build_pipeline(args.csv).run(verbose=False)
+    begin = time.perf_counter()
+    result = bootstrap_statistics(movies, args.replicates, args.seed, args.workers)
+    print(f"{args.replicates} 次重采样耗时 {time.perf_counter() - begin:.2f} 秒")
+
+    valid = movies[movies['year'] >= MIN_YEAR]
+    top = valid.assign(bayesian_rating=bayesian_rating(valid)).nlargest(10, 'bayesian_rating')
+    section = format_report(result, top)
+    print(section)
+    if args.report:
+        update_report(section, args.report)
+        print(f"\n已写入 {args.report}")
+
+
+if __name__ == "__main__":
+    main()
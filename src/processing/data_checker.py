@@ -1,146 +1,159 @@
-import pandas as pd
 import numpy as np
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib import font_manager
+import sys
+
+if __name__ == "__main__":
+    # 直接运行本脚本时把 src/utils 加入搜索路径（python -m src 已经设置好）
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from dedup import find_clusters
+from loader import load_movies
+from profiler import profile_frame, profile_stats
+from streaming_stats import StreamingStats
 
 
 class DataChecker:
-    def __init__(self, file_path='data/raw/douban_movies_large.csv'):
-        """初始化数据检查器"""
+    def __init__(self, file_path='data/raw/douban_movies_large.csv', columns=None,
+                 streaming=False, chunksize=100_000, output_dir='results', dpi=300):
+        """初始化数据检查器
+
+        streaming=True 时按 chunksize 分块读取，只保留可合并的统计量，
+        内存占用取决于块大小而不是文件大小。
+        matplotlib/seaborn 只在绘图时由 plotting 模块导入。
+        """
         self.file_path = file_path
+        self.columns = columns  # 只加载需要的列，默认全部
+        self.streaming = streaming
+        self.chunksize = chunksize
         self.df = None
-        
-        # 设置中文字体
-        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # Mac OS的中文字体
-        plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
-        
-        # 设置图表样式
-        plt.style.use('seaborn')
-        sns.set_palette("husl")
+        self.stats = None
+        self.profile = None
+        self.output_dir = output_dir
+        self.dpi = dpi
         
     def load_data(self):
         """加载数据文件"""
         try:
-            self.df = pd.read_csv(self.file_path, encoding='utf-8')
+            if self.streaming:
+                self.stats = StreamingStats.from_csv(self.file_path, chunksize=self.chunksize,
+                                                     columns=self.columns)
+                rows = self.stats.rows
+            else:
+                self.df = load_movies(self.file_path, columns=self.columns, report=True)
+                rows = len(self.df)
+            self.profile = None
             print(f"成功加载数据文件: {self.file_path}")
-            print(f"数据总条数: {len(self.df)}")
+            print(f"数据总条数: {rows}")
             return True
         except Exception as e:
             print(f"加载数据文件失败: {e}")
             return False
+
+    def get_profile(self):
+        """返回列统计结果，首次调用时一次遍历计算并缓存"""
+        if self.profile is None:
+            if self.stats is not None:
+                self.profile = profile_stats(self.stats)
+            elif self.df is not None:
+                self.profile = profile_frame(self.df)
+        return self.profile
             
     def basic_info(self):
         """显示基本信息"""
-        if self.df is None:
+        profile = self.get_profile()
+        if profile is None:
             return
             
         print("\n=== 基本信息 ===")
-        print(self.df.info())
+        print(f"{profile.rows} entries, {len(profile.columns)} columns")
+        for column in profile.columns:
+            print(f" {column:<10} {profile.non_null[column]} non-null  {profile.dtypes[column]}")
+        if profile.memory is not None:
+            print(f"memory usage: {profile.memory / 1024:.1f} KB")
         
         print("\n=== 数据预览 ===")
-        print(self.df.head())
+        print(profile.head)
         
         print("\n=== 基本统计 ===")
-        print(self.df.describe())
+        print(profile.describe)
         
     def check_missing_values(self):
         """检查缺失值"""
-        if self.df is None:
+        profile = self.get_profile()
+        if profile is None:
             return
             
         print("\n=== 缺失值检查 ===")
-        missing = self.df.isnull().sum()
+        missing = profile.missing()
         print(missing[missing > 0])
         
     def check_duplicates(self):
         """检查重复值"""
-        if self.df is None:
+        profile = self.get_profile()
+        if profile is None:
             return
             
         print("\n=== 重复值检查 ===")
-        duplicates = self.df.duplicated().sum()
-        print(f"重复条目数: {duplicates}")
+        if self.stats is not None and self.stats.duplicates_approximate:
+            print(f"重复条目数（HyperLogLog 估计）: 约 {profile.duplicates}")
+        else:
+            print(f"重复条目数: {profile.duplicates}")
+        
+        # 近似重复（投票数或标题空格不同的同一部电影）需要逐行数据和 title、year 列，流式模式跳过
+        if self.df is not None and not {'title', 'year'} <= set(self.df.columns):
+            print("未加载 title 和 year 列，跳过近似重复检查")
+        elif self.df is not None:
+            clusters = find_clusters(self.df)
+            near = len(clusters) - len(np.unique(clusters))
+            print(f"近似重复条目数（含完全重复）: {near}")
         
     def check_data_distribution(self):
         """检查数据分布"""
-        if self.df is None:
+        profile = self.get_profile()
+        if profile is None:
             return
             
         print("\n=== 数据分布检查 ===")
         
         # 年份分布
         print("\n年份分布:")
-        print(self.df['year'].value_counts().sort_index().head())
+        print(profile.counts['year'].sort_index().head())
         
         # 评分分布
         print("\n评分分布:")
-        print(self.df['rating'].value_counts().sort_index().head())
+        print(profile.counts['rating'].sort_index().head())
         
         # 国家/地区分布
         print("\n国家/地区分布（前5名）:")
-        print(self.df['country'].value_counts().head())
+        print(profile.value_counts('country').head())
         
     def plot_distributions(self):
-        """绘制分布图"""
-        if self.df is None:
+        """绘制分布图和评分-年份关系图
+
+        图表数据由 profile 预先分箱，各图在进程池中并行渲染；数据没有变化的图片不会重新渲染。
+        """
+        profile = self.get_profile()
+        if profile is None:
             return
-            
-        # 创建图形
-        plt.figure(figsize=(15, 12))
-        
-        # 评分分布
-        plt.subplot(2, 2, 1)
-        sns.histplot(data=self.df, x='rating', bins=20)
-        plt.title('电影评分分布')
-        plt.xlabel('评分')
-        plt.ylabel('电影数量')
-        
-        # 年份分布
-        plt.subplot(2, 2, 2)
-        sns.histplot(data=self.df, x='year', bins=30)
-        plt.title('电影年份分布')
-        plt.xlabel('年份')
-        plt.ylabel('电影数量')
-        
-        # 评分箱线图
-        plt.subplot(2, 2, 3)
-        sns.boxplot(y=self.df['rating'])
-        plt.title('评分箱线图')
-        plt.ylabel('评分')
-        
-        # 国家/地区分布（前10名）
-        plt.subplot(2, 2, 4)
-        country_counts = self.df['country'].value_counts().head(10)
-        sns.barplot(x=country_counts.values, y=country_counts.index)
-        plt.title('国家/地区分布（前10名）')
-        plt.xlabel('电影数量')
-        
-        # 调整布局并保存
-        plt.tight_layout()
-        plt.savefig('results/data_distribution.png', dpi=300, bbox_inches='tight')
-        print("\n分布图已保存至 results/data_distribution.png")
-        
-        # 关闭图形，释放内存
-        plt.close()
-        
-        # 绘制额外的分析图
-        self.plot_additional_analysis()
-        
+
+        import plotting
+
+        jobs = [
+            (plotting.render_distribution, plotting.distribution_data(profile), 'data_distribution.png'),
+            (plotting.render_rating_year, plotting.rating_year_data(profile), 'rating_year_relationship.png'),
+        ]
+        rendered = plotting.render_figures(jobs, output_dir=self.output_dir, dpi=self.dpi)
+        for _, _, name in jobs:
+            path = os.path.join(self.output_dir, name)
+            status = "已保存至" if path in rendered else "数据未变化，沿用"
+            print(f"\n{status} {path}")
+
     def plot_additional_analysis(self):
-        """绘制额外的分析图"""
-        # 评分与年份的关系
-        plt.figure(figsize=(12, 6))
-        sns.scatterplot(data=self.df, x='year', y='rating', alpha=0.5)
-        plt.title('电影评分与年份关系')
-        plt.xlabel('年份')
-        plt.ylabel('评分')
-        plt.savefig('results/rating_year_relationship.png', dpi=300, bbox_inches='tight')
-        plt.close()
+        """绘制评分-年份关系图（与分布图一起由 plot_distributions 渲染，保留旧的接口）"""
+        self.plot_distributions()
         
-    def run_all_checks(self):
-        """运行所有检查"""
+    def run_all_checks(self, plots=True):
+        """运行所有检查，plots=False 时不绘图（不导入 matplotlib）"""
         if not self.load_data():
             return
             
@@ -148,7 +161,8 @@ class DataChecker:
         self.check_missing_values()
         self.check_duplicates()
         self.check_data_distribution()
-        self.plot_distributions()
+        if plots:
+            self.plot_distributions()
         
 if __name__ == "__main__":
     # 创建结果目录
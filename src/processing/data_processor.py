@@ -1,6 +1,18 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
+if __name__ == "__main__":
+    # 直接运行本脚本时把 src/utils 加入搜索路径（python -m src 已经设置好）
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from dedup import find_clusters, merge_clusters
+from loader import downcast_numeric
+from multivalue import MultiValueIndex, encode_columns
+from pipeline import Pipeline, Stage
+
 def clean_data(df):
     """清理数据框中的数据
     
@@ -8,19 +20,19 @@ def clean_data(df):
         df (DataFrame): 原始数据框
         
     Returns:
-        DataFrame: 清理后的数据框
+        DataFrame: 清理后的数据框（新对象，不修改输入）
     """
     # 删除重复的电影条目
     df = df.drop_duplicates()
     
-    # 将年份字符串转换为整数类型
-    df['year'] = df['year'].astype(int)
-    
-    # 将评分和投票数转换为相应的数值类型
-    df['rating'] = df['rating'].astype(float)
-    df['votes'] = df['votes'].astype(int)
-    
-    return df
+    # 年份、评分和投票数转换为紧凑数值类型（int16/float32/int32），返回副本
+    return downcast_numeric(df)
+
+def merge_cleaned(previous, delta):
+    """将新增数据的清理结果追加到已有结果，去掉与已有条目重复的行"""
+    seen = pd.util.hash_pandas_object(previous, index=False)
+    hashes = pd.util.hash_pandas_object(delta, index=False)
+    return pd.concat([previous, delta[~hashes.isin(seen).to_numpy()]], ignore_index=True)
 
 def add_features(df):
     """添加新的特征
@@ -29,12 +41,89 @@ def add_features(df):
         df (DataFrame): 原始数据框
         
     Returns:
-        DataFrame: 添加新特征后的数据框
+        DataFrame: 添加新特征后的数据框（新对象，不修改输入）
     """
     # 添加年代特征（如1990年代、2000年代等）
-    df['decade'] = (df['year'] // 10) * 10
+    # genres/director/country/language 保持原始字符串，
+    # 需要按取值分析时使用 encode_multi_values 得到 CSR 成员矩阵
+    return df.assign(decade=(df['year'] // 10) * 10)
+
+def append_rows(previous, delta):
+    """逐行特征的增量结果直接追加"""
+    return pd.concat([previous, delta], ignore_index=True)
+
+def label_near_duplicates(df):
+    """为近似重复的电影（规范化标题 + 年份 + 导演相近）标注 cluster_id
+    
+    Args:
+        df (DataFrame): 数据框
+        
+    Returns:
+        DataFrame: 增加 cluster_id 列的新数据框，同一部电影的各条记录编号相同
+    """
+    return df.assign(cluster_id=find_clusters(df))
+
+def drop_near_duplicates(df, keep='last'):
+    """合并近似重复的电影，每个簇只保留一条
+    
+    重新爬取会得到投票数略有变化或标题空格不同的同一部电影，
+    默认保留最后爬取的一条（最新的投票数）。
+    
+    Args:
+        df (DataFrame): 数据框
+        keep (str): 'last' 或 'max_votes'
+        
+    Returns:
+        DataFrame: 去重后的数据框
+    """
+    return merge_clusters(df, find_clusters(df), keep=keep).reset_index(drop=True)
+
+def build_pipeline(source_path='data/raw/douban_movies_final.csv', cache_dir='data/processed/pipeline'):
+    """clean -> features -> dedup 的流水线，输出缓存在 cache_dir
+    
+    clean/features 支持增量；dedup 可能用新数据替换旧条目，不能只追加，
+    因此放在最后并在数据变化时全量运行（近似线性时间）。
+    修改各阶段的逻辑时同时增加对应的 version。
     
-    # 将电影类型字符串拆分为列表，便于后续分析
-    df['genres'] = df['genre'].str.split(' ')
+    Args:
+        source_path (str): 爬虫输出的 CSV
+        cache_dir (str): 缓存目录
+        
+    Returns:
+        Pipeline: 调用 run() 得到带特征的数据框
+    """
+    pipeline = Pipeline(source_path, cache_dir)
+    pipeline.add(Stage('clean', clean_data, version=1, merge=merge_cleaned))
+    pipeline.add(Stage('features', add_features, version=1, deps=('clean',), merge=append_rows))
+    pipeline.add(Stage('dedup', drop_near_duplicates, version=1, deps=('features',)))
+    return pipeline
+
+def encode_multi_values(df):
+    """为多值字段（以 " / " 分隔）构建成员矩阵
     
-    return df 
\ No newline at end of file
+    Args:
+        df (DataFrame): 数据框
+        
+    Returns:
+        dict: 列名 -> MultiValueIndex
+    """
+    return encode_columns(df)
+
+def rating_by_genre_decade(df):
+    """每个类型在每个年代的平均评分
+    
+    Args:
+        df (DataFrame): 包含 genres、year、rating 的数据框
+        
+    Returns:
+        DataFrame: 索引为 (类型, 年代)，列为 mean、count
+    """
+    genres = MultiValueIndex.from_series(df['genres'])
+    decade = (df['year'].to_numpy() // 10) * 10
+    result = genres.group_mean(df['rating'].to_numpy(), by=decade)
+    result.index.names = ['genre', 'decade']
+    return result 
+
+if __name__ == "__main__":
+    movies = build_pipeline().run()
+    print(f"处理后的数据: {len(movies)} 条")
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# MinHash 签名长度 = BANDS * ROWS_PER_BAND；相似度约 (1/BANDS)**(1/ROWS_PER_BAND) 以上才会成为候选
+NUM_PERM = 32
+BANDS = 8
+ROWS_PER_BAND = 4
+SHINGLE_SIZE = 3
+
+# 置换 (a * x + b) % _PRIME：x、a、b 都小于 2**31，乘积不会超出 uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def normalize_text(series):
+    """全角转半角、转小写，去掉空白和标点，用于比较标题和导演
+
+    使用 Arrow 的 RE2 内核，\\p{P}/\\p{S} 按 Unicode 类别匹配，中日文字符不会被当作标点。
+    """
+    values = pa.array(series.astype('str').fillna('').to_numpy(dtype=object), type=pa.large_string())
+    values = pc.utf8_lower(pc.utf8_normalize(values, 'NFKC'))
+    values = pc.replace_substring_regex(values, r'[\s\p{P}\p{S}]+', '')
+    return pd.Series(values.to_pylist(), index=series.index, dtype='str')
+
+
+def sequel_markers(normalized):
+    """标题中的数字、中文数字和前/后/上/下篇等标记
+
+    续集和分部的标题往往只差一个数字，n-gram 相似度很高，标记不同的两部电影不视为重复。
+    """
+    values = pa.array(normalized.to_numpy(dtype=object), type=pa.large_string())
+    values = pc.replace_substring_regex(values, r'[^0-9一二三四五六七八九十百零〇前后後上中下终終续續]+', '')
+    return pd.Series(values.to_pylist(), index=normalized.index, dtype='str')
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, size=SHINGLE_SIZE, seed=0, block_size=1 << 20):
+    """批量计算字符 n-gram 的 MinHash 签名
+
+    文本先转成定长的 UTF-32 码点矩阵，n-gram 哈希、置换和取最小值都是矩阵运算；
+    按长度排序后分块，使每块的填充长度接近块内最长文本。
+    每块最多 block_size 个 n-gram（行数 × 宽度），各置换依次计算，峰值内存约为 block_size 个 uint64 的数倍。
+
+    Returns:
+        ndarray: (文本数, num_perm) 的 uint64 签名
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype='uint64')
+    b = rng.integers(0, _PRIME, size=num_perm, dtype='uint64')
+    texts = np.asarray(texts, dtype=str)
+    lengths = np.char.str_len(texts)
+    signatures = np.empty((len(texts), num_perm), dtype='uint64')
+
+    order = np.argsort(lengths, kind='stable')
+    begin = 0
+    while begin < len(texts):
+        # 按长度升序，块内最长的是最后一行；缩小块直到 n-gram 数不超过 block_size
+        end = min(len(texts), begin + max(1, block_size // max(int(lengths[order[begin]]), size)))
+        width = max(int(lengths[order[end - 1]]), size)
+        while end - begin > 1 and (end - begin) * width > block_size:
+            end = begin + max(1, block_size // width)
+            width = max(int(lengths[order[end - 1]]), size)
+        rows = order[begin:end]
+        begin = end
+
+        codes = np.zeros((len(rows), width), dtype='uint64')
+        block = texts[rows].astype(f'U{width}')
+        codes[:] = block.view('uint32').reshape(len(rows), width)
+        # 相邻 size 个码点组合成一个 n-gram（0x110000 进制，3 个码点小于 2**63），再对素数取模；
+        # 短于 size 的文本整体作为一个 n-gram
+        grams = np.zeros((len(rows), width - size + 1), dtype='uint64')
+        for offset in range(size):
+            grams = grams * np.uint64(0x110000) + codes[:, offset:offset + width - size + 1]
+        grams %= _PRIME
+        # 填充位置换成该行的第一个 n-gram，不影响最小值
+        valid = np.arange(width - size + 1) < np.maximum(lengths[rows] - size + 1, 1)[:, None]
+        grams = np.where(valid, grams, grams[:, :1])
+        for perm in range(num_perm):
+            signatures[rows, perm] = ((grams * a[perm] + b[perm]) % _PRIME).min(axis=1)
+    return signatures
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_clusters(df, threshold=0.7, bands=BANDS, rows_per_band=ROWS_PER_BAND):
+    """找出近似重复的电影并分配簇编号
+
+    1. 分块（blocking）：只比较同一年份的电影
+    2. 对 "标题|导演" 的规范化文本计算 MinHash，LSH 分桶得到候选对
+       （每个桶内的成员只与桶内第一条比较，候选对数量与行数成线性关系）
+    3. 签名一致比例（Jaccard 估计值）不低于 threshold 且续集标记相同的候选对合并为同一簇
+
+    Args:
+        df (DataFrame): 包含 title、year，可选 director 的数据框
+        threshold (float): 判定为重复的 Jaccard 相似度下限
+
+    Returns:
+        ndarray: 每行的簇编号（簇内第一行的位置），不重复的行编号为自身位置
+    """
+    n = len(df)
+    title = normalize_text(df['title'])
+    director = normalize_text(df['director']) if 'director' in df.columns else pd.Series('', index=df.index)
+    texts = (title + '|' + director).to_numpy(dtype=str)
+    markers = pd.factorize(sequel_markers(title))[0]
+    year = pd.to_numeric(df['year'], errors='coerce').fillna(-1).to_numpy(dtype='int64')
+
+    signatures = minhash_signatures(texts, num_perm=bands * rows_per_band)
+    firsts, others = [], []
+    for band in range(bands):
+        columns = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        # 年份作为分块键参与桶键，不同年份永远不会成为候选
+        keys = pd.util.hash_array(year.astype('uint64') * np.uint64(bands) + np.uint64(band))
+        for column in range(rows_per_band):
+            keys = pd.util.hash_array(keys ^ columns[:, column])
+        _, first_of_bucket, bucket = np.unique(keys, return_index=True, return_inverse=True)
+        leader = first_of_bucket[bucket]
+        members = np.flatnonzero(leader != np.arange(n))
+        firsts.append(leader[members])
+        others.append(members)
+
+    parent = np.arange(n)
+    if firsts:
+        left, right = np.concatenate(firsts), np.concatenate(others)
+        pairs = np.unique(np.stack([left, right], axis=1), axis=0) if len(left) else np.empty((0, 2), 'int64')
+        similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        matched = (similarity >= threshold) & (markers[pairs[:, 0]] == markers[pairs[:, 1]])
+        for i, j in pairs[matched]:
+            root_i, root_j = _find(parent, i), _find(parent, j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+    return np.array([_find(parent, i) for i in range(n)])
+
+
+def merge_clusters(df, clusters, keep='last'):
+    """每个簇只保留一行
+
+    Args:
+        df (DataFrame): 数据框
+        clusters (ndarray): find_clusters 的结果
+        keep (str): 'last' 保留最后爬取的一行（最新的投票数），'max_votes' 保留投票数最多的一行
+
+    Returns:
+        DataFrame: 去重后的数据框，保持原有顺序
+    """
+    order = pd.DataFrame({'cluster': clusters, 'position': np.arange(len(df))})
+    if keep == 'max_votes':
+        order['votes'] = pd.to_numeric(df['votes'], errors='coerce').to_numpy()
+        order = order.sort_values(['votes', 'position'], na_position='first', kind='stable')
+    elif keep != 'last':
+        raise ValueError(f"未知的合并策略: {keep}")
+    kept = order.drop_duplicates('cluster', keep='last')['position'].sort_values().to_numpy()
+    return df.iloc[kept]
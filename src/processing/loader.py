@@ -0,0 +1,91 @@
+import pandas as pd
+
+# 低基数的字符串列，使用 category 类型
+CATEGORY_COLUMNS = ['director', 'genres', 'country', 'language']
+
+# 数值列的紧凑类型
+NUMERIC_DTYPES = {'year': 'int16', 'rating': 'float32', 'votes': 'int32'}
+
+
+def memory_usage(df):
+    """数据框占用的内存字节数（包含字符串内容）"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def downcast_numeric(df):
+    """将数值列按 NUMERIC_DTYPES 转换，无法解析的值记为缺失；存在缺失值时使用可空整数类型"""
+    df = df.copy()
+    for column, dtype in NUMERIC_DTYPES.items():
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors='coerce')
+        if dtype.startswith('int') and values.isna().any():
+            dtype = dtype.capitalize()  # 可空整数类型 Int16/Int32
+        df[column] = values.astype(dtype)
+    return df
+
+
+def optimize_dtypes(df, category_columns=CATEGORY_COLUMNS, max_category_ratio=0.5):
+    """收窄数据框的列类型
+
+    - 数值列按 NUMERIC_DTYPES 转换；存在缺失值时保留可空的整数类型
+    - category_columns 以及不同值占比低于 max_category_ratio 的字符串列转为 category
+
+    Args:
+        df (DataFrame): 原始数据框
+        category_columns (list): 总是转为 category 的列
+        max_category_ratio (float): 其他字符串列转为 category 的不同值占比上限
+
+    Returns:
+        DataFrame: 类型收窄后的数据框（新对象）
+    """
+    df = downcast_numeric(df)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype) or column in NUMERIC_DTYPES:
+            continue
+        if not (pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column])):
+            continue
+        if column in category_columns or df[column].nunique() <= max_category_ratio * len(df):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def load_movies(path, columns=None, report=False):
+    """加载电影数据集并使用紧凑类型
+
+    CSV 读取时直接以 category 类型解析低基数列，避免先生成大量字符串对象；
+    Parquet 文件交给 storage.read_parquet。
+
+    Args:
+        path (str): CSV 或 Parquet 文件路径
+        columns (list): 只解析这些列，默认全部
+        report (bool): 是否打印优化前后的内存占用
+
+    Returns:
+        DataFrame: 加载后的数据框
+    """
+    if path.endswith('.parquet'):
+        from storage import read_parquet
+        df = read_parquet(path, columns=columns)
+    else:
+        dtype = {column: 'category' for column in CATEGORY_COLUMNS
+                 if columns is None or column in columns}
+        df = pd.read_csv(path, encoding='utf-8', usecols=columns, dtype=dtype)
+    optimized = optimize_dtypes(df)
+
+    if report:
+        # 按 read_csv 的默认类型（字符串、int64/float64）估算优化前的占用
+        before = optimized.index.memory_usage()
+        for column in optimized.columns:
+            series = optimized[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(str)
+            elif pd.api.types.is_integer_dtype(series) and not series.isna().any():
+                series = series.astype('int64')
+            elif pd.api.types.is_numeric_dtype(series):
+                series = series.astype('float64')
+            before += int(series.memory_usage(deep=True, index=False))
+        after = memory_usage(optimized)
+        print(f"内存占用: 优化前 {before / 1024:.1f} KiB -> 优化后 {after / 1024:.1f} KiB "
+              f"({before / after:.1f}x)")
+    return optimized
@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+
+from multivalue import MULTI_VALUE_COLUMNS, SEPARATOR, MultiValueIndex, _gather
+
+# 建立排序索引的数值列
+SORTED_COLUMNS = ('year', 'rating', 'votes')
+
+
+class SortedIndex:
+    """数值列的排序索引
+
+    order 为按值升序排列的行号（值相同时行号大的在前，倒序遍历即为降序且行号升序），
+    values 为对应的值；缺失值不进入索引。范围查询通过二分查找完成。
+
+    值统一保存为 float64；dtype 为列原本的浮点类型（例如 loader 使用的 float32）时，
+    查询边界先转换为该类型再比较，与 pandas 对该列的比较结果一致（8.1 与 float32 的 8.1 相等）。
+    """
+
+    def __init__(self, values, dtype=None):
+        self.dtype = dtype
+        self.raw = np.asarray(values, dtype='float64')
+        valid = np.flatnonzero(~np.isnan(self.raw))
+        order = np.lexsort((-valid, self.raw[valid]))
+        self.order = valid[order]
+        self.values = self.raw[self.order]
+        # 升序且值相同时行号升序，升序的 top-k 沿它扫描
+        self.ascending = valid[np.lexsort((valid, self.raw[valid]))]
+        # 每行在降序排列中的名次，用于给任意行集合排序而不必比较浮点值
+        self.rank = np.full(len(self.raw), len(self.order), dtype='int64')
+        self.rank[self.order[::-1]] = np.arange(len(self.order))
+
+    def _cast(self, bound):
+        if bound is None or self.dtype is None:
+            return bound
+        return float(np.asarray(bound, dtype=self.dtype))
+
+    def bounds(self, low=None, high=None):
+        """闭区间 [low, high] 在 values 中的位置范围"""
+        low, high = self._cast(low), self._cast(high)
+        begin = 0 if low is None else int(np.searchsorted(self.values, low, side='left'))
+        end = len(self.values) if high is None else int(np.searchsorted(self.values, high, side='right'))
+        return begin, max(begin, end)
+
+    def range(self, low=None, high=None):
+        """取值在 [low, high] 内的行号（升序）"""
+        begin, end = self.bounds(low, high)
+        return np.sort(self.order[begin:end])
+
+    def contains(self, rows, low=None, high=None):
+        """rows 中每一行的取值是否在 [low, high] 内"""
+        low, high = self._cast(low), self._cast(high)
+        values = self.raw[rows]
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+
+class InvertedIndex:
+    """多值字段的倒排索引：每个取值对应的行号列表（升序）
+
+    由 MultiValueIndex 的 CSR 矩阵转置得到。
+    """
+
+    def __init__(self, members):
+        self.members = members
+        self.codes = {label: code for code, label in enumerate(members.labels)}
+        order = np.argsort(members.indices, kind='stable')
+        self.rows = members.row_ids()[order]
+        self.indptr = np.zeros(len(members.labels) + 1, dtype='int64')
+        np.cumsum(np.bincount(members.indices, minlength=len(members.labels)), out=self.indptr[1:])
+
+    def postings(self, tokens):
+        """包含任一 token 的行号（升序）"""
+        lists = [self.rows[self.indptr[code]:self.indptr[code + 1]]
+                 for code in (self.codes.get(token) for token in tokens) if code is not None]
+        if not lists:
+            return np.empty(0, dtype='int64')
+        return lists[0] if len(lists) == 1 else np.unique(np.concatenate(lists))
+
+
+class _Predicate:
+    """一个过滤条件：estimate 为结果行数的估计，rows() 取出行号，test(rows) 检查给定的行"""
+
+    def __init__(self, estimate, rows, test):
+        self.estimate = estimate
+        self.rows = rows
+        self.test = test
+
+
+def _tokens(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _member_test(postings):
+    def test(rows):
+        if not len(postings):
+            return np.zeros(len(rows), dtype=bool)
+        position = np.minimum(np.searchsorted(postings, rows), len(postings) - 1)
+        return postings[position] == rows
+    return test
+
+
+class MovieStore:
+    """处理后电影数据集的查询接口
+
+    - year/rating/votes 建立排序索引，范围条件通过二分查找得到行号
+    - genres/country/director/language 按 " / " 拆分后建立倒排索引
+    - 多个条件时先取出估计行数最少的一个，其余条件只在这些行上检查
+    - top-k 查询在候选较多时沿排序索引从高到低扫描，凑够 k 行即停止
+
+    过滤条件以关键字参数给出：数值列为标量（等于）或 (low, high) 闭区间（None 表示不限），
+    多值列为一个取值或取值列表（包含任一即可）。
+
+    Example:
+        store = MovieStore.load('data/processed/douban_movies.parquet')
+        store.top_k(10, 'rating', country='美国', year=(1990, 1999))
+        store.group('genres', 'rating', votes=(10000, None))
+    """
+
+    def __init__(self, df, sorted_columns=SORTED_COLUMNS, token_columns=MULTI_VALUE_COLUMNS, sep=SEPARATOR):
+        self.df = df.reset_index(drop=True)
+        self.sorted = {}
+        for column in sorted_columns:
+            if column in self.df.columns:
+                values = pd.to_numeric(self.df[column], errors='coerce')
+                # 可空类型（Float32 等）取其 numpy 类型；只有浮点列需要按原类型转换查询边界
+                native = getattr(self.df[column].dtype, 'numpy_dtype', self.df[column].dtype)
+                dtype = native if getattr(native, 'kind', None) == 'f' else None
+                self.sorted[column] = SortedIndex(values.to_numpy(dtype='float64', na_value=np.nan), dtype)
+        self.tokens = {column: InvertedIndex(MultiValueIndex.from_series(self.df[column], sep))
+                       for column in token_columns if column in self.df.columns}
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """由 CSV 或 Parquet 文件构建"""
+        from loader import load_movies
+        return cls(load_movies(path), **kwargs)
+
+    @classmethod
+    def from_pipeline(cls, source_path='data/raw/douban_movies_final.csv', **kwargs):
+        """由 data_processor 流水线的输出（清洗、特征、去重后）构建，流水线命中缓存时不重新计算"""
+        from data_processor import build_pipeline
+        return cls(build_pipeline(source_path).run(verbose=False), **kwargs)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _predicates(self, conditions):
+        predicates = []
+        for column, condition in conditions.items():
+            if condition is None:
+                continue
+            if column in self.sorted:
+                index = self.sorted[column]
+                low, high = condition if isinstance(condition, tuple) else (condition, condition)
+                begin, end = index.bounds(low, high)
+                predicates.append(_Predicate(
+                    end - begin,
+                    lambda index=index, low=low, high=high: index.range(low, high),
+                    lambda rows, index=index, low=low, high=high: index.contains(rows, low, high)))
+            elif column in self.tokens:
+                index, tokens = self.tokens[column], _tokens(condition)
+                postings = index.postings(tokens)
+                predicates.append(_Predicate(len(postings), lambda postings=postings: postings,
+                                             _member_test(postings)))
+            else:
+                raise KeyError(f"列 {column} 没有索引")
+        return sorted(predicates, key=lambda predicate: predicate.estimate)
+
+    def filter(self, **conditions):
+        """满足全部条件的行号（升序）"""
+        return self._apply(self._predicates(conditions))
+
+    def _apply(self, predicates):
+        if not predicates:
+            return np.arange(len(self.df))
+        rows = predicates[0].rows()
+        for predicate in predicates[1:]:
+            if not len(rows):
+                break
+            rows = rows[predicate.test(rows)]
+        return rows
+
+    def select(self, columns=None, **conditions):
+        """满足条件的行（保持原顺序）"""
+        rows = self.filter(**conditions)
+        df = self.df if columns is None else self.df[columns]
+        return df.iloc[rows]
+
+    def _sort_rows(self, rows, by, ascending):
+        """按 by 排序行号，值相同时行号小的在前，缺失值在最后"""
+        if ascending:
+            return rows[np.lexsort((rows, self.sorted[by].raw[rows]))]
+        return rows[np.argsort(self.sorted[by].rank[rows], kind='stable')]
+
+    def top_k(self, k, by='rating', ascending=False, columns=None, **conditions):
+        """按 by 排序的前 k 行，值相同时按原顺序
+
+        条件很少时沿排序索引扫描并检查条件（提前结束），条件很强时先过滤再对候选排序。
+        """
+        index = self.sorted[by]
+        predicates = self._predicates(conditions)
+        n = max(len(index.order), 1)
+        estimate = predicates[0].estimate if predicates else n
+        # 先过滤的代价约为候选行数，沿索引扫描的代价约为 k / 选择性
+        if predicates and estimate <= k * n / max(estimate, 1):
+            rows = self._apply(predicates)
+            rows = self._sort_rows(rows[~np.isnan(index.raw[rows])], by, ascending)[:k]
+        else:
+            order = index.ascending if ascending else index.order[::-1]
+            found, step, position = [], max(4 * k, 1024), 0
+            while position < len(order) and sum(map(len, found)) < k:
+                chunk = order[position:position + step]
+                for predicate in predicates:
+                    chunk = chunk[predicate.test(chunk)]
+                found.append(chunk)
+                position += step
+                step *= 2
+            rows = np.concatenate(found)[:k] if found else np.empty(0, dtype='int64')
+        df = self.df if columns is None else self.df[columns]
+        return df.iloc[rows]
+
+    def _group_keys(self, by, rows):
+        """返回 (展开后的行号, 分组编号, 分组标签)；多值列的一行会出现在多个分组中"""
+        if by in self.tokens:
+            members = self.tokens[by].members
+            indptr, codes = _gather(members.indptr, members.indices, rows)
+            return np.repeat(rows, np.diff(indptr)), codes, members.labels
+        if by == 'decade':
+            values = self.sorted['year'].raw[rows] // 10 * 10
+        else:
+            values = self.df[by].to_numpy()[rows]
+        codes, labels = pd.factorize(values, sort=True)
+        if by == 'decade':
+            labels = labels.astype('int64')
+        keep = codes >= 0
+        return rows[keep], codes[keep], pd.Index(labels, name=by)
+
+    def group(self, by, value='rating', aggs=('count', 'mean'), **conditions):
+        """按 by 分组统计 value
+
+        Args:
+            by (str): 多值列（按取值分组）、'decade' 或其他列
+            value (str): 统计的数值列
+            aggs (tuple): pandas 聚合函数名
+            **conditions: 过滤条件
+
+        Returns:
+            DataFrame: 索引为分组取值，列为各聚合结果
+        """
+        rows, codes, labels = self._group_keys(by, self.filter(**conditions))
+        values = pd.to_numeric(self.df[value], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)[rows]
+        result = pd.Series(values).groupby(codes).agg(list(aggs))
+        result.index = pd.Index(np.asarray(labels)[result.index], name=by)
+        return result
+
+    def group_top(self, by, k, order_by='rating', ascending=False, columns=None, **conditions):
+        """每个分组内按 order_by 排序的前 k 行
+
+        Returns:
+            DataFrame: 按分组取值、组内名次排列，附带分组列 group
+        """
+        rows = self.filter(**conditions)
+        rows = self._sort_rows(rows[~np.isnan(self.sorted[order_by].raw[rows])], order_by, ascending)
+        rows, codes, labels = self._group_keys(by, rows)
+        order = np.argsort(codes, kind='stable')
+        rows, codes = rows[order], codes[order]
+        # 组内名次 = 位置 - 组起始位置
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.empty(0, 'int64')
+        within = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+        keep = within < k
+        df = self.df if columns is None else self.df[columns]
+        result = df.iloc[rows[keep]].reset_index(drop=True)
+        result.insert(0, 'group', np.asarray(labels)[codes[keep]])
+        return result
+
+    def distribution(self, column, bins=10, **conditions):
+        """满足条件的行中 column 的直方图
+
+        Returns:
+            DataFrame: 列为 left、right、count
+        """
+        index = self.sorted[column]
+        if conditions:
+            values = index.raw[self.filter(**conditions)]
+            values = np.sort(values[~np.isnan(values)])
+        else:
+            values = index.values  # 已排序，无需过滤
+        if not len(values):
+            return pd.DataFrame({'left': [], 'right': [], 'count': []})
+        edges = np.histogram_bin_edges(values[[0, -1]], bins=bins)
+        # 已排序的值用二分查找计数，最后一个区间为闭区间
+        positions = np.searchsorted(values, edges, side='left')
+        positions[-1] = len(values)
+        return pd.DataFrame({'left': edges[:-1], 'right': edges[1:], 'count': np.diff(positions)})
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# 爬虫输出的多值字段，多个取值之间用 " / " 分隔
+MULTI_VALUE_COLUMNS = ['genres', 'director', 'country', 'language']
+SEPARATOR = ' / '
+
+
+def _split(values, sep):
+    """用 Arrow 内核拆分字符串数组，返回 (indptr, 取值数组)，全程不生成 Python 列表"""
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    lists = pc.split_pattern(values, sep)
+    lengths = pc.fill_null(pc.list_value_length(lists), 0).to_numpy(zero_copy_only=False)
+    items = pc.utf8_trim_whitespace(pc.list_flatten(lists))
+    # 去掉空取值（例如 "剧情 / " 末尾的分隔符）
+    keep = pc.not_equal(items, '').to_numpy(zero_copy_only=False)
+    if not keep.all():
+        row_ids = np.repeat(np.arange(len(lengths)), lengths)[keep]
+        lengths = np.bincount(row_ids, minlength=len(lengths))
+        items = items.filter(pa.array(keep))
+    indptr = np.zeros(len(lengths) + 1, dtype='int64')
+    np.cumsum(lengths, out=indptr[1:])
+    return indptr, items
+
+
+def _gather(indptr, indices, rows):
+    """按 rows 取出 CSR 矩阵的若干行（行可以重复）"""
+    lengths = np.diff(indptr)[rows]
+    new_indptr = np.zeros(len(rows) + 1, dtype='int64')
+    np.cumsum(lengths, out=new_indptr[1:])
+    positions = np.repeat(indptr[:-1][rows] - new_indptr[:-1], lengths) + np.arange(new_indptr[-1])
+    return new_indptr, indices[positions]
+
+
+class MultiValueIndex:
+    """多值字段的 CSR 成员矩阵
+
+    第 i 行的取值编号为 indices[indptr[i]:indptr[i + 1]]，编号对应 labels 中的取值。
+    分组统计通过 np.bincount 在 (取值编号, 分组编号) 上完成，不需要逐行遍历列表。
+    """
+
+    def __init__(self, indptr, indices, labels):
+        self.indptr = indptr
+        self.indices = indices
+        self.labels = labels
+        self.n_rows = len(indptr) - 1
+
+    @classmethod
+    def from_series(cls, series, sep=SEPARATOR):
+        """由字符串列构建；category 类型只需拆分各个类别再按编码展开"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = pa.array(series.cat.categories.astype(str), type=pa.large_string())
+            # 末尾追加一个空行，供缺失值（编码 -1）使用
+            indptr, items = _split(pa.concat_arrays([categories, pa.array([''], pa.large_string())]), sep)
+            codes = series.cat.codes.to_numpy().astype('int64')
+            codes[codes < 0] = len(categories)
+        else:
+            indptr, items = _split(pa.Array.from_pandas(series.astype('str'), type=pa.large_string()), sep)
+            codes = None
+
+        encoded = items.dictionary_encode()
+        labels = pd.Index(encoded.dictionary.to_pandas(), dtype='str')
+        indices = encoded.indices.to_numpy(zero_copy_only=False).astype('int32')
+        # 取值按字典序编号，使结果与输入顺序无关
+        order = labels.argsort()
+        remap = np.empty(len(order), dtype='int32')
+        remap[order] = np.arange(len(order), dtype='int32')
+        indices = remap[indices]
+        labels = labels[order]
+
+        if codes is not None:
+            indptr, indices = _gather(indptr, indices, codes)
+        return cls(indptr, indices, labels)
+
+    def row_ids(self):
+        """每个非零元素所在的行号"""
+        return np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+
+    def to_dense(self, dtype=bool):
+        """转换为 (行数, 取值数) 的 one-hot 矩阵"""
+        matrix = np.zeros((self.n_rows, len(self.labels)), dtype=dtype)
+        matrix[self.row_ids(), self.indices] = 1
+        return matrix
+
+    def counts(self):
+        """每个取值出现的行数，按次数降序"""
+        counts = np.bincount(self.indices, minlength=len(self.labels))
+        return pd.Series(counts, index=self.labels, name='count').sort_values(ascending=False, kind='stable')
+
+    def explode(self, df=None, columns=None):
+        """展开为长表：每个 (行, 取值) 一行
+
+        Args:
+            df (DataFrame): 与编码时行数相同的数据框，columns 中的列会按行复制到长表
+            columns (list): 需要附带的列
+
+        Returns:
+            DataFrame: 包含 row、value（category 类型）以及附带列
+        """
+        rows = self.row_ids()
+        long = pd.DataFrame({
+            'row': rows,
+            'value': pd.Categorical.from_codes(self.indices, categories=self.labels),
+        })
+        for column in columns or []:
+            long[column] = df[column].to_numpy()[rows]
+        return long
+
+    def group_mean(self, values, by=None):
+        """按取值（以及可选的另一分组键）计算均值与计数
+
+        Args:
+            values (array-like): 每行的数值，例如评分
+            by (array-like): 每行的分组键，例如年代；为 None 时只按取值分组
+
+        Returns:
+            DataFrame: 列为 mean、count，索引为取值或 (取值, 分组键)
+        """
+        rows = self.row_ids()
+        values = np.asarray(values, dtype='float64')[rows]
+        valid = ~np.isnan(values)
+        if by is None:
+            keys, size = self.indices[valid], len(self.labels)
+            index = self.labels
+        else:
+            groups, group_labels = pd.factorize(np.asarray(by)[rows], sort=True)
+            valid &= groups >= 0
+            keys = self.indices[valid].astype('int64') * len(group_labels) + groups[valid]
+            size = len(self.labels) * len(group_labels)
+            index = pd.MultiIndex.from_product([self.labels, group_labels])
+
+        counts = np.bincount(keys, minlength=size)
+        sums = np.bincount(keys, weights=values[valid], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = pd.DataFrame({'mean': sums / counts, 'count': counts}, index=index)
+        return result[result['count'] > 0]
+
+
+def encode_columns(df, columns=MULTI_VALUE_COLUMNS, sep=SEPARATOR):
+    """为数据框中的多值列分别构建 MultiValueIndex"""
+    return {column: MultiValueIndex.from_series(df[column], sep) for column in columns if column in df.columns}
@@ -0,0 +1,218 @@
+import hashlib
+import inspect
+import io
+import json
+import os
+
+import pandas as pd
+
+import metrics
+
+DEFAULT_CACHE_DIR = 'data/processed/pipeline'
+SOURCE = 'source'
+
+_BLOCK_SIZE = 1 << 20
+
+
+def _digest(parts):
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(str(part).encode('utf-8'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def file_digest(path, prefix_size=None):
+    """文件内容的 sha256；同时返回前 prefix_size 字节的 sha256（一次读取）
+
+    Returns:
+        tuple: (全文摘要, 前缀摘要或 None, 文件大小)
+    """
+    hasher = hashlib.sha256()
+    prefix_digest = None
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(_BLOCK_SIZE)
+            if prefix_size is not None and prefix_digest is None and size + len(block) >= prefix_size:
+                hasher.update(block[:prefix_size - size])
+                prefix_digest = hasher.hexdigest()
+                hasher.update(block[prefix_size - size:])
+            else:
+                hasher.update(block)
+            size += len(block)
+            if not block:
+                break
+    return hasher.hexdigest(), prefix_digest, size
+
+
+class Stage:
+    """流水线中的一个阶段
+
+    Args:
+        name (str): 阶段名，也是缓存文件名
+        func (callable): 纯函数，参数为各依赖的输出，返回新的数据框，不能修改输入
+        version (int|str): 阶段代码版本；与函数源码一起决定缓存是否失效
+        deps (tuple): 依赖的阶段名，SOURCE 表示原始 CSV
+        merge (callable): merge(旧输出, 增量输出) -> 新输出，结果必须是旧输出后追加若干行；
+            为 None 时该阶段不支持增量，输入变化时全量重算
+    """
+
+    def __init__(self, name, func, version=1, deps=(SOURCE,), merge=None):
+        self.name = name
+        self.func = func
+        self.version = version
+        self.deps = tuple(deps)
+        self.merge = merge
+
+    def code_version(self):
+        try:
+            source = inspect.getsource(self.func)
+        except (OSError, TypeError):
+            source = self.func.__qualname__
+        merge_source = inspect.getsource(self.merge) if self.merge is not None else ''
+        return _digest([self.name, self.version, source, merge_source])
+
+
+class Pipeline:
+    """以 CSV 为源的小型 DAG 流水线，每个阶段的输出缓存在磁盘上
+
+    缓存键由阶段及其所有上游阶段的代码版本组成，并记录所用源文件的大小与摘要：
+    - 源文件与代码都未变化：直接读取缓存
+    - 源文件只是在末尾追加了行：只解析新增字节，各阶段处理增量后与缓存合并
+    - 其他情况：全量重算
+    """
+
+    def __init__(self, source_path, cache_dir=DEFAULT_CACHE_DIR, read_options=None):
+        self.source_path = source_path
+        self.cache_dir = cache_dir
+        self.read_options = dict(read_options or {'encoding': 'utf-8'})
+        self.stages = {}
+
+    def add(self, stage):
+        """注册阶段；依赖必须已经注册，因此注册顺序即拓扑顺序"""
+        for dep in stage.deps:
+            if dep != SOURCE and dep not in self.stages:
+                raise ValueError(f"阶段 {stage.name} 依赖未注册的阶段 {dep}")
+        self.stages[stage.name] = stage
+        return stage
+
+    def _paths(self, name):
+        base = os.path.join(self.cache_dir, name)
+        return base + '.parquet', base + '.json'
+
+    def _load_meta(self, name):
+        _, meta_path = self._paths(name)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, name, df, meta):
+        data_path, meta_path = self._paths(name)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        df.to_parquet(data_path + '.tmp', index=False)
+        os.replace(data_path + '.tmp', data_path)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _stage_key(self, name, keys):
+        stage = self.stages[name]
+        return _digest([stage.code_version()] + [keys.get(dep, SOURCE) for dep in stage.deps])
+
+    def _read_source(self, offset=0):
+        """读取源 CSV；offset > 0 时只解析该字节位置之后追加的行"""
+        if not offset:
+            return pd.read_csv(self.source_path, **self.read_options)
+        with open(self.source_path, 'rb') as f:
+            header = f.readline()
+            f.seek(offset)
+            tail = f.read()
+        return pd.read_csv(io.BytesIO(header + tail), **self.read_options)
+
+    def _plan(self, name, key, digest, size, prefix_digests):
+        """判断阶段的缓存状态：('hit'|'delta'|'full', 旧的源文件大小)"""
+        meta = self._load_meta(name)
+        if meta is None or meta.get('key') != key or not os.path.exists(self._paths(name)[0]):
+            return 'full', 0
+        if meta['source_digest'] == digest:
+            return 'hit', meta['source_bytes']
+        previous = meta['source_bytes']
+        if self.stages[name].merge is None or not meta.get('ends_with_newline') or previous > size:
+            return 'full', 0
+        if previous not in prefix_digests:
+            prefix_digests[previous] = file_digest(self.source_path, prefix_size=previous)[1]
+        if prefix_digests[previous] == meta['source_digest']:
+            return 'delta', previous
+        return 'full', 0
+
+    def run(self, target=None, verbose=True):
+        """运行到 target 阶段（默认最后注册的阶段）并返回其输出"""
+        if not self.stages:
+            raise ValueError("流水线没有注册任何阶段")
+        target = target or list(self.stages)[-1]
+        digest, _, size = file_digest(self.source_path)
+        with open(self.source_path, 'rb') as f:
+            f.seek(max(size - 1, 0))
+            ends_with_newline = f.read(1) == b'\n'
+
+        keys, outputs, deltas, offsets = {}, {}, {}, {}
+        source_cache, prefix_digests = {}, {}
+
+        def source(offset):
+            if offset not in source_cache:
+                source_cache[offset] = self._read_source(offset)
+            return source_cache[offset]
+
+        def output(name):
+            # 命中缓存的阶段只在下游需要时才读取
+            if outputs[name] is None:
+                outputs[name] = pd.read_parquet(self._paths(name)[0])
+            return outputs[name]
+
+        for name in self._required(target):
+            stage = self.stages[name]
+            keys[name] = self._stage_key(name, keys)
+            mode, offset = self._plan(name, keys[name], digest, size, prefix_digests)
+            # 增量计算要求所有上游阶段都从同一位置做了增量计算
+            if mode == 'delta' and any(dep != SOURCE and offsets.get(dep) != offset for dep in stage.deps):
+                mode, offset = 'full', 0
+            offsets[name] = offset if mode == 'delta' else None
+
+            data_path = self._paths(name)[0]
+            metrics.inc('stage_runs_total', stage=name, mode=mode)
+            if mode == 'hit':
+                outputs[name] = None
+            elif mode == 'delta':
+                inputs = [source(offset) if dep == SOURCE else deltas[dep] for dep in stage.deps]
+                previous = pd.read_parquet(data_path)
+                with metrics.span('stage', stage=name, mode=mode):
+                    merged = stage.merge(previous, stage.func(*inputs))
+                outputs[name] = merged.reset_index(drop=True)
+                deltas[name] = outputs[name].iloc[len(previous):]
+            else:
+                inputs = [source(0) if dep == SOURCE else output(dep) for dep in stage.deps]
+                with metrics.span('stage', stage=name, mode=mode):
+                    outputs[name] = stage.func(*inputs).reset_index(drop=True)
+
+            if mode != 'hit':
+                metrics.inc('stage_rows_total', len(outputs[name]), stage=name)
+                self._save(name, outputs[name], {
+                    'key': keys[name], 'source_digest': digest, 'source_bytes': size,
+                    'ends_with_newline': ends_with_newline, 'rows': len(outputs[name]),
+                })
+            if verbose:
+                label = {'hit': '使用缓存', 'delta': f'增量 {len(deltas.get(name, ()))} 行', 'full': '全量计算'}[mode]
+                print(f"[{name}] {label}")
+
+        return output(target)
+
+    def _required(self, target):
+        """target 及其所有上游阶段，按注册顺序"""
+        needed = {target}
+        for name in reversed(list(self.stages)):
+            if name in needed:
+                needed.update(dep for dep in self.stages[name].deps if dep != SOURCE)
+        return [name for name in self.stages if name in needed]
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import metrics
+
+# 绘图代码变化时增加版本号，使已有图片重新渲染
+PLOT_VERSION = 1
+MANIFEST_NAME = '.plot_manifest.json'
+
+
+def _setup():
+    """在工作进程中导入 matplotlib 并设置样式（使用无界面的 Agg 后端）"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # 新版 matplotlib 中 'seaborn' 样式已更名为 'seaborn-v0_8'
+    plt.style.use('seaborn-v0_8' if 'seaborn-v0_8' in plt.style.available else 'seaborn')
+    # 设置中文字体
+    plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # Mac OS的中文字体
+    plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+    sns.set_palette("husl")
+    return plt
+
+
+def _weighted_hist(ax, values, weights, bins):
+    counts, edges = np.histogram(values, bins=bins, weights=weights)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', edgecolor='white')
+
+
+def distribution_data(profile):
+    """从 Profile 提取分布图所需的预分箱数据（可序列化，体积与数据量无关）"""
+    ratings = profile.counts['rating']
+    years = profile.counts['year']
+    countries = profile.value_counts('country').head(10)
+    return {
+        'ratings': (ratings.index.to_numpy(dtype='float64'), ratings.to_numpy()),
+        'years': (years.index.to_numpy(dtype='float64'), years.to_numpy()),
+        'box': profile.box_stats('rating'),
+        'countries': (countries.index.astype(str).tolist(), countries.to_numpy()),
+    }
+
+
+def rating_year_data(profile):
+    """评分与年份的联合计数"""
+    joint = profile.counts[('year', 'rating')]
+    return {
+        'year': joint.index.get_level_values(0).to_numpy(dtype='float64'),
+        'rating': joint.index.get_level_values(1).to_numpy(dtype='float64'),
+        'count': joint.to_numpy(dtype='float64'),
+    }
+
+
+def render_distribution(data, path, dpi=300):
+    """评分/年份直方图、评分箱线图和国家/地区前10名"""
+    plt = _setup()
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+
+    # 评分分布
+    _weighted_hist(axes[0, 0], *data['ratings'], bins=20)
+    axes[0, 0].set(title='电影评分分布', xlabel='评分', ylabel='电影数量')
+
+    # 年份分布
+    _weighted_hist(axes[0, 1], *data['years'], bins=30)
+    axes[0, 1].set(title='电影年份分布', xlabel='年份', ylabel='电影数量')
+
+    # 评分箱线图
+    axes[1, 0].bxp([data['box']])
+    axes[1, 0].set(title='评分箱线图', ylabel='评分')
+
+    # 国家/地区分布（前10名）
+    names, counts = data['countries']
+    axes[1, 1].barh(names[::-1], counts[::-1])
+    axes[1, 1].set(title='国家/地区分布（前10名）', xlabel='电影数量')
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def render_rating_year(data, path, dpi=300, gridsize=40):
+    """评分与年份关系：按联合计数加权的 hexbin，不再逐点绘制散点"""
+    plt = _setup()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    image = ax.hexbin(data['year'], data['rating'], C=data['count'], reduce_C_function=np.sum,
+                      gridsize=gridsize, mincnt=1, cmap='viridis')
+    fig.colorbar(image, ax=ax, label='电影数量')
+    ax.set(title='电影评分与年份关系', xlabel='年份', ylabel='评分')
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def _data_hash(func, data, dpi):
+    payload = pickle.dumps((PLOT_VERSION, func.__name__, dpi, data), protocol=4)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def render_figures(jobs, output_dir='results', dpi=300, max_workers=None, force=False):
+    """渲染一组图表，跳过数据没有变化的图片
+
+    Args:
+        jobs (list): (渲染函数, 预分箱数据, 文件名) 的列表，渲染函数需定义在模块顶层
+        output_dir (str): 输出目录，目录下的清单文件记录每张图的数据摘要
+        dpi (int): 输出分辨率
+        max_workers (int): 进程数，默认与需要渲染的图片数相同
+        force (bool): 忽略清单强制重新渲染
+
+    Returns:
+        list: 实际重新渲染的文件路径
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    pending = []
+    for func, data, name in jobs:
+        path = os.path.join(output_dir, name)
+        digest = _data_hash(func, data, dpi)
+        if not force and manifest.get(name) == digest and os.path.exists(path):
+            metrics.inc('plots_total', result='skipped')
+            continue
+        pending.append((func, data, path, name, digest))
+
+    with metrics.span('plot'):
+        if len(pending) == 1:
+            func, data, path, _, _ = pending[0]
+            func(data, path, dpi)
+        elif pending:
+            # 每张图相互独立，在子进程中并行渲染
+            with ProcessPoolExecutor(max_workers=max_workers or len(pending)) as pool:
+                futures = [pool.submit(func, data, path, dpi) for func, data, path, _, _ in pending]
+                for future in futures:
+                    future.result()
+    metrics.inc('plots_total', len(pending), result='rendered')
+
+    if pending:
+        manifest.update({name: digest for _, _, _, name, digest in pending})
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return [path for _, _, path, _, _ in pending]
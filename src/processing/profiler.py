@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from streaming_stats import DESCRIBE_PERCENTILES, quantile_from_counts
+
+# 报告和图表需要完整取值计数的列
+VALUE_COUNT_COLUMNS = ('year', 'rating', 'country')
+
+# 需要联合计数的列对，二维分布图直接使用这些计数
+JOINT_COLUMNS = (('year', 'rating'),)
+
+
+def describe_from_counts(counts):
+    """由数值列的取值计数得到 describe() 的各项统计"""
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype='float64')
+    weights = counts.to_numpy(dtype='float64')
+    n = weights.sum()
+    if not n:
+        return pd.Series({name: (0.0 if name == 'count' else np.nan)
+                          for name in ['count', 'mean', 'std', 'min']
+                          + [f'{q:.0%}' for q in DESCRIBE_PERCENTILES] + ['max']})
+    mean = (values * weights).sum() / n
+    std = np.sqrt((weights * (values - mean) ** 2).sum() / (n - 1)) if n > 1 else np.nan
+    rows = {'count': n, 'mean': mean, 'std': std, 'min': values[0]}
+    for q in DESCRIBE_PERCENTILES:
+        rows[f'{q:.0%}'] = quantile_from_counts(counts, q)
+    rows['max'] = values[-1]
+    return pd.Series(rows)
+
+
+class Profile:
+    """数据集的列统计结果，报告与图表都从这里读取而不再扫描数据
+
+    Attributes:
+        rows (int): 行数
+        dtypes (Series): 各列类型
+        non_null (Series): 各列非缺失值个数
+        head (DataFrame): 前几行预览
+        describe (DataFrame): 数值列的 describe() 结果
+        duplicates (int): 完全重复的行数
+        counts (dict): 列名 -> 取值计数（数值列按取值排序）；(列名, 列名) -> 联合计数
+        memory (int): 内存占用字节数，流式模式下为 None
+    """
+
+    def __init__(self, rows, dtypes, non_null, head, describe, duplicates, counts, memory=None):
+        self.rows = rows
+        self.dtypes = dtypes
+        self.non_null = non_null
+        self.head = head
+        self.describe = describe
+        self.duplicates = duplicates
+        self.counts = counts
+        self.memory = memory
+
+    @property
+    def columns(self):
+        return list(self.dtypes.index)
+
+    def missing(self):
+        """各列缺失值个数"""
+        return (self.rows - self.non_null).astype('int64')
+
+    def value_counts(self, column):
+        """与 Series.value_counts() 相同顺序：按次数降序，次数相同时保持原顺序"""
+        return self.counts[column].sort_values(ascending=False, kind='stable')
+
+    def box_stats(self, column, whis=1.5):
+        """箱线图所需的统计量（matplotlib Axes.bxp 的格式），由取值计数直接计算"""
+        counts = self.counts[column].sort_index()
+        values = counts.index.to_numpy(dtype='float64')
+        q1, median, q3 = (quantile_from_counts(counts, q) for q in (0.25, 0.5, 0.75))
+        low, high = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+        inside = values[(values >= low) & (values <= high)]
+        outside = (values < low) | (values > high)
+        return {
+            'med': median, 'q1': q1, 'q3': q3,
+            'whislo': inside.min(), 'whishi': inside.max(),
+            'fliers': np.repeat(values[outside], counts.to_numpy()[outside]),
+        }
+
+
+def profile_frame(df, value_count_columns=VALUE_COUNT_COLUMNS, joint_columns=JOINT_COLUMNS, head=5):
+    """一次遍历计算所有列统计
+
+    每列只做一次计数：category 列对编码做 bincount，数值列做一次 value_counts(dropna=False)，
+    缺失值个数、describe() 与取值分布都由这次计数得出；重复行由一次行哈希判断。
+
+    Args:
+        df (DataFrame): 数据框
+        value_count_columns (tuple): 需要保留取值计数的非数值列
+        joint_columns (tuple): 需要联合计数的列对
+        head (int): 预览行数
+
+    Returns:
+        Profile: 统计结果
+    """
+    non_null = {}
+    counts = {}
+    describe = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            valid = codes[codes >= 0]
+            non_null[column] = len(valid)
+            if column in value_count_columns:
+                counts[column] = pd.Series(
+                    np.bincount(valid, minlength=len(series.cat.categories)),
+                    index=pd.Index(series.cat.categories, name=column), name='count')
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            column_counts = series.value_counts(dropna=False, sort=False)
+            missing = column_counts.index.isna()
+            column_counts = column_counts[~missing].sort_index()
+            non_null[column] = int(column_counts.sum())
+            counts[column] = column_counts
+            describe[column] = describe_from_counts(column_counts)
+        else:
+            non_null[column] = int(series.notna().sum())
+            if column in value_count_columns:
+                counts[column] = series.value_counts()
+
+    for pair in joint_columns:
+        if all(column in df.columns for column in pair):
+            counts[tuple(pair)] = df.groupby(list(pair), observed=True).size()
+
+    duplicates = int(pd.util.hash_pandas_object(df, index=False).duplicated().sum())
+    return Profile(
+        rows=len(df),
+        dtypes=df.dtypes,
+        non_null=pd.Series(non_null, dtype='int64'),
+        head=df.head(head),
+        describe=pd.DataFrame(describe),
+        duplicates=duplicates,
+        counts=counts,
+        memory=int(df.memory_usage(deep=True).sum()),
+    )
+
+
+def profile_stats(stats):
+    """将流式累积的 StreamingStats 转换为 Profile"""
+    return Profile(
+        rows=stats.rows,
+        dtypes=stats.head.dtypes,
+        non_null=(stats.rows - stats.missing_counts()).reindex(stats.columns),
+        head=stats.head,
+        describe=stats.describe(),
+        duplicates=stats.duplicates,
+        counts=dict(stats.value_counts),
+    )
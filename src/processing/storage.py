@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from loader import NUMERIC_DTYPES
+
+DEFAULT_PARQUET_PATH = 'data/processed/douban_movies.parquet'
+
+# 电影数据集的显式类型：数值列收窄位宽，低基数字符串列使用字典编码
+SCHEMA = pa.schema([
+    ('title', pa.string()),
+    ('year', pa.int16()),
+    ('director', pa.dictionary(pa.int32(), pa.string())),
+    ('genres', pa.dictionary(pa.int32(), pa.string())),
+    ('country', pa.dictionary(pa.int32(), pa.string())),
+    ('language', pa.dictionary(pa.int32(), pa.string())),
+    ('rating', pa.float32()),
+    ('votes', pa.int32()),
+    ('url', pa.string()),
+])
+
+# 写入时记录原始行号，读取时按它恢复行顺序
+ROW_ORDER_COLUMN = '__row_order'
+
+
+def to_table(df):
+    """将数据框转换为 Arrow 表；SCHEMA 中的列使用显式类型，其他列（例如 decade、cluster_id）按数据推断类型
+
+    Args:
+        df (DataFrame): 原始数据框（例如 read_csv 的结果）
+
+    Returns:
+        Table: 带显式类型的 Arrow 表
+    """
+    df = df.copy()
+    for column, dtype in NUMERIC_DTYPES.items():
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors='coerce')
+            if dtype.startswith('int'):
+                # 缺失值用可空整数类型 Int16/Int32 保存
+                values = values.round()
+                dtype = dtype.capitalize()
+            df[column] = values.astype(dtype)
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    schema = pa.schema([SCHEMA.field(field.name) if field.name in SCHEMA.names else field
+                        for field in inferred])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_parquet(df, path=DEFAULT_PARQUET_PATH, row_group_size=2048, compression='zstd'):
+    """写入 Parquet 文件
+
+    先按年份排序，使每个行组的年份范围尽量不重叠，
+    读取时按年份过滤就能直接跳过整个行组。
+    原始行号写入 ROW_ORDER_COLUMN，read_parquet 按它恢复输入的行顺序。
+    """
+    df = df.assign(**{ROW_ORDER_COLUMN: np.arange(len(df), dtype='int32')})
+    if 'year' in df.columns:
+        df = df.sort_values('year', kind='stable')
+    table = to_table(df)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path, row_group_size=row_group_size, compression=compression)
+    os.replace(tmp_path, path)
+    return table
+
+
+def read_parquet(path=DEFAULT_PARQUET_PATH, columns=None, year_range=None, filters=None):
+    """读取 Parquet 文件，支持列投影与谓词下推
+
+    Args:
+        path (str): 文件路径
+        columns (list): 只读取这些列
+        year_range (tuple): (起始年份, 结束年份)，闭区间
+        filters (list): 其他 pyarrow 过滤条件，例如 [('rating', '>=', 9.0)]
+
+    Returns:
+        DataFrame: 按写入前的行顺序排列，字典编码列转换为 category 类型
+    """
+    filters = list(filters or [])
+    if year_range is not None:
+        start, end = year_range
+        filters += [('year', '>=', start), ('year', '<=', end)]
+    # 旧版本写入的文件没有行号列，保持文件中的顺序
+    ordered = ROW_ORDER_COLUMN in pq.read_schema(path).names
+    if ordered and columns is not None:
+        columns = list(columns) + [ROW_ORDER_COLUMN]
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    if ordered:
+        table = table.sort_by(ROW_ORDER_COLUMN).drop_columns([ROW_ORDER_COLUMN])
+    return table.to_pandas()
+
+
+def import_csv(csv_path, path=DEFAULT_PARQUET_PATH):
+    """将 CSV 数据集转换为 Parquet"""
+    df = pd.read_csv(csv_path, encoding='utf-8')
+    write_parquet(df, path)
+    return path
+
+
+def export_csv(csv_path, path=DEFAULT_PARQUET_PATH):
+    """将 Parquet 数据集导出为 CSV"""
+    df = read_parquet(path)
+    df.to_csv(csv_path, index=False, encoding='utf-8')
+    return csv_path
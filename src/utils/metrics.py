@@ -0,0 +1,291 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_METRICS_PATH = 'data/raw/metrics.jsonl'
+
+# JSONL 文件超过这个大小时轮转为 <path>.1，磁盘上最多保留两个文件
+DEFAULT_MAX_BYTES = 1 << 20
+
+# 直方图桶上限（秒），覆盖从本地缓存命中到慢速网络请求
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def series_name(name, labels):
+    """Prometheus 风格的序列名，例如 fetch_seconds{kind="detail"}"""
+    if not labels:
+        return name
+    inner = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f'{name}{{{inner}}}'
+
+
+def metric_total(values, name):
+    """把同名指标的所有标签组合加总"""
+    return sum(value for key, value in values.items() if key == name or key.startswith(name + '{'))
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum, 'counts': list(self.counts)}
+
+
+class Registry:
+    """计数器与直方图的集合，线程安全
+
+    span(name) 记录代码块耗时到 name_seconds 直方图，异常退出时标签带 error="1"。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = series_name(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = series_name(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, **labels):
+        begin = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            labels['error'] = '1'
+            raise
+        finally:
+            self.observe(name + '_seconds', time.perf_counter() - begin, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'ts': time.time(),
+                'started': self.started,
+                'buckets': list(self.buckets),
+                'counters': dict(self.counters),
+                'histograms': {key: h.snapshot() for key, h in self.histograms.items()},
+            }
+
+    def to_prometheus(self):
+        """Prometheus 文本格式"""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for key, value in sorted(snapshot['counters'].items()):
+            name = key.split('{', 1)[0]
+            if name not in typed:
+                lines.append(f'# TYPE {name} counter')
+                typed.add(name)
+            lines.append(f'{key} {value}')
+        for key, histogram in sorted(snapshot['histograms'].items()):
+            name, _, inner = key.partition('{')
+            inner = inner.rstrip('}')
+            if name not in typed:
+                lines.append(f'# TYPE {name} histogram')
+                typed.add(name)
+            prefix = inner + ',' if inner else ''
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ['+Inf'], histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = f'{{{inner}}}' if inner else ''
+            lines.append(f'{name}_sum{suffix} {histogram["sum"]}')
+            lines.append(f'{name}_count{suffix} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NoopRegistry:
+    """默认的空实现：所有调用直接返回，热路径上几乎没有开销"""
+
+    _span = _NoopSpan()
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def span(self, name, **labels):
+        return self._span
+
+    def snapshot(self):
+        return None
+
+
+class JsonlExporter:
+    """后台线程每隔 interval 秒把快照追加写入 JSONL 文件
+
+    文件将超过 max_bytes 时先轮转为 <path>.1（覆盖上一次轮转的文件），
+    长时间运行时占用的磁盘空间不超过 2 * max_bytes。
+    """
+
+    def __init__(self, registry, path=DEFAULT_METRICS_PATH, interval=5.0, max_bytes=DEFAULT_MAX_BYTES):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._stop = threading.Event()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def export(self):
+        line = (json.dumps(self.registry.snapshot(), ensure_ascii=False) + '\n').encode('utf-8')
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(line) > self.max_bytes:
+            os.replace(self.path, self.path + '.1')
+        with open(self.path, 'ab') as f:
+            f.write(line)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.export()
+
+
+def serve_prometheus(registry, port=9108, host='127.0.0.1'):
+    """在后台线程提供 /metrics（Prometheus 文本格式），返回 server"""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_registry = NoopRegistry()
+_exporters = []
+
+
+def enable(path=DEFAULT_METRICS_PATH, interval=5.0, port=None):
+    """启用指标收集；path 为 None 时不写 JSONL，port 不为 None 时提供 Prometheus 端点"""
+    global _registry
+    if isinstance(_registry, Registry):
+        return _registry
+    _registry = Registry()
+    if path:
+        _exporters.append(JsonlExporter(_registry, path, interval))
+    if port:
+        _exporters.append(serve_prometheus(_registry, port))
+    return _registry
+
+
+def disable():
+    """写出最后一次快照并恢复为空实现"""
+    global _registry
+    for exporter in _exporters:
+        if isinstance(exporter, JsonlExporter):
+            exporter.close()
+        else:
+            exporter.shutdown()
+    _exporters.clear()
+    _registry = NoopRegistry()
+
+
+def enable_from_env(path=DEFAULT_METRICS_PATH):
+    """脚本入口使用：默认写 JSONL；METRICS=0 关闭，METRICS_PORT 设置 Prometheus 端口"""
+    if os.environ.get('METRICS', '1') == '0':
+        return _registry
+    port = int(os.environ.get('METRICS_PORT', 0)) or None
+    return enable(path, port=port)
+
+
+def get_registry():
+    return _registry
+
+
+def inc(name, value=1, **labels):
+    _registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    _registry.observe(name, value, **labels)
+
+
+def span(name, **labels):
+    return _registry.span(name, **labels)
+
+
+def _read_tail(path, tail_bytes):
+    """返回文件最后 tail_bytes 字节中的完整行与文件大小"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - tail_bytes))
+            lines = f.read().splitlines()
+    except OSError:
+        return [], 0
+    if size > tail_bytes:
+        lines = lines[1:]  # 第一行可能不完整
+    return lines, size
+
+
+def read_snapshots(path=DEFAULT_METRICS_PATH, tail_bytes=DEFAULT_MAX_BYTES):
+    """读取 JSONL 文件末尾的快照（只读最后 tail_bytes 字节），按时间顺序返回
+
+    当前文件不足 tail_bytes 时，从轮转出的 <path>.1 末尾补足。
+    """
+    lines, size = _read_tail(path, tail_bytes)
+    if size < tail_bytes:
+        lines = _read_tail(path + '.1', tail_bytes - size)[0] + lines
+    snapshots = []
+    for line in lines:
+        try:
+            snapshots.append(json.loads(line))
+        except ValueError:
+            continue
+    return snapshots
@@ -1,11 +1,72 @@
 import json
 import os
+import time
 from datetime import datetime
 
-def check_progress():
-    """检查爬虫进度"""
-    checkpoint_file = 'data/raw/crawler_checkpoint.json'
-    
+import metrics
+
+def live_rates(snapshots, window=60):
+    """根据最近一次运行的指标快照计算 window 秒内的速率
+
+    Returns:
+        dict: movies_per_sec、pages_per_sec、retries_per_sec、fetch_p50 等；没有快照时返回 None
+    """
+    if not snapshots:
+        return None
+    last = snapshots[-1]
+    run = [s for s in snapshots if s.get('started') == last.get('started')]
+    # 取窗口起点的快照作为基准；只有一个快照时以进程启动时刻为基准
+    base = next((s for s in run if s['ts'] >= last['ts'] - window), run[0])
+    if base is last:
+        base = {'ts': last['started'], 'counters': {}}
+    elapsed = max(last['ts'] - base['ts'], 1e-9)
+
+    def rate(name):
+        return (metrics.metric_total(last['counters'], name) - metrics.metric_total(base['counters'], name)) / elapsed
+
+    # 合并详情页请求的各个序列（不含异常退出的请求）
+    fetch = {'count': 0, 'counts': [0] * (len(last.get('buckets', [])) + 1)}
+    for key, histogram in last.get('histograms', {}).items():
+        if key.startswith('fetch_seconds{') and 'kind="detail"' in key and 'error=' not in key:
+            fetch['count'] += histogram['count']
+            fetch['counts'] = [a + b for a, b in zip(fetch['counts'], histogram['counts'])]
+    return {
+        'ts': last['ts'],
+        'elapsed': elapsed,
+        'movies_per_sec': rate('movies_total'),
+        'pages_per_sec': rate('http_responses_total'),
+        'retries_per_sec': rate('retries_total'),
+        'fetch_p50': _histogram_quantile(fetch, last.get('buckets', []), 0.5),
+        'fetch_p99': _histogram_quantile(fetch, last.get('buckets', []), 0.99),
+    }
+
+def _histogram_quantile(histogram, buckets, q):
+    """直方图分位数的上界（落入的桶的上限）"""
+    if not histogram or not histogram.get('count'):
+        return None
+    rank, seen = q * histogram['count'], 0
+    for bound, count in zip(list(buckets) + [float('inf')], histogram['counts']):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float('inf')
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}小时{minutes}分{seconds}秒" if hours else f"{minutes}分{seconds}秒"
+
+def check_progress(target=10000, metrics_path=metrics.DEFAULT_METRICS_PATH, window=60,
+                   checkpoint_file='data/raw/crawler_checkpoint.json'):
+    """检查爬虫进度
+
+    Args:
+        target (int): 目标电影数量，用于估算剩余时间
+        metrics_path (str): 爬虫写入的指标快照文件
+        window (int): 计算实时速率的时间窗口（秒）
+        checkpoint_file (str): 爬虫写入的断点文件（CrawlState）
+    """
     if not os.path.exists(checkpoint_file):
         print("未找到断点文件，爬虫可能未开始或已完成")
         return
@@ -20,13 +81,38 @@ def check_progress():
             
         print(f"\n=== 爬虫进度检查 ===")
         print(f"最后更新时间: {last_update}")
-        print(f"已爬取电影数量: {len(data['all_movies'])}")
-        print(f"当前URL索引: {data['current_url_index'] + 1}/{4}")  # 4是base_urls的长度
-        print(f"当前URL已爬取数量: {data['movies_count']}")
+        print(f"已爬取电影数量: {data.get('movies_count', 0)}")
+        pages_done = data.get('pages_done', len(data.get('list_offsets_done', [])))
+        print(f"列表页: 已完成 {pages_done} 页，下一页 start={data.get('next_start', 0)}")
+        
+        # 计数直接由爬虫写入，无需读取前沿文件或载入电影记录
+        counts = data.get('counts', {})
+        print(f"详情页: 待抓取 {counts.get('pending', 0)}，进行中 {counts.get('in_flight', 0)}，"
+              f"已完成 {counts.get('done', 0)}，失败 {counts.get('failed', 0)}")
+        
+        # 实时速率来自爬虫定期写出的指标快照
+        rates = live_rates(metrics.read_snapshots(metrics_path), window)
+        if rates is None:
+            print("未找到指标文件，无法计算实时速率")
+        else:
+            age = time.time() - rates['ts']
+            print(f"\n实时速率（最近 {rates['elapsed']:.0f} 秒，快照于 {age:.0f} 秒前）:")
+            print(f"电影 {rates['movies_per_sec']:.2f} 条/秒，请求 {rates['pages_per_sec']:.2f} 次/秒，"
+                  f"重试 {rates['retries_per_sec']:.2f} 次/秒")
+            if rates['fetch_p50'] is not None:
+                print(f"详情页延迟: p50 ≤ {rates['fetch_p50']}s，p99 ≤ {rates['fetch_p99']}s")
+            remaining = target - data.get('movies_count', 0)
+            if remaining <= 0:
+                print(f"已达到目标 {target} 条")
+            elif rates['movies_per_sec'] > 0:
+                print(f"距目标 {target} 条还差 {remaining} 条，预计剩余 "
+                      f"{_format_duration(remaining / rates['movies_per_sec'])}")
+            else:
+                print(f"距目标 {target} 条还差 {remaining} 条，当前速率为 0，无法估算剩余时间")
         
         # 显示最近爬取的5部电影
         print("\n最近爬取的5部电影:")
-        for movie in data['all_movies'][-5:]:
+        for movie in data.get('recent_movies', []):
             print(f"- {movie['title']} ({movie['year']}) - 评分: {movie['rating']}")
             
     except Exception as e:
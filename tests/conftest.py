@@ -0,0 +1,9 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+REPO_ROOT = os.path.abspath(os.path.join(SRC_DIR, '..'))
+
+# 与 python -m src 相同，各目录中的模块以同级方式导入
+for name in ('bench', 'utils', 'processing', 'crawler'):
+    sys.path.insert(0, os.path.join(SRC_DIR, name))
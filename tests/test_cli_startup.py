@@ -0,0 +1,21 @@
+import pytest
+
+from bench_startup import COMMANDS, measure
+
+# 查看帮助和进度不应加载数据分析或网页解析的库
+LIGHT_COMMANDS = ('help', 'progress')
+FORBIDDEN_MODULES = {'pandas', 'matplotlib', 'seaborn', 'bs4'}
+
+# 时间预算很宽松，只用来发现导入链被意外拉长，不用于比较性能
+LIGHT_BUDGET_MS = 3000
+BUDGET_MS = 30000
+
+
+@pytest.mark.parametrize('name', list(COMMANDS))
+def test_subcommand_imports(name):
+    elapsed, heavy = measure(COMMANDS[name], repeat=1)
+    if name in LIGHT_COMMANDS:
+        assert not FORBIDDEN_MODULES & set(heavy), f"{name} imports {sorted(FORBIDDEN_MODULES & set(heavy))}"
+        assert elapsed < LIGHT_BUDGET_MS
+    else:
+        assert elapsed < BUDGET_MS
@@ -0,0 +1,124 @@
+import json
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from conftest import REPO_ROOT
+from fake_douban import FIXTURE_DIR, FakeDouban, make_server
+from movie_crawler_final import FinalMovieCrawler
+from record_log import RecordLog
+from response_cache import ResponseCache
+from shard_coordinator import ShardQueue, plan_shards
+
+
+@pytest.fixture
+def fake():
+    # 服务运行在本进程的线程中，测试可以直接调整错误率和读取计数
+    fake = FakeDouban(movies=200, latency=0, fixture_dir=os.path.join(REPO_ROOT, FIXTURE_DIR))
+    server = make_server(fake)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.base_url = f'http://127.0.0.1:{server.server_port}'
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+def make_crawler(fake):
+    crawler = FinalMovieCrawler()
+    crawler.search_url = f'{fake.base_url}/j/new_search_subjects'
+    crawler.controller.base_delay = 0.001
+    return crawler
+
+
+def test_retry_after_server_errors(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # 固定随机种子：500 和 403 都会出现，每个页面都在 3 次重试之内成功
+    fake.error_rate, fake.forbidden_rate = 0.2, 0.2
+    fake.random = random.Random(1)
+    crawler = make_crawler(fake)
+    pages = [crawler.fetch_movie_detail(f'{fake.base_url}/subject/{i}/') for i in range(8)]
+    stats = fake.stats()
+    assert stats['status_500'] and stats['status_403']
+    assert all(pages)
+    assert stats['detail'] == 8
+
+
+def test_cache_hit_and_revalidation(fake, tmp_path):
+    url = f'{fake.base_url}/subject/1/'
+    cache = ResponseCache(str(tmp_path))
+    first = cache.get(url)
+    second = cache.get(url)
+    assert not first.from_cache and second.from_cache and second.text == first.text
+    assert fake.stats()['detail'] == 1
+    cache.close()
+
+    # ttl=0 时条目立即过期，用 ETag 做条件请求，304 时复用缓存内容
+    cache = ResponseCache(str(tmp_path), ttl=0)
+    third = cache.get(url)
+    assert third.from_cache and third.text == first.text
+    assert cache.stats()['revalidated'] == 1
+    assert fake.stats()['status_304'] == 1 and fake.stats()['detail'] == 1
+    cache.close()
+
+
+def test_resume_from_checkpoint(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    crawler = make_crawler(fake)
+    crawler.crawl_final_batch(target=20, batch_interval=(0, 0), parse_workers=0)
+    crawler.record_log.close()
+    crawler.crawled_urls.close()
+    crawler.cache.close()
+    first = fake.stats()
+    assert first['list'] == 1
+
+    crawler = make_crawler(fake)
+    assert len(crawler.total_movies) == 20
+    assert crawler.state.next_start > 0
+    crawler.crawl_final_batch(target=40, batch_interval=(0, 0), parse_workers=0)
+    urls = [movie['url'] for movie in crawler.total_movies]
+    assert len(urls) == 40 and len(set(urls)) == 40
+    # 续爬时从检查点的游标继续，已下载的详情页来自缓存，没有页面被重复下载
+    second = fake.stats()
+    assert second['detail'] == second['unique_details'] > first['unique_details']
+
+
+def test_record_log_repairs_truncated_tail(tmp_path):
+    path = str(tmp_path / 'records.jsonl')
+    with RecordLog(path) as log:
+        for i in range(3):
+            log.append({'title': f'Movie {i}', 'url': f'/subject/{i}/'})
+    # 模拟写到一半时崩溃
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"title": "Movie 3", "ur')
+
+    log = RecordLog(path)
+    assert [record['title'] for record in log.replay()] == ['Movie 0', 'Movie 1', 'Movie 2']
+    log.append({'title': 'Movie 4', 'url': '/subject/4/'})
+    log.close()
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)['title'] for line in lines] == ['Movie 0', 'Movie 1', 'Movie 2', 'Movie 4']
+
+
+def test_shard_lease_expiry_and_takeover(tmp_path):
+    path = str(tmp_path / 'shards.sqlite')
+    queue = ShardQueue(path, lease_seconds=0.2)
+    queue.add_shards(plan_shards(sorts=('rating',), ranges=('0,10',), tags=['电影']))
+    shard = queue.lease('a')
+    assert queue.commit_page(shard['id'], 'a', 50, [])
+    assert queue.lease('b') is None
+
+    # worker a 停止续租，租约过期后由 b 从最后提交的位置接管
+    time.sleep(0.3)
+    other = ShardQueue(path, lease_seconds=0.2)
+    taken = other.lease('b')
+    assert taken['id'] == shard['id'] and taken['next_start'] == 50
+    assert not queue.heartbeat(shard['id'], 'a')
+    assert not queue.commit_page(shard['id'], 'a', 100, [])
+    assert other.commit_page(taken['id'], 'b', 100, [])
+    queue.close()
+    other.close()
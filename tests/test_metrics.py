@@ -0,0 +1,20 @@
+import os
+
+import metrics
+
+
+def test_jsonl_exporter_rotates_by_size(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    registry = metrics.Registry()
+    exporter = metrics.JsonlExporter(registry, path, interval=3600, max_bytes=4096)
+    for _ in range(200):
+        registry.inc('movies_total')
+        exporter.export()
+    exporter.close()
+    assert os.path.getsize(path) <= 4096 and os.path.getsize(path + '.1') <= 4096
+
+    # 当前文件不够时从轮转出的文件补足，最新的快照在最后（close() 会再写一次最后的快照）
+    snapshots = metrics.read_snapshots(path, tail_bytes=6144)
+    counts = [snapshot['counters']['movies_total'] for snapshot in snapshots]
+    assert counts == list(range(counts[0], 201)) + [200]
+    assert len(counts) > len(metrics.read_snapshots(path, tail_bytes=os.path.getsize(path)))
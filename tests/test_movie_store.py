@@ -0,0 +1,73 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import REPO_ROOT
+from loader import load_movies
+from movie_store import MovieStore
+from multivalue import SEPARATOR
+
+CSV_PATH = os.path.join(REPO_ROOT, 'data', 'raw', 'douban_movies_final.csv')
+
+# 数值条件为标量或闭区间，多值条件为一个或多个取值
+CONDITIONS = [
+    {'rating': 8.1},
+    {'rating': (None, 8.1)},
+    {'rating': (8.0, 8.1)},
+    {'rating': (8.7, None)},
+    {'year': 1994},
+    {'year': (1990, 1999), 'rating': (8.5, None)},
+    {'votes': (10000, 50000)},
+    {'country': '美国'},
+    {'genres': ['剧情', '喜剧'], 'year': (2000, None)},
+    {'country': '日本', 'genres': '动画', 'rating': (None, 8.1)},
+]
+
+
+@pytest.fixture(scope='module')
+def frame():
+    # 使用 loader 的紧凑类型（rating 为 float32），与实际使用 MovieStore 的方式一致
+    return load_movies(CSV_PATH)
+
+
+@pytest.fixture(scope='module')
+def store(frame):
+    return MovieStore(frame)
+
+
+def pandas_mask(df, conditions):
+    mask = pd.Series(True, index=df.index)
+    for column, condition in conditions.items():
+        if column in ('year', 'rating', 'votes'):
+            low, high = condition if isinstance(condition, tuple) else (condition, condition)
+            if low is not None:
+                mask &= df[column] >= low
+            if high is not None:
+                mask &= df[column] <= high
+        else:
+            tokens = {condition} if isinstance(condition, str) else set(condition)
+            mask &= df[column].map(lambda value: isinstance(value, str) and bool(
+                tokens & {item.strip() for item in value.split(SEPARATOR)})).astype(bool)
+    return mask.fillna(False).astype(bool)
+
+
+@pytest.mark.parametrize('conditions', CONDITIONS, ids=str)
+def test_filter_matches_pandas(frame, store, conditions):
+    expected = frame.index[pandas_mask(frame, conditions)].to_numpy()
+    assert len(expected)
+    assert store.filter(**conditions).tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize('conditions', CONDITIONS, ids=str)
+def test_select_matches_pandas(frame, store, conditions):
+    pd.testing.assert_frame_equal(store.select(['title', 'rating'], **conditions),
+                                  frame.loc[pandas_mask(frame, conditions), ['title', 'rating']])
+
+
+@pytest.mark.parametrize('by,ascending', [('rating', False), ('votes', False), ('year', True)])
+@pytest.mark.parametrize('conditions', [{}] + CONDITIONS, ids=str)
+def test_top_k_matches_pandas(frame, store, conditions, by, ascending):
+    expected = frame[pandas_mask(frame, conditions)].sort_values(by, ascending=ascending, kind='stable')
+    expected = expected[expected[by].notna()].head(20)
+    pd.testing.assert_frame_equal(store.top_k(20, by, ascending=ascending, **conditions), expected)
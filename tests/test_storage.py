@@ -0,0 +1,37 @@
+import os
+
+import pandas as pd
+
+from conftest import REPO_ROOT
+from storage import export_csv, import_csv, read_parquet, write_parquet
+
+CSV_PATH = os.path.join(REPO_ROOT, 'data', 'raw', 'douban_movies_final.csv')
+
+
+def test_csv_round_trip_keeps_rows(tmp_path):
+    parquet_path = str(tmp_path / 'movies.parquet')
+    csv_path = str(tmp_path / 'movies.csv')
+    import_csv(CSV_PATH, parquet_path)
+    export_csv(csv_path, parquet_path)
+    pd.testing.assert_frame_equal(pd.read_csv(csv_path), pd.read_csv(CSV_PATH))
+
+
+def test_extra_columns_are_kept(tmp_path):
+    path = str(tmp_path / 'movies.parquet')
+    df = pd.read_csv(CSV_PATH)
+    df['decade'] = df['year'] // 10 * 10
+    df['cluster_id'] = range(len(df))
+    write_parquet(df, path)
+    result = read_parquet(path)
+    assert list(result.columns) == list(df.columns)
+    assert result['cluster_id'].tolist() == df['cluster_id'].tolist()
+
+
+def test_filtered_read_keeps_order(tmp_path):
+    path = str(tmp_path / 'movies.parquet')
+    df = pd.read_csv(CSV_PATH)
+    write_parquet(df, path)
+    result = read_parquet(path, columns=['title', 'year'], year_range=(1990, 1999))
+    expected = df.loc[df['year'].between(1990, 1999), ['title', 'year']]
+    assert list(result.columns) == ['title', 'year']
+    assert result['title'].tolist() == expected['title'].tolist()